@@ -31,6 +31,11 @@ SionnaHelper::SionnaHelper(std::string environment, std::string zmq_url): m_envi
     m_fft_size = 1024 * 3;
     m_subcarrier_spacing = 78125;
     m_min_coherence_time_ms = 100000; // min coherence time is 100s
+    m_csi_format = CSI_FORMAT_CFR;
+    m_path_pruning_threshold_db = 0;
+    m_path_angles = false;
+    m_max_path_loss_db = 0;
+    m_scene_state = "";
 
     std::cout << "Env: " << m_environment << std::endl;
 }
@@ -93,6 +98,70 @@ SionnaHelper::SetSubMode(int sub_mode)
     m_sub_mode = sub_mode;
 }
 
+void
+SionnaHelper::SetCsiFormat(int csi_format)
+{
+    NS_ASSERT_MSG(csi_format == CSI_FORMAT_CFR || csi_format == CSI_FORMAT_PATHS, "Unknown CSI format");
+    m_csi_format = csi_format;
+}
+
+void
+SionnaHelper::SetPathPruningThreshold(double threshold_db)
+{
+    NS_ASSERT_MSG(threshold_db >= 0, "Path pruning threshold must be positive");
+    m_path_pruning_threshold_db = threshold_db;
+}
+
+void
+SionnaHelper::SetPathAngles(bool path_angles)
+{
+    m_path_angles = path_angles;
+}
+
+void
+SionnaHelper::SetRangeCulling(double max_tx_power_dbm, double rx_sensitivity_dbm)
+{
+    NS_ASSERT_MSG(max_tx_power_dbm > rx_sensitivity_dbm, "RX sensitivity must be below the TX power");
+    m_max_path_loss_db = max_tx_power_dbm - rx_sensitivity_dbm;
+}
+
+void
+SionnaHelper::AddSceneState(std::string name, std::string environment)
+{
+    NS_ASSERT_MSG(!name.empty(), "Scene state needs a name");
+    m_scene_states.emplace_back(name, environment);
+}
+
+void
+SionnaHelper::SetSceneState(std::string name)
+{
+    bool known = name.empty();
+    for (const auto& scene_state : m_scene_states)
+    {
+        known = known || scene_state.first == name;
+    }
+    NS_ASSERT_MSG(known, "Scene state " << name << " was not added");
+    m_scene_state = name;
+}
+
+std::string
+SionnaHelper::GetSceneState()
+{
+    return m_scene_state;
+}
+
+int
+SionnaHelper::GetFFTSize()
+{
+    return m_fft_size;
+}
+
+int
+SionnaHelper::GetSubcarrierSpacing()
+{
+    return m_subcarrier_spacing;
+}
+
 void
 SionnaHelper::Configure(int frequency, int channel_bw, int fft_size, int ofdm_subcarrier_spacing, int min_coherence_time_ms)
 {
@@ -175,6 +244,16 @@ SionnaHelper::Start()
     simulation_info->set_subcarrier_spacing(m_subcarrier_spacing);
     simulation_info->set_mode(m_mode);
     simulation_info->set_sub_mode(m_sub_mode);
+    simulation_info->set_csi_format(m_csi_format);
+    simulation_info->set_path_pruning_threshold_db(m_path_pruning_threshold_db);
+    simulation_info->set_path_angles(m_path_angles);
+    simulation_info->set_max_path_loss_db(m_max_path_loss_db);
+    for (const auto& scene_state : m_scene_states)
+    {
+        ns3sionna::SimInitMessage::SceneState* state = simulation_info->add_scene_states();
+        state->set_name(scene_state.first);
+        state->set_scene_fname(scene_state.second);
+    }
 
     NodeContainer c = NodeContainer::GetGlobal();
     for (auto iter = c.Begin(); iter != c.End(); ++iter)
@@ -220,6 +299,13 @@ SionnaHelper::Start()
                 ns3sionna::SimInitMessage::NodeInfo::RandomWalkModel::RandomVariableStream* direction = random_walk_model->mutable_direction();
                 RandomVariableStreamMessage(direction, sionnaMobilityModel->GetDirection());
             }
+            else if (sionnaMobilityModel->GetModel() == "Trace")
+            {
+                ns3sionna::SimInitMessage::NodeInfo::TraceModel* trace_model = node_info->mutable_trace_model();
+
+                NS_ASSERT_MSG(!sionnaMobilityModel->GetTraceFile().empty(), "Trace model requires a TraceFile.");
+                trace_model->set_trace_fname(sionnaMobilityModel->GetTraceFile());
+            }
             else
             {
                 ns3sionna::SimInitMessage::NodeInfo::ConstantPositionModel* constant_position_model = node_info->mutable_constant_position_model();
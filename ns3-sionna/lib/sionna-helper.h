@@ -86,8 +86,51 @@ public:
      */
     void SetSubMode(int sub_mode);
 
+    /**
+     * Set the format of the CSI returned by Sionna
+     * @param csi_format CSI_FORMAT_CFR or CSI_FORMAT_PATHS
+     */
+    void SetCsiFormat(int csi_format);
+
+    /**
+     * Set the threshold for pruning weak paths (CSI_FORMAT_PATHS only)
+     * @param threshold_db paths weaker than the strongest path by more than this are dropped [dB]; 0 keeps all
+     */
+    void SetPathPruningThreshold(double threshold_db);
+
+    /**
+     * Request the angles of departure and arrival per path (CSI_FORMAT_PATHS only)
+     */
+    void SetPathAngles(bool path_angles);
+
+    /**
+     * Skip ray tracing for links which cannot be received: if the free space loss of a link already exceeds
+     * the difference between the max. TX power and the RX sensitivity, Sionna returns the free space delay
+     * and loss of the link instead
+     * @param max_tx_power_dbm the max. TX power of all nodes [dBm]
+     * @param rx_sensitivity_dbm the RX sensitivity [dBm]
+     */
+    void SetRangeCulling(double max_tx_power_dbm, double rx_sensitivity_dbm);
+
+    /**
+     * Announce an alternative geometry of the scene (e.g. a door open or closed) which Sionna prepares at
+     * start, so that switching to it with SetSceneState is fast
+     * @param name name of the state
+     * @param environment relative location of the XML scenario file with this geometry
+     */
+    void AddSceneState(std::string name, std::string environment);
+
+    /**
+     * Select the geometry of the scene used for all following channel computations
+     * @param name name of a state added with AddSceneState; empty selects the environment of the helper
+     */
+    void SetSceneState(std::string name);
+    std::string GetSceneState();
+
     double GetNoiseFloor();
     int GetFrequency();
+    int GetFFTSize();
+    int GetSubcarrierSpacing(); // in Hz
 
 private:
     void SetFrequency(int frequency); // in MHz
@@ -106,6 +149,12 @@ private:
     int m_fft_size;
     int m_subcarrier_spacing; // in Hz
     double m_noiseDbm;
+    int m_csi_format;
+    double m_path_pruning_threshold_db;
+    bool m_path_angles;
+    double m_max_path_loss_db; // 0 = no range culling
+    std::vector<std::pair<std::string, std::string>> m_scene_states; // (name, XML scenario file)
+    std::string m_scene_state; // active state; empty = m_environment
 
 public:
     zmq::socket_t m_zmq_socket; // ZMQ socket used for connecting ns3 with Sionna
@@ -115,6 +164,10 @@ public:
     const static int MODE_P2MP = 2; // a full CSI P2MP (TX to all other RX nodes) is computed within a single Sionna call
     const static int MODE_P2MP_LAH = 3; // same as mode 2 but in addition also future not yet needed channels are computed
 
+    // possible formats of the CSI
+    const static int CSI_FORMAT_CFR = 0; // CFR per OFDM subcarrier
+    const static int CSI_FORMAT_PATHS = 1; // complex amplitude and delay per path; the CFR is synthesized locally
+
     // default value used by ns spectrummodel
     const static int GUARD_MULTIPLIER = 3;
 };
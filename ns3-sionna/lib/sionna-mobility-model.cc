@@ -30,14 +30,16 @@ SionnaMobilityModel::GetTypeId()
             .SetGroupName("Mobility")
             .AddConstructor<SionnaMobilityModel>()
             .AddAttribute("Model",
-                          "The model indicates whether ConstantPositionMobilityModel "
-                          "or RandomWalk2dMobilityModel is used",
+                          "The model indicates whether ConstantPositionMobilityModel, "
+                          "RandomWalk2dMobilityModel or a trajectory trace is used",
                           EnumValue(SionnaMobilityModel::MODEL_CONSTANT_POSITION),
                           MakeEnumAccessor(&SionnaMobilityModel::m_model),
                           MakeEnumChecker(SionnaMobilityModel::MODEL_CONSTANT_POSITION,
                                           "Constant Position",
                                           SionnaMobilityModel::MODEL_RANDOM_WALK,
-                                          "Random Walk"))
+                                          "Random Walk",
+                                          SionnaMobilityModel::MODEL_TRACE,
+                                          "Trace"))
             .AddAttribute("Mode",
                           "The mode indicates the condition used to "
                           "change the current speed and direction",
@@ -66,7 +68,13 @@ SionnaMobilityModel::GetTypeId()
                           "A random variable used to pick the direction (radians).",
                           StringValue("ns3::UniformRandomVariable[Min=0.0|Max=6.283184]"),
                           MakePointerAccessor(&SionnaMobilityModel::m_direction),
-                          MakePointerChecker<RandomVariableStream>());
+                          MakePointerChecker<RandomVariableStream>())
+            .AddAttribute("TraceFile",
+                          "Trajectory file used by the trace model (CSV with time in seconds, x, y, z "
+                          "per row). Relative paths are resolved against the models directory of Sionna.",
+                          StringValue(""),
+                          MakeStringAccessor(&SionnaMobilityModel::m_traceFile),
+                          MakeStringChecker());
     return tid;
 }
 
@@ -85,6 +93,10 @@ SionnaMobilityModel::GetModel() const
     {
         return "Random Walk";
     }
+    else if (m_model == SionnaMobilityModel::MODEL_TRACE)
+    {
+        return "Trace";
+    }
     else
     {
         return "Constant Position";
@@ -128,6 +140,12 @@ SionnaMobilityModel::GetDirection() const
     return m_direction;
 }
 
+std::string
+SionnaMobilityModel::GetTraceFile() const
+{
+    return m_traceFile;
+}
+
 Vector
 SionnaMobilityModel::DoGetPosition() const
 {
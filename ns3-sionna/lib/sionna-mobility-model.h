@@ -21,6 +21,7 @@ namespace ns3
  * The mobility models available in ns3sionna:
  * - constant position
  * - random walk
+ * - trace (trajectory read from a file with time, x, y, z per row)
  *
  * Note: mobility is simulated inside Sionna and propagated back no ns3.
  */
@@ -35,7 +36,8 @@ class SionnaMobilityModel : public MobilityModel
         enum Model
         {
             MODEL_CONSTANT_POSITION,
-            MODEL_RANDOM_WALK
+            MODEL_RANDOM_WALK,
+            MODEL_TRACE
         };
 
         enum Mode
@@ -56,6 +58,8 @@ class SionnaMobilityModel : public MobilityModel
 
         Ptr<RandomVariableStream> GetDirection() const;
 
+        std::string GetTraceFile() const;
+
         //void SetPropagationCache(Ptr<SionnaPropagationCache> propagationCache);
 
     private:
@@ -72,6 +76,7 @@ class SionnaMobilityModel : public MobilityModel
         Time m_modeTime;
         Ptr<RandomVariableStream> m_speed;
         Ptr<RandomVariableStream> m_direction;
+        std::string m_traceFile;
 
         //Ptr<SionnaPropagationCache> m_propagationCache;
 };
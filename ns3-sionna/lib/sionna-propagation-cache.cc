@@ -10,11 +10,13 @@
 
 #include "message.pb.h"
 #include "sionna-mobility-model.h"
+#include "sionna-utils.h"
 
 #include "ns3/log.h"
 #include "ns3/node.h"
 #include "ns3/simulator.h"
 #include <boost/units/physical_dimensions/volume.hpp>
+#include <cstring>
 #include <sstream>
 
 namespace ns3
@@ -44,7 +46,7 @@ SionnaPropagationCache::SionnaPropagationCache()
 
 SionnaPropagationCache::~SionnaPropagationCache()
 {
-    m_cache.clear();
+    m_caches.clear();
 }
 
 Time
@@ -147,6 +149,107 @@ SionnaPropagationCache::GetPropagationCSI(Ptr<const MobilityModel> a, Ptr<const
     return GetPropagationData(tmp_a, tmp_b).m_cfr;
 }
 
+void
+SionnaPropagationCache::SynthesizeCfr(const ns3sionna::ChannelStateResponse::ChannelState::RxNodeInfo& rx_node,
+    int subcarrier_spacing, CacheEntry& entry)
+{
+    // H(f) = sum_i a_i exp(-j 2 pi f tau_i) on the subcarriers centered around the carrier frequency
+    int fft_size = entry.m_num_ofdm_subcarrier;
+    int num_paths = rx_node.path_delay_size();
+    double power = 0;
+    for (int i=0; i < fft_size; i++)
+    {
+        int freq = SubcarrierFrequency(i, fft_size, subcarrier_spacing);
+        std::complex<double> h = 0;
+        for (int p=0; p < num_paths; p++)
+        {
+            std::complex<double> a(rx_node.path_a_real(p), rx_node.path_a_imag(p));
+            h += a * std::polar(1.0, -2 * M_PI * freq * rx_node.path_delay(p) * 1e-9);
+        }
+        entry.m_freq.emplace_back(freq);
+        entry.m_cfr.emplace_back(h);
+        power += std::norm(h);
+    }
+
+    // normalized to unit average energy like the CFR computed by Sionna
+    if (power > 0)
+    {
+        double scale = 1.0 / std::sqrt(power / fft_size);
+        for (auto& h : entry.m_cfr)
+        {
+            h *= scale;
+        }
+    }
+}
+
+std::vector<std::vector<std::complex<double>>>
+SionnaPropagationCache::GetPropagationCSITimeSeries(Ptr<const MobilityModel> a, Ptr<const MobilityModel> b,
+    const std::vector<Time>& times, double maxDrift) const
+{
+    Ptr<Node> node_a = a->GetObject<Node>();
+    Ptr<Node> node_b = b->GetObject<Node>();
+
+    NS_ASSERT_MSG(node_a && node_b, "Nodes not found.");
+
+    // Prepare the request message
+    ns3sionna::Wrapper wrapper;
+
+    ns3sionna::CsiTimeSeriesRequest* csi_request = wrapper.mutable_csi_time_series_request();
+    csi_request->set_tx_node(node_a->GetId());
+    csi_request->set_rx_node(node_b->GetId());
+    for (const Time& t : times)
+    {
+        csi_request->add_times(t.GetNanoSeconds());
+    }
+    csi_request->set_max_drift(maxDrift);
+    csi_request->set_scene_state(m_sionnaHelper->GetSceneState());
+
+    // Serialize and send the request message
+    std::string serialized_message;
+    wrapper.SerializeToString(&serialized_message);
+
+    zmq::message_t zmq_message(serialized_message.data(), serialized_message.size());
+    m_sionnaHelper->m_zmq_socket.send(zmq_message, zmq::send_flags::none);
+
+    // Receive the reply message
+    zmq::message_t zmq_reply;
+    zmq::recv_result_t result = m_sionnaHelper->m_zmq_socket.recv(zmq_reply, zmq::recv_flags::none);
+
+    NS_ASSERT_MSG(result, "Failed to receive reply after CSI time series request message.");
+
+    ns3sionna::Wrapper reply_wrapper;
+    reply_wrapper.ParseFromArray(zmq_reply.data(), zmq_reply.size());
+
+    NS_ASSERT_MSG(reply_wrapper.has_csi_time_series_response(), "Reply after CSI time series request is not a CSI time series response.");
+
+    const ns3sionna::CsiTimeSeriesResponse& csi_response = reply_wrapper.csi_time_series_response();
+
+    NS_LOG_INFO("ns3sionna::Req CSI time series from sionna: #samples=" << csi_response.times_size()
+        << ", #traces=" << csi_response.num_traces());
+
+    // the CSI is a contiguous array of complex64 values of shape [times, frequencies]
+    int num_ofdm_subcarrier = csi_response.frequencies_size();
+    const std::string& csi_bytes = csi_response.csi();
+    NS_ASSERT_MSG(csi_bytes.size() == csi_response.times_size() * num_ofdm_subcarrier * 2 * sizeof(float),
+                  "Unexpected size of CSI time series.");
+
+    std::vector<float> values(csi_bytes.size() / sizeof(float));
+    std::memcpy(values.data(), csi_bytes.data(), csi_bytes.size());
+
+    std::vector<std::vector<std::complex<double>>> cfr_series(csi_response.times_size());
+    for (int k = 0; k < csi_response.times_size(); k++)
+    {
+        cfr_series[k].reserve(num_ofdm_subcarrier);
+        for (int i = 0; i < num_ofdm_subcarrier; i++)
+        {
+            size_t idx = 2 * (static_cast<size_t>(k) * num_ofdm_subcarrier + i);
+            cfr_series[k].emplace_back(values[idx], values[idx + 1]);
+        }
+    }
+
+    return cfr_series;
+}
+
 void
 SionnaPropagationCache::SetSionnaHelper(SionnaHelper &sionnaHelper)
 {
@@ -201,14 +304,17 @@ SionnaPropagationCache::GetPropagationData(Ptr<MobilityModel> a, Ptr<MobilityMod
 
     NS_LOG_DEBUG("ns3sionna::GetPropagationData for lnk: " << node_a->GetId() << " to " << node_b->GetId());
 
+    // the channels of each scene state are cached separately
+    Cache& cache = m_caches[m_sionnaHelper->GetSceneState()];
+
     if (m_caching)
     {
         //NS_LOG_INFO("Check cache");
         // Look in the cache and check if delay and loss have already been calculated for the two nodes
         CacheKey key = CacheKey(node_a->GetId(), node_b->GetId());
-        auto it = m_cache.find(key);
+        auto it = cache.find(key);
 
-        if (it != m_cache.end())
+        if (it != cache.end())
         {
             //NS_LOG_INFO(" Cache entry found but need to check if expired ");
             // remove outdated entries
@@ -247,6 +353,7 @@ SionnaPropagationCache::GetPropagationData(Ptr<MobilityModel> a, Ptr<MobilityMod
     propagation_request->set_tx_node(node_a->GetId());
     propagation_request->set_rx_node(node_b->GetId());
     propagation_request->set_time(current_time.GetNanoSeconds());
+    propagation_request->set_scene_state(m_sionnaHelper->GetSceneState());
     
     // Serialize the request message
     std::string serialized_message;
@@ -289,12 +396,22 @@ SionnaPropagationCache::GetPropagationData(Ptr<MobilityModel> a, Ptr<MobilityMod
         for (int rx_i=0; rx_i < csi_response.csi(csi_i).rx_nodes_size(); rx_i++) {
             Time delay = NanoSeconds(csi_response.csi(csi_i).rx_nodes(rx_i).delay());
             double wb_loss = csi_response.csi(csi_i).rx_nodes(rx_i).wb_loss();
-            //Time ttl = NanoSeconds(csi_response.csi(csi_i).rx_nodes(rx_i).ttl());
+            // each link may carry its own validity
+            Time lnk_end_time = end_time;
+            if (csi_response.csi(csi_i).rx_nodes(rx_i).end_time() > 0)
+            {
+                lnk_end_time = NanoSeconds(csi_response.csi(csi_i).rx_nodes(rx_i).end_time());
+            }
 
             google::protobuf::uint32 rxId = csi_response.csi(csi_i).rx_nodes(rx_i).id();
             auto rxPos = csi_response.csi(csi_i).rx_nodes(rx_i).position();
 
-            int num_ofdm_subcarrier = csi_response.csi(csi_i).rx_nodes(rx_i).csi_imag().size();
+            const ns3sionna::ChannelStateResponse::ChannelState::RxNodeInfo& rx_node = csi_response.csi(csi_i).rx_nodes(rx_i);
+            // in path format the CFR is synthesized from the paths on the OFDM grid
+            bool paths = rx_node.path_delay_size() > 0;
+            // links out of range come without CSI
+            bool synthesize = paths || rx_node.out_of_range();
+            int num_ofdm_subcarrier = synthesize ? m_sionnaHelper->GetFFTSize() : rx_node.csi_imag().size();
 
             NS_LOG_DEBUG("\t\t: Response (delay: " << delay << ", loss: " << wb_loss << ")"
               << " (TxId: " << txId << " [" << csi_response.csi(csi_i).tx_node().position().x()
@@ -304,29 +421,47 @@ SionnaPropagationCache::GetPropagationData(Ptr<MobilityModel> a, Ptr<MobilityMod
 
             // Add the info from all other receivers to the cache
             CacheKey otherkey = CacheKey(txId, rxId);
-            CacheEntry entry = CacheEntry(delay, wb_loss, start_time, end_time, num_ofdm_subcarrier,
+            CacheEntry entry = CacheEntry(delay, wb_loss, start_time, lnk_end_time, num_ofdm_subcarrier,
                 txId, rxId ,Vector(txPos.x(),txPos.y(),txPos.z()), Vector(rxPos.x(),rxPos.y(),rxPos.z()));
 
-            // CFR: remove guards
-            for (int i=0; i < num_ofdm_subcarrier; i++)
+            if (paths)
             {
-                int freq = csi_response.csi(csi_i).rx_nodes(rx_i).frequencies(i);
-                entry.m_freq.emplace_back(freq);
+                SynthesizeCfr(rx_node, m_sionnaHelper->GetSubcarrierSpacing(), entry);
+            }
+            else if (rx_node.out_of_range())
+            {
+                // free space: the normalized CFR of the LOS path
+                int subcarrier_spacing = m_sionnaHelper->GetSubcarrierSpacing();
+                for (int i=0; i < num_ofdm_subcarrier; i++)
+                {
+                    int freq = SubcarrierFrequency(i, num_ofdm_subcarrier, subcarrier_spacing);
+                    entry.m_freq.emplace_back(freq);
+                    entry.m_cfr.emplace_back(std::polar(1.0, -2 * M_PI * freq * rx_node.delay() * 1e-9));
+                }
+            }
+            else
+            {
+                // CFR: remove guards
+                for (int i=0; i < num_ofdm_subcarrier; i++)
+                {
+                    int freq = rx_node.frequencies(i);
+                    entry.m_freq.emplace_back(freq);
 
-                double imag = csi_response.csi(csi_i).rx_nodes(rx_i).csi_imag(i);
-                double real = csi_response.csi(csi_i).rx_nodes(rx_i).csi_real(i);
-                entry.m_cfr.emplace_back(real, imag);
+                    double imag = rx_node.csi_imag(i);
+                    double real = rx_node.csi_real(i);
+                    entry.m_cfr.emplace_back(real, imag);
+                }
             }
 
-            auto cache_it = m_cache.find(otherkey);
+            auto cache_it = cache.find(otherkey);
 
-            if (cache_it != m_cache.end()) {
+            if (cache_it != cache.end()) {
                 // pair already known
                 cache_it->second.push_back(entry);
             } else {
                 // create new entry with zero vector
-                m_cache.insert(std::make_pair(otherkey, std::vector<CacheEntry>()));
-                cache_it = m_cache.find(otherkey);
+                cache.insert(std::make_pair(otherkey, std::vector<CacheEntry>()));
+                cache_it = cache.find(otherkey);
                 cache_it->second.push_back(entry);
             }
         }
@@ -334,8 +469,8 @@ SionnaPropagationCache::GetPropagationData(Ptr<MobilityModel> a, Ptr<MobilityMod
 
     // get result from cache
     CacheKey key2 = CacheKey(node_a->GetId(), node_b->GetId());
-    auto cache_it = m_cache.find(key2);
-    if (cache_it != m_cache.end())
+    auto cache_it = cache.find(key2);
+    if (cache_it != cache.end())
     {
         // iterate over all stored entries for that link
         for (CacheEntry c_entry : cache_it->second) {
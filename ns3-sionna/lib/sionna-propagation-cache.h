@@ -57,6 +57,10 @@ class SionnaPropagationCache : public ns3::Object
         std::vector<std::complex<double>> GetPropagationCSI(Ptr<const MobilityModel> a, Ptr<const MobilityModel> b) const;
         // frequency of subcarriers
         std::vector<int> GetPropagationFreq(Ptr<const MobilityModel> a, Ptr<const MobilityModel> b) const;
+        // small-scale fading at many points in time computed in a single request (e.g. for sensing);
+        // one CFR per point in time, traced again once a node moved more than maxDrift meters (0 = server default)
+        std::vector<std::vector<std::complex<double>>> GetPropagationCSITimeSeries(Ptr<const MobilityModel> a,
+            Ptr<const MobilityModel> b, const std::vector<Time>& times, double maxDrift = 0.0) const;
 
         void SetSionnaHelper(SionnaHelper &sionnaHelper);
         SionnaHelper* GetSionnaHelper();
@@ -140,10 +144,14 @@ class SionnaPropagationCache : public ns3::Object
 
         CacheEntry GetPropagationData(Ptr<MobilityModel> a, Ptr<MobilityModel> b) const;
 
+        // synthesizes the normalized CFR of a link whose CSI was returned as paths (CSI_FORMAT_PATHS)
+        static void SynthesizeCfr(const ns3sionna::ChannelStateResponse::ChannelState::RxNodeInfo& rx_node,
+            int subcarrier_spacing, CacheEntry& entry);
+
         SionnaHelper *m_sionnaHelper;
         bool m_caching;
         typedef std::map<CacheKey, std::vector<CacheEntry>> Cache;
-        mutable Cache m_cache;
+        mutable std::map<std::string, Cache> m_caches; // per scene state
         mutable double m_cache_hits;
         mutable double m_cache_miss;
         bool m_optimize; // too far distance are not computed with raytracing
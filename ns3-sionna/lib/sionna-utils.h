@@ -146,6 +146,15 @@ inline int getSubcarrierSpacing(WifiStandard wifi_standard)
         }
     }
 
+    /**
+     * Baseband frequency (in Hz) of OFDM subcarrier i, centered around the carrier like subcarrier_frequencies
+     * of Sionna, i.e. indices -N/2..N/2-1 for even and -(N-1)/2..(N-1)/2 for odd FFT sizes N
+     */
+    inline int SubcarrierFrequency(int i, int fft_size, int subcarrier_spacing)
+    {
+        return (i - fft_size / 2) * subcarrier_spacing;
+    }
+
     inline double get_center_freq(Ptr<NetDevice> nd)
     {
         Ptr<WifiPhy> wp = nd->GetObject<WifiNetDevice>()->GetPhy();
@@ -45,6 +45,10 @@ def print_simulation_info(simulation_info):
             elif direction.HasField("normal"):
                 print(f"        Direction: Normal({direction.normal.mean}, {direction.normal.variance})")
 
+        elif node_info.HasField("trace_model"):
+            print("    Trace Model:")
+            print("        File:", node_info.trace_model.trace_fname)
+
 
 def print_csi_request(simulation_time, node_a, node_b):
     print("%0.9fs: Propagation request:" % (simulation_time / 1e9))
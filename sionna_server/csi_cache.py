@@ -0,0 +1,66 @@
+class CsiCache:
+    """
+    Server-side cache of the computed CSI per link, indexed by the unordered pair of node IDs and the
+    validity window [start_time, end_time) of the CSI (in ns).
+
+    The channel is reciprocal (isotropic antennas), so the CSI computed for A->B also serves a request for
+    B->A; only the angles of departure and arrival of the paths are swapped. Used if the client does not cache
+    the CSI itself.
+    """
+
+    def __init__(self):
+        self.windows = dict() # (node a, node b) -> [(start_time, end_time, tx_node, result)]
+        self.hits = 0
+        self.reciprocal_hits = 0
+        self.misses = 0
+
+    def lookup(self, tx_node, rx_node, simulation_time):
+        '''
+        Returns (end_time, result) of the latest CSI of the link valid at simulation_time or None;
+        result is (delay, loss, csi, paths) as seen from tx_node
+        '''
+        best = None
+        for window in self.windows.get(self.key(tx_node, rx_node), []):
+            if window[0] <= simulation_time < window[1] and (best is None or window[0] > best[0]):
+                best = window
+        if best is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        start_time, end_time, cached_tx_node, result = best
+        if cached_tx_node != tx_node:
+            self.reciprocal_hits += 1
+            result = self.reverse(result)
+        return end_time, result
+
+    def store(self, tx_node, rx_node, start_time, end_time, result):
+        self.windows.setdefault(self.key(tx_node, rx_node), []).append((start_time, end_time, tx_node, result))
+
+    def expire(self, simulation_time):
+        '''
+        Removes all CSI which is no longer valid at simulation_time
+        '''
+        for key in list(self.windows):
+            windows = [window for window in self.windows[key] if window[1] > simulation_time]
+            if len(windows) > 0:
+                self.windows[key] = windows
+            else:
+                del self.windows[key]
+
+    def report(self):
+        num_requests = self.hits + self.misses
+        print("CSI cache: hits %d/%d (%.2f, reciprocal %d)"
+              % (self.hits, num_requests, self.hits / max(num_requests, 1), self.reciprocal_hits))
+
+    @staticmethod
+    def key(tx_node, rx_node):
+        return (tx_node, rx_node) if tx_node < rx_node else (rx_node, tx_node)
+
+    @staticmethod
+    def reverse(result):
+        delay, loss, csi, paths = result
+        if paths is None or paths[2] is None:
+            return result
+        a, tau, (theta_t, phi_t, theta_r, phi_r) = paths
+        return delay, loss, csi, (a, tau, [theta_r, phi_r, theta_t, phi_t])
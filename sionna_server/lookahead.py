@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+
+
+class TxLookaheadState:
+    """
+    Request statistics and current look ahead of a single transmitter
+    """
+
+    def __init__(self, look_ahead):
+        self.look_ahead = look_ahead
+        self.last_request = None
+        self.mean_gap = None # EWMA of the inter-arrival time of requests (in ns)
+        self.consumed_fraction = None # EWMA of the fraction of consumed look ahead slots
+        # the look ahead window computed for the last request
+        self.slot_times = None
+        self.end_time = 0
+        self.num_requests = 0
+        self.slots_computed = 0
+        self.slots_consumed = 0
+        self.sum_look_ahead = 0
+        self.decisions = [] # (simulation time, old look ahead, new look ahead)
+
+
+class LookaheadController:
+    """
+    Adapts the no. of look ahead slots (mode 3) per transmitter to the observed request pattern.
+
+    For each TX the inter-arrival time of its requests and the fraction of precomputed slots which were
+    consumed are tracked as EWMA. A slot counts as consumed if the simulation reached it before the TX
+    needed a new calculation. When the next request arrives within the precomputed window, the remaining
+    slots were wasted; when it arrives shortly after the window ended (steady traffic), all slots were used
+    and more would have been needed; when it arrives long after the window ended (bursty traffic), only the
+    first slot is assumed to be used. The look ahead doubles if (almost) all slots are consumed and the
+    window ran out, and shrinks to the consumed share otherwise. A single call computes at most max_links links,
+    i.e. at most max_links / num_rx slots as each slot has a link to every RX.
+    """
+
+    def __init__(self, max_links, num_rx, alpha=0.25, grow_threshold=0.9, shrink_threshold=0.5, verbose=False):
+        self.max_links = max_links
+        self.max_slots = max(1, max_links // max(num_rx, 1))
+        self.alpha = alpha
+        self.grow_threshold = grow_threshold
+        self.shrink_threshold = shrink_threshold
+        self.verbose = verbose
+        self.tx_state = dict()
+
+
+    def get_look_ahead(self, tx_node, initial_look_ahead, simulation_time):
+        '''
+        Registers a request of tx_node at simulation_time and returns the no. of look ahead slots to compute
+        '''
+        state = self.tx_state.get(tx_node)
+        if state is None:
+            state = TxLookaheadState(min(initial_look_ahead, self.max_slots))
+            self.tx_state[tx_node] = state
+
+        if state.slot_times is not None:
+            self.observe(tx_node, state, simulation_time)
+
+        state.last_request = simulation_time
+        state.num_requests += 1
+        state.sum_look_ahead += state.look_ahead
+        return state.look_ahead
+
+
+    def observe(self, tx_node, state, simulation_time):
+        gap = simulation_time - state.last_request
+        state.mean_gap = gap if state.mean_gap is None else (1 - self.alpha) * state.mean_gap + self.alpha * gap
+
+        num_slots = len(state.slot_times)
+        window = state.end_time - state.slot_times[0]
+        if simulation_time <= state.end_time:
+            # requested again within the window: the remaining slots were not needed
+            consumed = max(1, int(np.count_nonzero(state.slot_times < simulation_time)))
+        elif simulation_time - state.end_time <= window:
+            # steady traffic: the whole window was used
+            consumed = num_slots
+        else:
+            # bursty traffic: no transmissions after the first slot
+            consumed = 1
+
+        fraction = consumed / num_slots
+        if state.consumed_fraction is None:
+            state.consumed_fraction = fraction
+        else:
+            state.consumed_fraction = (1 - self.alpha) * state.consumed_fraction + self.alpha * fraction
+        state.slots_computed += num_slots
+        state.slots_consumed += consumed
+
+        look_ahead = state.look_ahead
+        if state.consumed_fraction >= self.grow_threshold and simulation_time > state.end_time:
+            look_ahead = min(2 * look_ahead, self.max_slots)
+        elif state.consumed_fraction <= self.shrink_threshold:
+            look_ahead = max(1, math.ceil(look_ahead * state.consumed_fraction))
+
+        if look_ahead != state.look_ahead:
+            if self.verbose:
+                print("Lookahead TX %d: %d -> %d (gap=%.3f ms, consumed=%.2f)"
+                      % (tx_node, state.look_ahead, look_ahead, state.mean_gap / 1e6, state.consumed_fraction))
+            state.decisions.append((simulation_time, state.look_ahead, look_ahead))
+            state.look_ahead = look_ahead
+
+
+    def record(self, tx_node, slot_times, end_time):
+        '''
+        Stores the look ahead window computed for the last request of tx_node
+        '''
+        state = self.tx_state[tx_node]
+        state.slot_times = np.asarray(slot_times, dtype=np.int64)
+        state.end_time = end_time
+
+
+    def report(self, fixed_look_ahead=None):
+        print("Adaptive lookahead (max. %d links, %d slots per call):" % (self.max_links, self.max_slots))
+        total_computed, total_consumed = 0, 0
+        for tx_node, state in sorted(self.tx_state.items()):
+            mean_gap = state.mean_gap / 1e6 if state.mean_gap is not None else float('nan')
+            print("    TX %d: requests=%d, gap=%.3f ms, LAH avg=%.2f now=%d, slots consumed %d/%d (%.2f), decisions=%d"
+                  % (tx_node, state.num_requests, mean_gap, state.sum_look_ahead / max(state.num_requests, 1),
+                     state.look_ahead, state.slots_consumed, state.slots_computed,
+                     state.slots_consumed / max(state.slots_computed, 1), len(state.decisions)))
+            total_computed += state.slots_computed
+            total_consumed += state.slots_consumed
+
+        num_requests = sum(state.num_requests for state in self.tx_state.values())
+        print("    total: requests=%d, slots consumed %d/%d" % (num_requests, total_consumed, total_computed))
+        if fixed_look_ahead is not None:
+            print("    fixed sub_mode would compute up to %d slots per request" % fixed_look_ahead)
@@ -14,7 +14,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\x12\tns3sionna\"\xc7\n\n\x0eSimInitMessage\x12\x13\n\x0bscene_fname\x18\x01 \x01(\t\x12\x0c\n\x04seed\x18\x02 \x01(\x05\x12\x11\n\tfrequency\x18\x03 \x01(\r\x12\x12\n\nchannel_bw\x18\x04 \x01(\r\x12\x10\n\x08\x66\x66t_size\x18\x05 \x01(\r\x12\x1a\n\x12subcarrier_spacing\x18\x06 \x01(\r\x12\x0c\n\x04mode\x18\x07 \x01(\r\x12\x10\n\x08sub_mode\x18\x08 \x01(\r\x12\x1d\n\x15min_coherence_time_ms\x18\t \x01(\r\x12\x31\n\x05nodes\x18\n \x03(\x0b\x32\".ns3sionna.SimInitMessage.NodeInfo\x1a\xca\x08\n\x08NodeInfo\x12\n\n\x02id\x18\x01 \x01(\r\x12[\n\x17\x63onstant_position_model\x18\x02 \x01(\x0b\x32\x38.ns3sionna.SimInitMessage.NodeInfo.ConstantPositionModelH\x00\x12O\n\x11random_walk_model\x18\x03 \x01(\x0b\x32\x32.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModelH\x00\x1a)\n\x06Vector\x12\t\n\x01x\x18\x01 \x01(\x01\x12\t\n\x01y\x18\x02 \x01(\x01\x12\t\n\x01z\x18\x03 \x01(\x01\x1aT\n\x15\x43onstantPositionModel\x12;\n\x08position\x18\x01 \x01(\x0b\x32).ns3sionna.SimInitMessage.NodeInfo.Vector\x1a\xf9\x05\n\x0fRandomWalkModel\x12;\n\x08position\x18\x01 \x01(\x0b\x32).ns3sionna.SimInitMessage.NodeInfo.Vector\x12\x14\n\ntime_value\x18\x02 \x01(\x03H\x00\x12\x18\n\x0e\x64istance_value\x18\x03 \x01(\x01H\x00\x12V\n\x05speed\x18\x04 \x01(\x0b\x32G.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream\x12Z\n\tdirection\x18\x05 \x01(\x0b\x32G.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream\x1a\xbc\x03\n\x14RandomVariableStream\x12\x64\n\x08\x63onstant\x18\x01 \x01(\x0b\x32P.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.ConstantH\x00\x12\x62\n\x07uniform\x18\x02 \x01(\x0b\x32O.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.UniformH\x00\x12`\n\x06normal\x18\x03 \x01(\x0b\x32N.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.NormalH\x00\x1a\x19\n\x08\x43onstant\x12\r\n\x05value\x18\x01 \x01(\x01\x1a#\n\x07Uniform\x12\x0b\n\x03min\x18\x01 \x01(\x01\x12\x0b\n\x03max\x18\x02 \x01(\x01\x1a(\n\x06Normal\x12\x0c\n\x04mean\x18\x01 \x01(\x01\x12\x10\n\x08variance\x18\x02 \x01(\x01\x42\x0e\n\x0c\x64istributionB\x06\n\x04modeB\x07\n\x05model\"\x08\n\x06SimAck\"E\n\x13\x43hannelStateRequest\x12\x0f\n\x07tx_node\x18\x01 \x01(\r\x12\x0f\n\x07rx_node\x18\x02 \x01(\r\x12\x0c\n\x04time\x18\x03 \x01(\x04\"\xa6\x05\n\x14\x43hannelStateResponse\x12\x39\n\x03\x63si\x18\x01 \x03(\x0b\x32,.ns3sionna.ChannelStateResponse.ChannelState\x1a\xd2\x04\n\x0c\x43hannelState\x12\x12\n\nstart_time\x18\x01 \x01(\x04\x12\x10\n\x08\x65nd_time\x18\x02 \x01(\x04\x12H\n\x07tx_node\x18\x03 \x01(\x0b\x32\x37.ns3sionna.ChannelStateResponse.ChannelState.TxNodeInfo\x12I\n\x08rx_nodes\x18\x04 \x03(\x0b\x32\x37.ns3sionna.ChannelStateResponse.ChannelState.RxNodeInfo\x1a\x95\x01\n\nTxNodeInfo\x12\n\n\x02id\x18\x01 \x01(\r\x12P\n\x08position\x18\x02 \x01(\x0b\x32>.ns3sionna.ChannelStateResponse.ChannelState.TxNodeInfo.Vector\x1a)\n\x06Vector\x12\t\n\x01x\x18\x01 \x01(\x01\x12\t\n\x01y\x18\x02 \x01(\x01\x12\t\n\x01z\x18\x03 \x01(\x01\x1a\xee\x01\n\nRxNodeInfo\x12\n\n\x02id\x18\x01 \x01(\r\x12P\n\x08position\x18\x02 \x01(\x0b\x32>.ns3sionna.ChannelStateResponse.ChannelState.RxNodeInfo.Vector\x12\r\n\x05\x64\x65lay\x18\x03 \x01(\x04\x12\x0f\n\x07wb_loss\x18\x04 \x01(\x01\x12\x13\n\x0b\x66requencies\x18\x05 \x03(\x05\x12\x10\n\x08\x63si_real\x18\x06 \x03(\x01\x12\x10\n\x08\x63si_imag\x18\x07 \x03(\x01\x1a)\n\x06Vector\x12\t\n\x01x\x18\x01 \x01(\x01\x12\t\n\x01y\x18\x02 \x01(\x01\x12\t\n\x01z\x18\x03 \x01(\x01\"\x11\n\x0fSimCloseRequest\"\xa6\x02\n\x07Wrapper\x12\x31\n\x0csim_init_msg\x18\x01 \x01(\x0b\x32\x19.ns3sionna.SimInitMessageH\x00\x12$\n\x07sim_ack\x18\x02 \x01(\x0b\x32\x11.ns3sionna.SimAckH\x00\x12?\n\x15\x63hannel_state_request\x18\x03 \x01(\x0b\x32\x1e.ns3sionna.ChannelStateRequestH\x00\x12\x41\n\x16\x63hannel_state_response\x18\x04 \x01(\x0b\x32\x1f.ns3sionna.ChannelStateResponseH\x00\x12\x37\n\x11sim_close_request\x18\x05 \x01(\x0b\x32\x1a.ns3sionna.SimCloseRequestH\x00\x42\x05\n\x03msgb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\x12\tns3sionna\"\x83\r\n\x0eSimInitMessage\x12\x13\n\x0bscene_fname\x18\x01 \x01(\t\x12\x0c\n\x04seed\x18\x02 \x01(\x05\x12\x11\n\tfrequency\x18\x03 \x01(\r\x12\x12\n\nchannel_bw\x18\x04 \x01(\r\x12\x10\n\x08\x66\x66t_size\x18\x05 \x01(\r\x12\x1a\n\x12subcarrier_spacing\x18\x06 \x01(\r\x12\x0c\n\x04mode\x18\x07 \x01(\r\x12\x10\n\x08sub_mode\x18\x08 \x01(\r\x12\x1d\n\x15min_coherence_time_ms\x18\t \x01(\r\x12\x31\n\x05nodes\x18\n \x03(\x0b\x32\".ns3sionna.SimInitMessage.NodeInfo\x12\x12\n\ncsi_format\x18\x0b \x01(\r\x12!\n\x19path_pruning_threshold_db\x18\x0c \x01(\x01\x12\x13\n\x0bpath_angles\x18\r \x01(\x08\x12\x18\n\x10max_path_loss_db\x18\x0e \x01(\x01\x12:\n\x0cscene_states\x18\x0f \x03(\x0b\x32$.ns3sionna.SimInitMessage.SceneState\x1a\xb3\t\n\x08NodeInfo\x12\n\n\x02id\x18\x01 \x01(\r\x12[\n\x17\x63onstant_position_model\x18\x02 \x01(\x0b\x32\x38.ns3sionna.SimInitMessage.NodeInfo.ConstantPositionModelH\x00\x12O\n\x11random_walk_model\x18\x03 \x01(\x0b\x32\x32.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModelH\x00\x12\x44\n\x0btrace_model\x18\x04 \x01(\x0b\x32-.ns3sionna.SimInitMessage.NodeInfo.TraceModelH\x00\x1a)\n\x06Vector\x12\t\n\x01x\x18\x01 \x01(\x01\x12\t\n\x01y\x18\x02 \x01(\x01\x12\t\n\x01z\x18\x03 \x01(\x01\x1aT\n\x15\x43onstantPositionModel\x12;\n\x08position\x18\x01 \x01(\x0b\x32).ns3sionna.SimInitMessage.NodeInfo.Vector\x1a\xf9\x05\n\x0fRandomWalkModel\x12;\n\x08position\x18\x01 \x01(\x0b\x32).ns3sionna.SimInitMessage.NodeInfo.Vector\x12\x14\n\ntime_value\x18\x02 \x01(\x03H\x00\x12\x18\n\x0e\x64istance_value\x18\x03 \x01(\x01H\x00\x12V\n\x05speed\x18\x04 \x01(\x0b\x32G.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream\x12Z\n\tdirection\x18\x05 \x01(\x0b\x32G.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream\x1a\xbc\x03\n\x14RandomVariableStream\x12\x64\n\x08\x63onstant\x18\x01 \x01(\x0b\x32P.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.ConstantH\x00\x12\x62\n\x07uniform\x18\x02 \x01(\x0b\x32O.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.UniformH\x00\x12`\n\x06normal\x18\x03 \x01(\x0b\x32N.ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.NormalH\x00\x1a\x19\n\x08\x43onstant\x12\r\n\x05value\x18\x01 \x01(\x01\x1a#\n\x07Uniform\x12\x0b\n\x03min\x18\x01 \x01(\x01\x12\x0b\n\x03max\x18\x02 \x01(\x01\x1a(\n\x06Normal\x12\x0c\n\x04mean\x18\x01 \x01(\x01\x12\x10\n\x08variance\x18\x02 \x01(\x01\x42\x0e\n\x0c\x64istributionB\x06\n\x04mode\x1a!\n\nTraceModel\x12\x13\n\x0btrace_fname\x18\x01 \x01(\tB\x07\n\x05model\x1a/\n\nSceneState\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x13\n\x0bscene_fname\x18\x02 \x01(\t\"\x08\n\x06SimAck\"Z\n\x13\x43hannelStateRequest\x12\x0f\n\x07tx_node\x18\x01 \x01(\r\x12\x0f\n\x07rx_node\x18\x02 \x01(\r\x12\x0c\n\x04time\x18\x03 \x01(\x04\x12\x13\n\x0bscene_state\x18\x04 \x01(\t\"\xe0\x06\n\x14\x43hannelStateResponse\x12\x39\n\x03\x63si\x18\x01 \x03(\x0b\x32,.ns3sionna.ChannelStateResponse.ChannelState\x1a\x8c\x06\n\x0c\x43hannelState\x12\x12\n\nstart_time\x18\x01 \x01(\x04\x12\x10\n\x08\x65nd_time\x18\x02 \x01(\x04\x12H\n\x07tx_node\x18\x03 \x01(\x0b\x32\x37.ns3sionna.ChannelStateResponse.ChannelState.TxNodeInfo\x12I\n\x08rx_nodes\x18\x04 \x03(\x0b\x32\x37.ns3sionna.ChannelStateResponse.ChannelState.RxNodeInfo\x1a\x95\x01\n\nTxNodeInfo\x12\n\n\x02id\x18\x01 \x01(\r\x12P\n\x08position\x18\x02 \x01(\x0b\x32>.ns3sionna.ChannelStateResponse.ChannelState.TxNodeInfo.Vector\x1a)\n\x06Vector\x12\t\n\x01x\x18\x01 \x01(\x01\x12\t\n\x01y\x18\x02 \x01(\x01\x12\t\n\x01z\x18\x03 \x01(\x01\x1a\xa8\x03\n\nRxNodeInfo\x12\n\n\x02id\x18\x01 \x01(\r\x12P\n\x08position\x18\x02 \x01(\x0b\x32>.ns3sionna.ChannelStateResponse.ChannelState.RxNodeInfo.Vector\x12\r\n\x05\x64\x65lay\x18\x03 \x01(\x04\x12\x0f\n\x07wb_loss\x18\x04 \x01(\x01\x12\x13\n\x0b\x66requencies\x18\x05 \x03(\x05\x12\x10\n\x08\x63si_real\x18\x06 \x03(\x01\x12\x10\n\x08\x63si_imag\x18\x07 \x03(\x01\x12\x10\n\x08\x65nd_time\x18\x08 \x01(\x04\x12\x13\n\x0bpath_a_real\x18\t \x03(\x01\x12\x13\n\x0bpath_a_imag\x18\n \x03(\x01\x12\x12\n\npath_delay\x18\x0b \x03(\x01\x12\x14\n\x0cpath_theta_t\x18\x0c \x03(\x01\x12\x12\n\npath_phi_t\x18\r \x03(\x01\x12\x14\n\x0cpath_theta_r\x18\x0e \x03(\x01\x12\x12\n\npath_phi_r\x18\x0f \x03(\x01\x12\x14\n\x0cout_of_range\x18\x10 \x01(\x08\x1a)\n\x06Vector\x12\t\n\x01x\x18\x01 \x01(\x01\x12\t\n\x01y\x18\x02 \x01(\x01\x12\t\n\x01z\x18\x03 \x01(\x01\"\xac\x01\n\x14\x43siTimeSeriesRequest\x12\x0f\n\x07tx_node\x18\x01 \x01(\r\x12\x0f\n\x07rx_node\x18\x02 \x01(\r\x12\r\n\x05times\x18\x03 \x03(\x04\x12\x12\n\nstart_time\x18\x04 \x01(\x04\x12\x10\n\x08\x65nd_time\x18\x05 \x01(\x04\x12\x15\n\rsampling_rate\x18\x06 \x01(\x01\x12\x11\n\tmax_drift\x18\x07 \x01(\x01\x12\x13\n\x0bscene_state\x18\x08 \x01(\t\"\x9e\x01\n\x15\x43siTimeSeriesResponse\x12\x0f\n\x07tx_node\x18\x01 \x01(\r\x12\x0f\n\x07rx_node\x18\x02 \x01(\r\x12\r\n\x05times\x18\x03 \x03(\x04\x12\x13\n\x0b\x66requencies\x18\x04 \x03(\x05\x12\x0b\n\x03\x63si\x18\x05 \x01(\x0c\x12\x0f\n\x07wb_loss\x18\x06 \x03(\x01\x12\r\n\x05\x64\x65lay\x18\x07 \x03(\x04\x12\x12\n\nnum_traces\x18\x08 \x01(\r\"\x11\n\x0fSimCloseRequest\"\xb0\x03\n\x07Wrapper\x12\x31\n\x0csim_init_msg\x18\x01 \x01(\x0b\x32\x19.ns3sionna.SimInitMessageH\x00\x12$\n\x07sim_ack\x18\x02 \x01(\x0b\x32\x11.ns3sionna.SimAckH\x00\x12?\n\x15\x63hannel_state_request\x18\x03 \x01(\x0b\x32\x1e.ns3sionna.ChannelStateRequestH\x00\x12\x41\n\x16\x63hannel_state_response\x18\x04 \x01(\x0b\x32\x1f.ns3sionna.ChannelStateResponseH\x00\x12\x37\n\x11sim_close_request\x18\x05 \x01(\x0b\x32\x1a.ns3sionna.SimCloseRequestH\x00\x12\x42\n\x17\x63si_time_series_request\x18\x06 \x01(\x0b\x32\x1f.ns3sionna.CsiTimeSeriesRequestH\x00\x12\x44\n\x18\x63si_time_series_response\x18\x07 \x01(\x0b\x32 .ns3sionna.CsiTimeSeriesResponseH\x00\x42\x05\n\x03msgb\x06proto3')
 
 
 
@@ -27,6 +27,8 @@ _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM = _SIMINITMESSAGE_
 _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_CONSTANT = _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM.nested_types_by_name['Constant']
 _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_UNIFORM = _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM.nested_types_by_name['Uniform']
 _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_NORMAL = _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM.nested_types_by_name['Normal']
+_SIMINITMESSAGE_NODEINFO_TRACEMODEL = _SIMINITMESSAGE_NODEINFO.nested_types_by_name['TraceModel']
+_SIMINITMESSAGE_SCENESTATE = _SIMINITMESSAGE.nested_types_by_name['SceneState']
 _SIMACK = DESCRIPTOR.message_types_by_name['SimAck']
 _CHANNELSTATEREQUEST = DESCRIPTOR.message_types_by_name['ChannelStateRequest']
 _CHANNELSTATERESPONSE = DESCRIPTOR.message_types_by_name['ChannelStateResponse']
@@ -35,6 +37,8 @@ _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO = _CHANNELSTATERESPONSE_CHANNELSTA
 _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO_VECTOR = _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO.nested_types_by_name['Vector']
 _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO = _CHANNELSTATERESPONSE_CHANNELSTATE.nested_types_by_name['RxNodeInfo']
 _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO_VECTOR = _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO.nested_types_by_name['Vector']
+_CSITIMESERIESREQUEST = DESCRIPTOR.message_types_by_name['CsiTimeSeriesRequest']
+_CSITIMESERIESRESPONSE = DESCRIPTOR.message_types_by_name['CsiTimeSeriesResponse']
 _SIMCLOSEREQUEST = DESCRIPTOR.message_types_by_name['SimCloseRequest']
 _WRAPPER = DESCRIPTOR.message_types_by_name['Wrapper']
 SimInitMessage = _reflection.GeneratedProtocolMessageType('SimInitMessage', (_message.Message,), {
@@ -89,11 +93,25 @@ SimInitMessage = _reflection.GeneratedProtocolMessageType('SimInitMessage', (_me
       # @@protoc_insertion_point(class_scope:ns3sionna.SimInitMessage.NodeInfo.RandomWalkModel)
       })
     ,
+
+    'TraceModel' : _reflection.GeneratedProtocolMessageType('TraceModel', (_message.Message,), {
+      'DESCRIPTOR' : _SIMINITMESSAGE_NODEINFO_TRACEMODEL,
+      '__module__' : 'message_pb2'
+      # @@protoc_insertion_point(class_scope:ns3sionna.SimInitMessage.NodeInfo.TraceModel)
+      })
+    ,
     'DESCRIPTOR' : _SIMINITMESSAGE_NODEINFO,
     '__module__' : 'message_pb2'
     # @@protoc_insertion_point(class_scope:ns3sionna.SimInitMessage.NodeInfo)
     })
   ,
+
+  'SceneState' : _reflection.GeneratedProtocolMessageType('SceneState', (_message.Message,), {
+    'DESCRIPTOR' : _SIMINITMESSAGE_SCENESTATE,
+    '__module__' : 'message_pb2'
+    # @@protoc_insertion_point(class_scope:ns3sionna.SimInitMessage.SceneState)
+    })
+  ,
   'DESCRIPTOR' : _SIMINITMESSAGE,
   '__module__' : 'message_pb2'
   # @@protoc_insertion_point(class_scope:ns3sionna.SimInitMessage)
@@ -107,6 +125,8 @@ _sym_db.RegisterMessage(SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableSt
 _sym_db.RegisterMessage(SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.Constant)
 _sym_db.RegisterMessage(SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.Uniform)
 _sym_db.RegisterMessage(SimInitMessage.NodeInfo.RandomWalkModel.RandomVariableStream.Normal)
+_sym_db.RegisterMessage(SimInitMessage.NodeInfo.TraceModel)
+_sym_db.RegisterMessage(SimInitMessage.SceneState)
 
 SimAck = _reflection.GeneratedProtocolMessageType('SimAck', (_message.Message,), {
   'DESCRIPTOR' : _SIMACK,
@@ -169,6 +189,20 @@ _sym_db.RegisterMessage(ChannelStateResponse.ChannelState.TxNodeInfo.Vector)
 _sym_db.RegisterMessage(ChannelStateResponse.ChannelState.RxNodeInfo)
 _sym_db.RegisterMessage(ChannelStateResponse.ChannelState.RxNodeInfo.Vector)
 
+CsiTimeSeriesRequest = _reflection.GeneratedProtocolMessageType('CsiTimeSeriesRequest', (_message.Message,), {
+  'DESCRIPTOR' : _CSITIMESERIESREQUEST,
+  '__module__' : 'message_pb2'
+  # @@protoc_insertion_point(class_scope:ns3sionna.CsiTimeSeriesRequest)
+  })
+_sym_db.RegisterMessage(CsiTimeSeriesRequest)
+
+CsiTimeSeriesResponse = _reflection.GeneratedProtocolMessageType('CsiTimeSeriesResponse', (_message.Message,), {
+  'DESCRIPTOR' : _CSITIMESERIESRESPONSE,
+  '__module__' : 'message_pb2'
+  # @@protoc_insertion_point(class_scope:ns3sionna.CsiTimeSeriesResponse)
+  })
+_sym_db.RegisterMessage(CsiTimeSeriesResponse)
+
 SimCloseRequest = _reflection.GeneratedProtocolMessageType('SimCloseRequest', (_message.Message,), {
   'DESCRIPTOR' : _SIMCLOSEREQUEST,
   '__module__' : 'message_pb2'
@@ -187,41 +221,49 @@ if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
   _SIMINITMESSAGE._serialized_start=29
-  _SIMINITMESSAGE._serialized_end=1380
-  _SIMINITMESSAGE_NODEINFO._serialized_start=282
-  _SIMINITMESSAGE_NODEINFO._serialized_end=1380
-  _SIMINITMESSAGE_NODEINFO_VECTOR._serialized_start=480
-  _SIMINITMESSAGE_NODEINFO_VECTOR._serialized_end=521
-  _SIMINITMESSAGE_NODEINFO_CONSTANTPOSITIONMODEL._serialized_start=523
-  _SIMINITMESSAGE_NODEINFO_CONSTANTPOSITIONMODEL._serialized_end=607
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL._serialized_start=610
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL._serialized_end=1371
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM._serialized_start=919
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM._serialized_end=1363
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_CONSTANT._serialized_start=1243
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_CONSTANT._serialized_end=1268
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_UNIFORM._serialized_start=1270
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_UNIFORM._serialized_end=1305
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_NORMAL._serialized_start=1307
-  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_NORMAL._serialized_end=1347
-  _SIMACK._serialized_start=1382
-  _SIMACK._serialized_end=1390
-  _CHANNELSTATEREQUEST._serialized_start=1392
-  _CHANNELSTATEREQUEST._serialized_end=1461
-  _CHANNELSTATERESPONSE._serialized_start=1464
-  _CHANNELSTATERESPONSE._serialized_end=2142
-  _CHANNELSTATERESPONSE_CHANNELSTATE._serialized_start=1548
-  _CHANNELSTATERESPONSE_CHANNELSTATE._serialized_end=2142
-  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO._serialized_start=1752
-  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO._serialized_end=1901
-  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO_VECTOR._serialized_start=480
-  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO_VECTOR._serialized_end=521
-  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO._serialized_start=1904
-  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO._serialized_end=2142
-  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO_VECTOR._serialized_start=480
-  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO_VECTOR._serialized_end=521
-  _SIMCLOSEREQUEST._serialized_start=2144
-  _SIMCLOSEREQUEST._serialized_end=2161
-  _WRAPPER._serialized_start=2164
-  _WRAPPER._serialized_end=2458
+  _SIMINITMESSAGE._serialized_end=1696
+  _SIMINITMESSAGE_NODEINFO._serialized_start=444
+  _SIMINITMESSAGE_NODEINFO._serialized_end=1647
+  _SIMINITMESSAGE_NODEINFO_VECTOR._serialized_start=712
+  _SIMINITMESSAGE_NODEINFO_VECTOR._serialized_end=753
+  _SIMINITMESSAGE_NODEINFO_CONSTANTPOSITIONMODEL._serialized_start=755
+  _SIMINITMESSAGE_NODEINFO_CONSTANTPOSITIONMODEL._serialized_end=839
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL._serialized_start=842
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL._serialized_end=1603
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM._serialized_start=1151
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM._serialized_end=1595
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_CONSTANT._serialized_start=1475
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_CONSTANT._serialized_end=1500
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_UNIFORM._serialized_start=1502
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_UNIFORM._serialized_end=1537
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_NORMAL._serialized_start=1539
+  _SIMINITMESSAGE_NODEINFO_RANDOMWALKMODEL_RANDOMVARIABLESTREAM_NORMAL._serialized_end=1579
+  _SIMINITMESSAGE_NODEINFO_TRACEMODEL._serialized_start=1605
+  _SIMINITMESSAGE_NODEINFO_TRACEMODEL._serialized_end=1638
+  _SIMINITMESSAGE_SCENESTATE._serialized_start=1649
+  _SIMINITMESSAGE_SCENESTATE._serialized_end=1696
+  _SIMACK._serialized_start=1698
+  _SIMACK._serialized_end=1706
+  _CHANNELSTATEREQUEST._serialized_start=1708
+  _CHANNELSTATEREQUEST._serialized_end=1798
+  _CHANNELSTATERESPONSE._serialized_start=1801
+  _CHANNELSTATERESPONSE._serialized_end=2665
+  _CHANNELSTATERESPONSE_CHANNELSTATE._serialized_start=1885
+  _CHANNELSTATERESPONSE_CHANNELSTATE._serialized_end=2665
+  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO._serialized_start=2089
+  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO._serialized_end=2238
+  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO_VECTOR._serialized_start=712
+  _CHANNELSTATERESPONSE_CHANNELSTATE_TXNODEINFO_VECTOR._serialized_end=753
+  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO._serialized_start=2241
+  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO._serialized_end=2665
+  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO_VECTOR._serialized_start=712
+  _CHANNELSTATERESPONSE_CHANNELSTATE_RXNODEINFO_VECTOR._serialized_end=753
+  _CSITIMESERIESREQUEST._serialized_start=2668
+  _CSITIMESERIESREQUEST._serialized_end=2840
+  _CSITIMESERIESRESPONSE._serialized_start=2843
+  _CSITIMESERIESRESPONSE._serialized_end=3001
+  _SIMCLOSEREQUEST._serialized_start=3003
+  _SIMCLOSEREQUEST._serialized_end=3020
+  _WRAPPER._serialized_start=3023
+  _WRAPPER._serialized_end=3455
 # @@protoc_insertion_point(module_scope)
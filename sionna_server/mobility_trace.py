@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+
+
+class MobilityTrace:
+    """
+    Trajectory of a trace-driven node, i.e. waypoints (time, x, y, z) between which the node moves linearly.
+
+    The trace is stored as a binary .npy file with shape (4, N) holding the times (in ns) and the x, y, z
+    coordinates. It is memory-mapped, so that even long traces are neither parsed nor copied per request, and
+    queried by binary search. Before the first waypoint the node rests at the first position and after the last
+    waypoint at the last position.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.data = np.load(fname, mmap_mode='r')
+        if self.data.ndim != 2 or self.data.shape[0] != 4 or self.data.shape[1] == 0:
+            raise ValueError(f"Invalid trace file {fname}: expected shape (4, N), got {self.data.shape}")
+
+        self.times = self.data[0]
+        self.positions = self.data[1:]
+        self.num_points = self.data.shape[1]
+
+        # max speed of the trace used to estimate the coherence time
+        dt = np.diff(self.times) / 1e9
+        dp = np.linalg.norm(np.diff(self.positions, axis=1), axis=0)
+        moving = dt > 0
+        self.max_speed = float(np.max(dp[moving] / dt[moving])) if np.any(moving) else 0.0
+
+    def lookup(self, time):
+        """
+        Returns the position and velocity at the given time (in ns) and the time left until
+        the next waypoint (in ns); after the last waypoint the node stays where it is forever
+        """
+        i = int(np.searchsorted(self.times, time, side='right')) - 1
+
+        if i < 0:
+            return np.array(self.positions[:, 0]), np.zeros(3), int(self.times[0] - time)
+        if i + 1 >= self.num_points:
+            return np.array(self.positions[:, -1]), np.zeros(3), np.iinfo(np.int64).max
+
+        t0, t1 = self.times[i], self.times[i + 1]
+        velocity = (self.positions[:, i + 1] - self.positions[:, i]) / ((t1 - t0) / 1e9)
+        position = self.positions[:, i] + velocity * ((time - t0) / 1e9)
+        return position, velocity, int(t1 - time)
+
+    def nbytes(self):
+        return self.data.nbytes
+
+
+# traces already mapped, shared by all nodes referencing the same file
+_loaded_traces = dict()
+
+
+def convert_trace(fname):
+    """
+    Converts a CSV trace (time in seconds, x, y, z per row; lines starting with # are ignored) into the binary
+    format used by MobilityTrace. The binary file is written next to the CSV file and only rebuilt if the
+    CSV file changed. Returns the name of the binary file.
+    """
+    if fname.endswith('.npy'):
+        return fname
+
+    npy_fname = fname + '.npy'
+    if os.path.exists(npy_fname) and os.path.getmtime(npy_fname) >= os.path.getmtime(fname):
+        return npy_fname
+
+    rows = np.loadtxt(fname, delimiter=',', comments='#', ndmin=2)
+    if rows.shape[1] != 4:
+        raise ValueError(f"Invalid trace file {fname}: expected 4 columns (time, x, y, z), got {rows.shape[1]}")
+
+    rows = rows[np.argsort(rows[:, 0], kind='stable')]
+    data = np.empty((4, len(rows)), dtype=np.float64)
+    data[0] = np.round(rows[:, 0] * 1e9) # s -> ns
+    data[1:] = rows[:, 1:].T
+
+    # write atomically as several servers may share the trace
+    tmp_fname = f"{npy_fname}.{os.getpid()}.tmp"
+    with open(tmp_fname, 'wb') as f:
+        np.save(f, data)
+    os.replace(tmp_fname, npy_fname)
+
+    return npy_fname
+
+
+def load_trace(fname):
+    """
+    Returns the memory-mapped trace of the given CSV or .npy file
+    """
+    fname = os.path.abspath(fname)
+    if fname not in _loaded_traces:
+        _loaded_traces[fname] = MobilityTrace(convert_trace(fname))
+    return _loaded_traces[fname]
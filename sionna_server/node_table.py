@@ -0,0 +1,226 @@
+import os
+
+import numpy as np
+
+from mobility_trace import load_trace
+
+
+class NodeTable:
+    """
+    Struct-of-arrays table holding the mobility state of all nodes. Each node is stored in a slot and all
+    per-node values (positions, velocities, timers, mobility model parameters) are NumPy arrays indexed by
+    that slot, so that state updates and lookups can be done for many nodes at once.
+
+    Also holds the cache of already computed positions/velocities used in mode 2/3 where each node keeps a
+    ring buffer of (time, ttl, position, velocity) entries.
+
+    Speeds and directions are drawn from per-node counter-based random streams (Philox keyed by the seed and
+    the node ID). The k-th course change of a node always uses the k-th draw of its own stream, so mobility
+    is reproducible regardless of the order in which nodes are queried. Draws are made in blocks of
+    draw_block_size values per node.
+
+    Trace-driven nodes reference a memory-mapped MobilityTrace (see traces) instead of per-node arrays.
+    """
+
+    # mobility models
+    MODEL_CONSTANT_POSITION = 0
+    MODEL_RANDOM_WALK = 1
+    MODEL_TRACE = 2
+    MODEL_NAMES = {MODEL_CONSTANT_POSITION: "Constant Position", MODEL_RANDOM_WALK: "Random Walk",
+                   MODEL_TRACE: "Trace"}
+
+    # condition to change speed and direction of a random walk
+    WALK_MODE_NONE = 0
+    WALK_MODE_TIME = 1
+    WALK_MODE_DISTANCE = 2
+
+    # distributions of random variable streams
+    DIST_CONSTANT = 0
+    DIST_UNIFORM = 1
+    DIST_NORMAL = 2
+    DIST_NAMES = {DIST_CONSTANT: "Constant", DIST_UNIFORM: "Uniform", DIST_NORMAL: "Normal"}
+
+    # distance between two blocks of a random stream in Philox counter steps
+    DRAW_BLOCK_STRIDE = 2 ** 32
+
+    def __init__(self, node_ids, cache_capacity=16, seed=0, draw_block_size=32):
+        num_nodes = len(node_ids)
+        self.ids = np.array(node_ids, dtype=np.int64)
+        self.slot_of = {int(node_id): slot for slot, node_id in enumerate(node_ids)}
+
+        self.model = np.full(num_nodes, self.MODEL_CONSTANT_POSITION, dtype=np.int8)
+        self.position = np.zeros((num_nodes, 3), dtype=np.float64)
+        self.velocity = np.zeros((num_nodes, 3), dtype=np.float64)
+        self.last_update = np.zeros(num_nodes, dtype=np.float64) # in ns
+        self.delay_left = np.zeros(num_nodes, dtype=np.float64) # in ns
+
+        self.walk_mode = np.full(num_nodes, self.WALK_MODE_NONE, dtype=np.int8)
+        self.walk_mode_value = np.zeros(num_nodes, dtype=np.float64) # ns or m
+        # distribution code and the two distribution parameters (value/min/mean, max/variance)
+        self.speed_dist = np.full(num_nodes, self.DIST_CONSTANT, dtype=np.int8)
+        self.speed_params = np.zeros((num_nodes, 2), dtype=np.float64)
+        self.direction_dist = np.full(num_nodes, self.DIST_CONSTANT, dtype=np.int8)
+        self.direction_params = np.zeros((num_nodes, 2), dtype=np.float64)
+        self.traces = dict() # slot -> MobilityTrace of trace-driven nodes
+
+        # per-node random streams and the pre-drawn speeds/directions of the current block
+        self.rng_key = np.array([np.random.SeedSequence([seed, int(node_id)]).generate_state(2, dtype=np.uint64)
+                                 for node_id in node_ids], dtype=np.uint64).reshape(num_nodes, 2)
+        self.draw_count = np.zeros(num_nodes, dtype=np.int64) # no. of course changes so far
+        self.draw_block = np.full(num_nodes, -1, dtype=np.int64) # block currently held in the draw buffers
+        self.speed_draws = np.zeros((num_nodes, draw_block_size), dtype=np.float64)
+        self.direction_draws = np.zeros((num_nodes, draw_block_size), dtype=np.float64)
+
+        # cache of computed positions/velocities (ring buffer per node)
+        self.cache_time = np.full((num_nodes, cache_capacity), np.nan, dtype=np.float64)
+        self.cache_ttl = np.zeros((num_nodes, cache_capacity), dtype=np.float64)
+        self.cache_position = np.zeros((num_nodes, cache_capacity, 3), dtype=np.float64)
+        self.cache_velocity = np.zeros((num_nodes, cache_capacity, 3), dtype=np.float64)
+        self.cache_next = np.zeros(num_nodes, dtype=np.int64)
+
+    @classmethod
+    def from_sim_init(cls, simulation_info, cache_capacity=16, trace_dir="."):
+        """
+        Creates the table from the node information of a SimInitMessage; relative trace file
+        names are resolved against trace_dir
+        """
+        table = cls([node_info.id for node_info in simulation_info.nodes], cache_capacity, seed=simulation_info.seed)
+
+        for slot, node_info in enumerate(simulation_info.nodes):
+            if node_info.HasField("constant_position_model"):
+                position = node_info.constant_position_model.position
+                table.position[slot] = [position.x, position.y, position.z]
+
+            elif node_info.HasField("random_walk_model"):
+                random_walk_model = node_info.random_walk_model
+                position = random_walk_model.position
+
+                table.model[slot] = cls.MODEL_RANDOM_WALK
+                table.position[slot] = [position.x, position.y, position.z]
+
+                if random_walk_model.HasField("time_value"):
+                    table.walk_mode[slot] = cls.WALK_MODE_TIME
+                    table.walk_mode_value[slot] = random_walk_model.time_value
+                elif random_walk_model.HasField("distance_value"):
+                    table.walk_mode[slot] = cls.WALK_MODE_DISTANCE
+                    table.walk_mode_value[slot] = random_walk_model.distance_value
+
+                table.speed_dist[slot], table.speed_params[slot] = cls._parse_stream(random_walk_model.speed)
+                table.direction_dist[slot], table.direction_params[slot] = cls._parse_stream(random_walk_model.direction)
+
+            elif node_info.HasField("trace_model"):
+                trace = load_trace(os.path.join(trace_dir, node_info.trace_model.trace_fname))
+
+                table.model[slot] = cls.MODEL_TRACE
+                table.traces[slot] = trace
+                table.position[slot], table.velocity[slot], _ = trace.lookup(0)
+
+        # pre-draw the first block of speeds and directions of all mobile nodes
+        for slot in np.flatnonzero(table.model == cls.MODEL_RANDOM_WALK):
+            table.draw(slot, 0)
+
+        return table
+
+    @classmethod
+    def _parse_stream(cls, stream):
+        if stream.HasField("uniform"):
+            return cls.DIST_UNIFORM, (stream.uniform.min, stream.uniform.max)
+        elif stream.HasField("normal"):
+            return cls.DIST_NORMAL, (stream.normal.mean, stream.normal.variance)
+        elif stream.HasField("constant"):
+            return cls.DIST_CONSTANT, (stream.constant.value, 0.0)
+        return cls.DIST_CONSTANT, (0.0, 0.0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def slots(self, node_ids):
+        return np.array([self.slot_of[int(node_id)] for node_id in node_ids], dtype=np.int64)
+
+    def is_mobile(self, slot):
+        return self.model[slot] == self.MODEL_RANDOM_WALK
+
+    def is_trace(self, slot):
+        return self.model[slot] == self.MODEL_TRACE
+
+    def max_trace_speed(self):
+        return max((trace.max_speed for trace in self.traces.values()), default=0.0)
+
+    def model_name(self, slot):
+        return self.MODEL_NAMES[int(self.model[slot])]
+
+    def draw(self, slot, block):
+        """
+        Fills the draw buffers of a node with the given block of its random stream
+        """
+        bit_generator = np.random.Philox(key=self.rng_key[slot])
+        bit_generator.advance(block * self.DRAW_BLOCK_STRIDE)
+        generator = np.random.Generator(bit_generator)
+
+        size = self.speed_draws.shape[1]
+        self.speed_draws[slot] = self._draw_values(generator, self.speed_dist[slot], self.speed_params[slot], size)
+        self.direction_draws[slot] = self._draw_values(generator, self.direction_dist[slot],
+                                                       self.direction_params[slot], size)
+        self.draw_block[slot] = block
+
+    @classmethod
+    def _draw_values(cls, generator, distribution, params, size):
+        if distribution == cls.DIST_UNIFORM:
+            return generator.uniform(params[0], params[1], size)
+        elif distribution == cls.DIST_NORMAL:
+            return generator.normal(params[0], np.sqrt(params[1]), size)
+        return np.full(size, params[0])
+
+    def next_course(self, slot):
+        """
+        Returns speed and direction for the next course change of a node
+        """
+        block, index = divmod(int(self.draw_count[slot]), self.speed_draws.shape[1])
+        if self.draw_block[slot] != block:
+            self.draw(slot, block)
+
+        self.draw_count[slot] += 1
+        return self.speed_draws[slot, index], self.direction_draws[slot, index]
+
+    def nbytes(self):
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    def cache_lookup(self, slots, simulation_time, max_distance):
+        """
+        Looks up cached positions/velocities for the given node slots at simulation_time. An entry matches if
+        the middle of its validity is at most max_distance (in ns) away; the closest entry is used.
+        Returns a mask of the slots found as well as their positions and velocities.
+        """
+        middle = self.cache_time[slots] + self.cache_ttl[slots] / 2.0
+        metric = np.abs(middle - simulation_time)
+        metric[~(metric <= max_distance)] = np.inf # also drops empty (NaN) entries
+
+        best = np.argmin(metric, axis=1)
+        found = np.isfinite(metric[np.arange(len(slots)), best])
+
+        position = self.cache_position[slots, best]
+        velocity = self.cache_velocity[slots, best]
+        return found, position, velocity
+
+    def cache_store(self, slots, simulation_time, ttl, positions, velocities):
+        """
+        Adds a cache entry valid from simulation_time for ttl ns for each of the given slots
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        index = self.cache_next[slots]
+        self.cache_time[slots, index] = simulation_time
+        self.cache_ttl[slots, index] = ttl
+        self.cache_position[slots, index] = positions
+        self.cache_velocity[slots, index] = velocities
+        self.cache_next[slots] = (index + 1) % self.cache_time.shape[1]
+
+    def cache_expire(self, oldest_time):
+        """
+        Removes all cache entries whose validity ended before oldest_time
+        """
+        expired = self.cache_time + self.cache_ttl < oldest_time
+        self.cache_time[expired] = np.nan
+
+    def cached_times(self, slot):
+        times = self.cache_time[slot]
+        return np.sort(times[~np.isnan(times)])
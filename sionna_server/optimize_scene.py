@@ -0,0 +1,365 @@
+import argparse
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from scene_roi import PLY_TYPES, read_scene_xml
+
+
+def read_ply(fname):
+    """
+    Reads the vertices and faces of a PLY mesh; polygons are split into triangles
+    :param fname: file name of the mesh
+    :return: vertices of shape [num_vertices, 3], triangles of shape [num_triangles, 3]
+    """
+    with open(fname, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError("%s is not a PLY file" % fname)
+
+        fmt = None
+        elements = [] # (name, count, properties)
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("%s has no end of header" % fname)
+            words = line.decode('ascii', 'replace').split()
+            if len(words) == 0:
+                continue
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property' and len(elements) > 0:
+                elements[-1][2].append(words[1:])
+            elif words[0] == 'end_header':
+                break
+        data = f.read()
+
+    if fmt == 'ascii':
+        return read_ascii_ply(fname, data, elements)
+    if fmt not in ('binary_little_endian', 'binary_big_endian'):
+        raise ValueError("%s has the unsupported format %s" % (fname, fmt))
+
+    order = '<' if fmt == 'binary_little_endian' else '>'
+    offset = 0
+    vertices, triangles = None, np.zeros((0, 3), dtype=np.int64)
+    for name, count, properties in elements:
+        if all(p[0] != 'list' for p in properties):
+            dtype = np.dtype([(p[1], order + PLY_TYPES[p[0]]) for p in properties])
+            values = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += dtype.itemsize * count
+            if name == 'vertex':
+                vertices = np.stack([values['x'], values['y'], values['z']], axis=-1).astype(np.float64)
+            continue
+
+        if name != 'face' or len(properties) != 1:
+            raise ValueError("%s has the unsupported element %s" % (fname, name))
+        count_type, index_type = order + PLY_TYPES[properties[0][1]], order + PLY_TYPES[properties[0][2]]
+        # all triangles (as exported from Blender) are read at once
+        dtype = np.dtype([('n', count_type), ('i', index_type, 3)])
+        if offset + dtype.itemsize * count <= len(data):
+            faces = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            if np.all(faces['n'] == 3):
+                triangles = faces['i'].astype(np.int64)
+                offset += dtype.itemsize * count
+                continue
+        polygons = []
+        for _ in range(count):
+            n = int(np.frombuffer(data, dtype=count_type, count=1, offset=offset)[0])
+            offset += np.dtype(count_type).itemsize
+            polygons.append(np.frombuffer(data, dtype=index_type, count=n, offset=offset).astype(np.int64))
+            offset += np.dtype(index_type).itemsize * n
+        triangles = triangulate(polygons)
+
+    if vertices is None:
+        raise ValueError("%s has no vertices" % fname)
+    return vertices, triangles
+
+
+def read_ascii_ply(fname, data, elements):
+    tokens = iter(data.decode('ascii', 'replace').split())
+    vertices, polygons = None, []
+    for name, count, properties in elements:
+        if name == 'face' and len(properties) == 1 and properties[0][0] == 'list':
+            for _ in range(count):
+                n = int(next(tokens))
+                polygons.append(np.array([int(next(tokens)) for _ in range(n)], dtype=np.int64))
+            continue
+        if any(p[0] == 'list' for p in properties):
+            raise ValueError("%s has the unsupported element %s" % (fname, name))
+        values = np.array([float(next(tokens)) for _ in range(count * len(properties))]).reshape(count, -1)
+        if name == 'vertex':
+            names = [p[1] for p in properties]
+            vertices = values[:, [names.index('x'), names.index('y'), names.index('z')]]
+    if vertices is None:
+        raise ValueError("%s has no vertices" % fname)
+    return vertices, triangulate(polygons)
+
+
+def read_obj(fname):
+    """
+    Reads the vertices and faces of a Wavefront OBJ mesh; polygons are split into triangles
+    :param fname: file name of the mesh
+    :return: vertices of shape [num_vertices, 3], triangles of shape [num_triangles, 3]
+    """
+    vertices, polygons = [], []
+    with open(fname, 'r', errors='replace') as f:
+        for line in f:
+            words = line.split()
+            if len(words) == 0:
+                continue
+            if words[0] == 'v':
+                vertices.append([float(x) for x in words[1:4]])
+            elif words[0] == 'f':
+                # v, v/vt, v/vt/vn or v//vn; negative indices are relative to the last vertex
+                indices = np.array([int(w.split('/')[0]) for w in words[1:]], dtype=np.int64)
+                polygons.append(np.where(indices > 0, indices - 1, len(vertices) + indices))
+    return np.array(vertices, dtype=np.float64).reshape(-1, 3), triangulate(polygons)
+
+
+# mesh readers per shape type
+MESH_READERS = {'ply': read_ply, 'obj': read_obj}
+
+
+def triangulate(polygons):
+    '''
+    Splits convex polygons into triangle fans
+    '''
+    triangles = [np.stack([np.full(len(p) - 2, p[0]), p[1:-1], p[2:]], axis=-1) for p in polygons if len(p) >= 3]
+    if len(triangles) == 0:
+        return np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(triangles).astype(np.int64)
+
+
+def write_ply(fname, vertices, triangles):
+    """
+    Writes a mesh as binary little endian PLY
+    :param fname: file name of the mesh
+    :param vertices: shape [num_vertices, 3]
+    :param triangles: shape [num_triangles, 3]
+    """
+    header = ("ply\nformat binary_little_endian 1.0\nelement vertex %d\nproperty float x\nproperty float y\n"
+              "property float z\nelement face %d\nproperty list uchar int vertex_indices\nend_header\n"
+              % (len(vertices), len(triangles)))
+    faces = np.zeros(len(triangles), dtype=np.dtype([('n', 'u1'), ('i', '<i4', 3)]))
+    faces['n'] = 3
+    faces['i'] = triangles
+    with open(fname, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(np.ascontiguousarray(vertices, dtype='<f4').tobytes())
+        f.write(faces.tobytes())
+
+
+def simplify(vertices, triangles, max_error):
+    """
+    Welds identical vertices and, if max_error > 0, clusters all vertices within cells of a grid of
+    max_error / sqrt(3) to their mean, i.e. no vertex moves by more than max_error. Triangles which
+    collapse or occur twice are removed.
+    :param vertices: shape [num_vertices, 3]
+    :param triangles: shape [num_triangles, 3]
+    :param max_error: max. displacement of a vertex in m
+    :return: vertices, triangles
+    """
+    if max_error > 0:
+        keys = np.floor(vertices / (max_error / np.sqrt(3))).astype(np.int64)
+    else:
+        keys = vertices
+    _, cluster, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.reshape(-1)
+    new_vertices = np.zeros((len(counts), 3))
+    np.add.at(new_vertices, cluster, vertices)
+    new_vertices /= counts[:, None]
+
+    triangles = cluster[triangles]
+    valid = ((triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+             & (triangles[:, 0] != triangles[:, 2]))
+    triangles = triangles[valid]
+    # both sides of a surface interact with the rays, so triangles with opposite orientation are duplicates
+    _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    triangles = triangles[np.sort(first)]
+
+    # drop the vertices no longer referenced
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return new_vertices[used], triangles.reshape(-1, 3)
+
+
+def optimize_scene(fname, out_fname, max_error=0.0):
+    """
+    Writes a copy of a Mitsuba scene in which all meshes with the same radio material are merged into a
+    single binary PLY mesh, optionally simplified. Shapes which cannot be merged (analytic shapes, shapes
+    with own transforms or inline materials, unsupported mesh types) are kept as they are.
+    :param fname: file name of the scene
+    :param out_fname: file name of the optimized scene; the meshes are written to meshes_optimized/ next to it
+    :param max_error: max. displacement of a vertex in m by the simplification; 0 only welds identical vertices,
+    None keeps the merged meshes as they are
+    :return: dict of statistics
+    """
+    root = read_scene_xml(fname)
+    scene_dir = os.path.dirname(os.path.abspath(fname))
+    out_dir = os.path.dirname(os.path.abspath(out_fname))
+    mesh_dir = os.path.join(out_dir, "meshes_optimized")
+    os.makedirs(mesh_dir, exist_ok=True)
+    stats = dict(shapes=0, merged_shapes=0, vertices=0, triangles=0, bytes=0)
+
+    groups = dict() # (material, face normals) -> [(shape, vertices, triangles)]
+    for shape in root.findall('shape'):
+        stats['shapes'] += 1
+        filename = shape.find("string[@name='filename']")
+        material = shape.find("ref[@name='bsdf']")
+        read_mesh = MESH_READERS.get(shape.get('type'))
+        if filename is not None:
+            mesh_fname = os.path.join(scene_dir, filename.get('value'))
+            filename.set('value', os.path.relpath(mesh_fname, out_dir))
+        if filename is None or material is None or read_mesh is None or shape.find('transform') is not None:
+            continue
+
+        vertices, triangles = read_mesh(mesh_fname)
+        stats['vertices'] += len(vertices)
+        stats['triangles'] += len(triangles)
+        stats['bytes'] += os.path.getsize(mesh_fname)
+        face_normals = shape.find("boolean[@name='face_normals']")
+        key = (material.get('id'), face_normals is not None and face_normals.get('value') == 'true')
+        groups.setdefault(key, []).append((shape, vertices, triangles))
+
+    stats['merged_vertices'], stats['merged_triangles'], stats['merged_bytes'] = 0, 0, 0
+    for (material, face_normals), members in groups.items():
+        offsets = np.cumsum([0] + [len(vertices) for _, vertices, _ in members])
+        vertices = np.concatenate([vertices for _, vertices, _ in members])
+        triangles = np.concatenate([triangles + offset for (_, _, triangles), offset in zip(members, offsets)])
+        if max_error is not None:
+            vertices, triangles = simplify(vertices, triangles, max_error)
+
+        # the name of the object in Sionna is the shape id without the "mesh-" prefix
+        name = "merged-" + (material[4:] if material.startswith("mat-") else material)
+        if not face_normals:
+            name += "-smooth"
+        mesh_fname = os.path.join(mesh_dir, name + ".ply")
+        write_ply(mesh_fname, vertices, triangles)
+        stats['merged_shapes'] += 1
+        stats['merged_vertices'] += len(vertices)
+        stats['merged_triangles'] += len(triangles)
+        stats['merged_bytes'] += os.path.getsize(mesh_fname)
+
+        position = list(root).index(members[0][0])
+        for shape, _, _ in members:
+            root.remove(shape)
+        shape = ET.Element('shape', type='ply', id="mesh-" + name)
+        ET.SubElement(shape, 'string', name='filename', value=os.path.relpath(mesh_fname, out_dir))
+        if face_normals:
+            ET.SubElement(shape, 'boolean', name='face_normals', value='true')
+        ET.SubElement(shape, 'ref', id=material, name='bsdf')
+        root.insert(position, shape)
+
+    stats['merged_shapes'] += stats['shapes'] - sum(len(members) for members in groups.values())
+    ET.indent(root, space='\t')
+    ET.ElementTree(root).write(out_fname)
+    return stats
+
+
+def sample_links(fname, num_links, height, seed=0):
+    '''
+    Draws num_links pairs of TX/RX positions at height above the ground uniformly within the scene
+    '''
+    import mitsuba as mi
+    mi.set_variant('scalar_rgb')
+    bbox = mi.load_file(fname, parallel=False).bbox()
+    rng = np.random.default_rng(seed)
+    lo, hi = np.array(bbox.min)[:2], np.array(bbox.max)[:2]
+    z = np.array(bbox.min)[2] + height
+    positions = [np.hstack([rng.uniform(lo, hi, size=(num_links, 2)), np.full((num_links, 1), z)]) for _ in range(2)]
+    return positions[0], positions[1]
+
+
+def benchmark(fname, tx_positions, rx_positions, args):
+    '''
+    Loads a scene with Mitsuba and Sionna and traces all sample links; returns the load times, the ray
+    tracing time and per link (delay of the first path in ns, wideband loss in dB)
+    '''
+    import mitsuba as mi
+    from sionna.rt import load_scene, Transmitter, Receiver, PlanarArray
+    from sionna.rt.antenna import iso_pattern
+    from sionna_utils import wideband_power
+
+    mi.set_variant('scalar_rgb')
+    start = time.time()
+    mi.load_file(fname, parallel=False)
+    mi_load_time = time.time() - start
+
+    start = time.time()
+    scene = load_scene(fname)
+    load_time = time.time() - start
+    scene.tx_array = PlanarArray(num_rows=1, num_cols=1, vertical_spacing=0.5, horizontal_spacing=0.5,
+                                 pattern=iso_pattern)
+    scene.rx_array = scene.tx_array
+    scene.frequency = args.frequency * 1e6
+    scene.synthetic_array = True
+    for i in range(len(tx_positions)):
+        scene.add(Transmitter(name="tx%d" % i, position=tx_positions[i]))
+        scene.add(Receiver(name="rx%d" % i, position=rx_positions[i]))
+
+    start = time.time()
+    paths = scene.compute_paths(max_depth=args.max_depth, method="fibonacci", num_samples=args.num_samples, los=True,
+                                reflection=True, diffraction=args.diffraction, scattering=False)
+    paths.normalize_delays = False
+    a, tau = paths.cir()
+    a, tau = a.numpy(), tau.numpy()
+    rt_time = time.time() - start
+
+    links = []
+    for i in range(len(tx_positions)):
+        a_lnk, tau_lnk = a[0, i, 0, i, 0, :, 0], tau[0, i, i, :]
+        if not np.any(tau_lnk >= 0):
+            links.append(None)
+            continue
+        power = wideband_power(a_lnk, tau_lnk, args.subcarrier_spacing, args.fft_size)
+        links.append((np.min(tau_lnk[tau_lnk >= 0]) * 1e9, -10 * np.log10(power)))
+    return mi_load_time, load_time, rt_time, links
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merges the meshes of a scene per radio material and optionally "
+                                                 "simplifies them; reports the savings and the channel deviation")
+    parser.add_argument("scene", help="File name of the Mitsuba scene")
+    parser.add_argument("--out", help="File name of the optimized scene (default: <scene>_optimized.xml)")
+    parser.add_argument("--max_error", type=float, default=0.0,
+                        help="Max. displacement of a vertex in m by the simplification (0 = no simplification)")
+    parser.add_argument("--num_links", type=int, default=20, help="No. of random links to compare (0 = no comparison)")
+    parser.add_argument("--height", type=float, default=1.5, help="Height of the random nodes above the ground in m")
+    parser.add_argument("--max_depth", type=int, default=3, help="Max. depth of the ray tracing for the comparison")
+    parser.add_argument("--num_samples", type=int, default=int(1e6), help="No. of rays per source for the comparison")
+    parser.add_argument("--diffraction", action='store_true', help="Compute diffraction in the comparison")
+    parser.add_argument("--frequency", type=float, default=5180, help="Carrier frequency in MHz")
+    parser.add_argument("--fft_size", type=int, default=64, help="No. of subcarriers for the wideband loss")
+    parser.add_argument("--subcarrier_spacing", type=float, default=312500, help="Subcarrier spacing in Hz")
+    args = parser.parse_args()
+
+    out_fname = args.out if args.out else os.path.splitext(args.scene)[0] + "_optimized.xml"
+    start = time.time()
+    stats = optimize_scene(args.scene, out_fname, args.max_error)
+    print("Optimized scene written to %s in %.2fs" % (out_fname, time.time() - start))
+    print("  shapes: %d -> %d, vertices: %d -> %d, triangles: %d -> %d, mesh files: %.2f MB -> %.2f MB"
+          % (stats['shapes'], stats['merged_shapes'], stats['vertices'], stats['merged_vertices'],
+             stats['triangles'], stats['merged_triangles'], stats['bytes'] / 1e6, stats['merged_bytes'] / 1e6))
+
+    if args.num_links > 0:
+        tx_positions, rx_positions = sample_links(args.scene, args.num_links, args.height)
+        results = [benchmark(f, tx_positions, rx_positions, args) for f in (args.scene, out_fname)]
+        for label, i in (("Mitsuba load", 0), ("Sionna load", 1), ("Ray tracing", 2)):
+            print("  %s: %.2fs -> %.2fs (%.1fx)" % (label, results[0][i], results[1][i],
+                                                  results[0][i] / max(results[1][i], 1e-9)))
+
+        delay_errors, loss_errors, lost_links = [], [], 0
+        for original, optimized in zip(results[0][3], results[1][3]):
+            if original is None or optimized is None:
+                lost_links += original is not optimized
+                continue
+            delay_errors.append(abs(optimized[0] - original[0]))
+            loss_errors.append(abs(optimized[1] - original[1]))
+        if len(loss_errors) > 0:
+            print("  deviation on %d links: loss mean %.2f dB, max %.2f dB; delay mean %.2f ns, max %.2f ns"
+                  % (len(loss_errors), np.mean(loss_errors), np.max(loss_errors), np.mean(delay_errors),
+                     np.max(delay_errors)))
+        if lost_links > 0:
+            print("  %d links have paths in only one of the scenes" % lost_links)
@@ -0,0 +1,147 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from sionna_utils import cfr_from_paths, subcarrier_indices
+
+
+class PathCacheEntry:
+    """
+    Traced paths of a single link, i.e. the complex coefficients a, the delays tau (in s) and the angles of
+    departure and arrival [theta_t, phi_t, theta_r, phi_r] as seen from the node at tx_key. CFRs are only
+    synthesized from the paths when needed and kept per subcarrier grid.
+    """
+
+    def __init__(self, tx_key, a, tau, angles):
+        self.tx_key = tx_key
+        self.a = a
+        self.tau = tau
+        self.angles = angles
+        self.cfrs = dict() # (fft_size, subcarrier_spacing) -> CFR
+        self.cached = True # False once evicted
+
+    def paths(self, tx_key):
+        '''
+        Returns (a, tau, angles) of the link as seen from tx_key; a reverse link swaps departure and arrival
+        '''
+        if tx_key == self.tx_key or self.angles is None:
+            return self.a, self.tau, self.angles
+        theta_t, phi_t, theta_r, phi_r = self.angles
+        return self.a, self.tau, [theta_r, phi_r, theta_t, phi_t]
+
+    def nbytes(self):
+        num_bytes = self.a.nbytes + self.tau.nbytes + sum(cfr.nbytes for cfr in self.cfrs.values())
+        if self.angles is not None:
+            num_bytes += sum(x.nbytes for x in self.angles)
+        return num_bytes
+
+
+class PathCache:
+    """
+    LRU cache of traced paths keyed by the positions of both nodes quantized to resolution (in m) and by the
+    settings of the ray tracer the paths were traced with (e.g. no. of rays, max. depth, diffraction).
+
+    For isotropic antennas the paths are reciprocal, so a link is stored once per unordered pair of positions
+    and also serves requests in the reverse direction. Entries are evicted in least recently used order once
+    the paths and the synthesized CFRs exceed max_bytes. The scene is static during a simulation, so the
+    cache is valid for the lifetime of the server environment; entries of outdated settings are evicted over time.
+    """
+
+    def __init__(self, max_bytes, resolution=0.001):
+        self.max_bytes = max_bytes
+        self.resolution = resolution
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.reciprocal_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def position_key(self, position):
+        return tuple(np.round(np.asarray(position) / self.resolution).astype(np.int64).tolist())
+
+    def link_key(self, tx_position, rx_position, settings=()):
+        tx_key = self.position_key(tx_position)
+        rx_key = self.position_key(rx_position)
+        return (settings,) + ((tx_key, rx_key) if tx_key <= rx_key else (rx_key, tx_key)), tx_key
+
+    def lookup(self, tx_position, rx_position, with_angles=False, settings=()):
+        '''
+        Returns the cached (entry, tx_key) of the link traced with the given settings or (None, tx_key) if it
+        needs to be traced
+        '''
+        key, tx_key = self.link_key(tx_position, rx_position, settings)
+        entry = self.entries.get(key)
+        if entry is None or (with_angles and entry.angles is None):
+            self.misses += 1
+            return None, tx_key
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if tx_key != entry.tx_key:
+            self.reciprocal_hits += 1
+        return entry, tx_key
+
+    def store(self, tx_position, rx_position, a, tau, angles=None, settings=()):
+        '''
+        Stores the paths of a link traced with the given settings and returns the new entry
+        '''
+        key, tx_key = self.link_key(tx_position, rx_position, settings)
+        # invalid paths are only padding
+        valid = np.flatnonzero(tau >= 0)
+        entry = PathCacheEntry(tx_key, np.array(a[valid]), np.array(tau[valid]),
+                               [np.array(x[valid]) for x in angles] if angles is not None else None)
+
+        old_entry = self.entries.pop(key, None)
+        if old_entry is not None:
+            old_entry.cached = False
+            self.num_bytes -= old_entry.nbytes()
+        self.entries[key] = entry
+        self.num_bytes += entry.nbytes()
+        self.evict()
+        return entry
+
+    def cfr(self, entry, fft_size, subcarrier_spacing, normalize=False):
+        '''
+        Returns the CFR of the entry on the OFDM grid centered around the carrier frequency; the CFR is
+        synthesized once per grid, the normalization to unit average energy is applied per call
+        '''
+        grid = (fft_size, subcarrier_spacing)
+        h = entry.cfrs.get(grid)
+        if h is None:
+            frequencies = subcarrier_indices(fft_size) * subcarrier_spacing
+            h = cfr_from_paths(entry.a, entry.tau, frequencies)
+            self.add_cfr(entry, fft_size, subcarrier_spacing, h)
+        if normalize:
+            h = h / np.sqrt(np.mean(np.abs(h) ** 2))
+        return h
+
+    def add_cfr(self, entry, fft_size, subcarrier_spacing, h):
+        '''
+        Keeps an already computed (not normalized) CFR of the entry
+        '''
+        grid = (fft_size, subcarrier_spacing)
+        if grid in entry.cfrs or not entry.cached:
+            return
+        entry.cfrs[grid] = h
+        self.num_bytes += h.nbytes
+        self.evict()
+
+    def evict(self):
+        while self.num_bytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            entry.cached = False
+            self.num_bytes -= entry.nbytes()
+            self.evictions += 1
+
+    def clear(self):
+        for entry in self.entries.values():
+            entry.cached = False
+        self.entries.clear()
+        self.num_bytes = 0
+
+    def report(self):
+        num_requests = self.hits + self.misses
+        print("Path cache: %d entries, %.1f MB, hits %d/%d (%.2f, reciprocal %d), evictions %d"
+              % (len(self.entries), self.num_bytes / 1e6, self.hits, num_requests,
+                 self.hits / max(num_requests, 1), self.reciprocal_hits, self.evictions))
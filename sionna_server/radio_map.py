@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+class RadioMap:
+    """
+    Path gain of a static transmitter on a grid of cells parallel to the XY plane at a fixed height as computed
+    by the coverage map of Sionna. Lookups interpolate the gain in dB bilinearly between the four closest cell
+    centers. The coverage map has no delays, so the delay of the shortest path is approximated by the LOS delay.
+    """
+
+    def __init__(self, tx_position, center, size, cell_size, gain):
+        self.tx_position = np.asarray(tx_position, dtype=np.float64)
+        self.center = np.asarray(center, dtype=np.float64) # center of the map; z is the height of the map
+        self.size = np.asarray(size, dtype=np.float64) # [width, height] in m
+        self.cell_size = np.asarray(cell_size, dtype=np.float64) # [width, height] in m
+        self.gain = np.asarray(gain, dtype=np.float32) # linear path gain, shape [num_cells_y, num_cells_x]
+
+    def lookup(self, position):
+        '''
+        Returns (delay in ns, loss in dB) at position or None if the position is not surrounded by cells which
+        were hit by rays, i.e. the link has to be ray traced
+        '''
+        xy = (np.asarray(position[:2]) - self.center[:2] + self.size / 2) / self.cell_size - 0.5
+        ix, iy = np.floor(xy).astype(int)
+        if ix < 0 or iy < 0 or ix + 1 >= self.gain.shape[1] or iy + 1 >= self.gain.shape[0]:
+            return None
+        cells = self.gain[iy:iy + 2, ix:ix + 2]
+        if np.any(cells <= 0):
+            return None
+
+        fx, fy = xy - [ix, iy]
+        gain_db = 10 * np.log10(cells)
+        gain_db = ((1 - fy) * ((1 - fx) * gain_db[0, 0] + fx * gain_db[0, 1])
+                   + fy * ((1 - fx) * gain_db[1, 0] + fx * gain_db[1, 1]))
+        delay = np.linalg.norm(np.asarray(position) - self.tx_position) / 299792458
+        return int(round(delay * 1e9)), float(-gain_db)
+
+    def nbytes(self):
+        return self.gain.nbytes
+
+    def save(self, fname):
+        np.savez(fname, tx_position=self.tx_position, center=self.center, size=self.size, cell_size=self.cell_size,
+                 gain=self.gain)
+
+    @classmethod
+    def load(cls, fname):
+        with np.load(fname) as data:
+            return cls(data['tx_position'], data['center'], data['size'], data['cell_size'], data['gain'])
+
+    @staticmethod
+    def file_name(directory, *params):
+        '''
+        Name of the file of the radio map computed with the given parameters, e.g. scene, frequency and position
+        '''
+        key = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+        return os.path.join(directory, "radio_map_%s.npz" % key)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import struct
+
+import mitsuba as mi
+import numpy as np
+
+from optimize_scene import MESH_READERS, optimize_scene
+from scene_roi import read_scene_xml
+
+
+class SceneCache:
+    """
+    Prebuilt copy of a scene keyed by the hash of the content of the scene file and all its meshes. It consists of
+
+    - scene.xml: the scene with the meshes merged per radio material into a few binary PLY files (same triangles),
+      which is loaded by Sionna much faster than hundreds of separate meshes
+    - geometry.bin: all triangles of the scene in a single memory-mapped file from which the Mitsuba scene of the
+      mobility model is created without parsing any XML or mesh file
+
+    The cache is built on first use; entries of other scenes or scene versions are left untouched.
+    """
+
+    MAGIC = b'NS3SCN01'
+
+    def __init__(self, fname, cache_dir):
+        self.key = self.content_hash(fname)
+        self.dir = os.path.join(cache_dir, self.key)
+        self.scene_fname = os.path.join(self.dir, "scene.xml")
+        self.geometry_fname = os.path.join(self.dir, "geometry.bin")
+        self.built = False
+        if not os.path.exists(self.geometry_fname):
+            self.build(fname)
+            self.built = True
+        self.header, self.vertices, self.faces = self.read_geometry(self.geometry_fname)
+
+    def build(self, fname):
+        # build in a temp dir at the same depth, so that relative paths stay valid, and publish it atomically
+        tmp_dir = "%s.tmp%d" % (self.dir, os.getpid())
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        optimize_scene(fname, os.path.join(tmp_dir, "scene.xml"), max_error=None)
+        self.write_geometry(os.path.join(tmp_dir, "scene.xml"), os.path.join(tmp_dir, "geometry.bin"))
+        try:
+            os.rename(tmp_dir, self.dir)
+        except OSError:
+            # built concurrently by another server
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def mitsuba_scene(self):
+        '''
+        Creates the Mitsuba scene from the cached geometry in the current variant; None if the scene has shapes
+        which are not cached (e.g. analytic shapes), i.e. the scene file has to be loaded
+        '''
+        if not self.header['complete']:
+            return None
+        scene = {"type": "scene"}
+        for shape in self.header['shapes']:
+            vertices = self.vertices[shape['vertex_offset']:shape['vertex_offset'] + shape['vertex_count']]
+            faces = self.faces[shape['face_offset']:shape['face_offset'] + shape['face_count']]
+            # without vertex normals the mesh has face normals
+            mesh = mi.Mesh(shape['id'], len(vertices), len(faces))
+            params = mi.traverse(mesh)
+            params['vertex_positions'] = type(params['vertex_positions'])(np.ravel(vertices))
+            params['faces'] = type(params['faces'])(np.ravel(faces))
+            params.update()
+            scene[shape['id']] = mesh
+        return mi.load_dict(scene)
+
+    def nbytes(self):
+        return self.vertices.nbytes + self.faces.nbytes
+
+    @classmethod
+    def write_geometry(cls, scene_fname, fname):
+        '''
+        Writes the triangles of all shapes of the scene: magic, header length (uint64), JSON header, vertices
+        (float32) and faces (uint32), each array aligned to 16 bytes
+        '''
+        root = read_scene_xml(scene_fname)
+        scene_dir = os.path.dirname(os.path.abspath(scene_fname))
+        shapes, vertices, faces = [], [], []
+        num_vertices, num_faces, complete = 0, 0, True
+        for shape in root.findall('shape'):
+            filename = shape.find("string[@name='filename']")
+            read_mesh = MESH_READERS.get(shape.get('type'))
+            if filename is None or read_mesh is None or shape.find('transform') is not None:
+                complete = False
+                continue
+            v, f = read_mesh(os.path.join(scene_dir, filename.get('value')))
+            shapes.append(dict(id=shape.get('id'), vertex_offset=num_vertices, vertex_count=len(v),
+                               face_offset=num_faces, face_count=len(f)))
+            vertices.append(v)
+            faces.append(f)
+            num_vertices += len(v)
+            num_faces += len(f)
+
+        header = json.dumps(dict(shapes=shapes, complete=complete, num_vertices=num_vertices,
+                                 num_faces=num_faces)).encode()
+        with open(fname, 'wb') as f:
+            f.write(cls.MAGIC + struct.pack('<Q', len(header)) + header)
+            f.write(b'\0' * (-f.tell() % 16))
+            f.write(np.concatenate(vertices + [np.zeros((0, 3))]).astype('<f4').tobytes())
+            f.write(b'\0' * (-f.tell() % 16))
+            f.write(np.concatenate(faces + [np.zeros((0, 3), dtype=np.int64)]).astype('<u4').tobytes())
+
+    @classmethod
+    def read_geometry(cls, fname):
+        '''
+        Maps the geometry file into memory; returns the header, vertices and faces
+        '''
+        with open(fname, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("%s is not a scene cache file" % fname)
+            header_len = struct.unpack('<Q', f.read(8))[0]
+            header = json.loads(f.read(header_len))
+        offset = len(cls.MAGIC) + 8 + header_len
+        offset += -offset % 16
+        vertices = np.memmap(fname, dtype='<f4', mode='r', offset=offset, shape=(header['num_vertices'], 3)) \
+            if header['num_vertices'] > 0 else np.zeros((0, 3), dtype=np.float32)
+        offset += vertices.nbytes
+        offset += -offset % 16
+        faces = np.memmap(fname, dtype='<u4', mode='r', offset=offset, shape=(header['num_faces'], 3)) \
+            if header['num_faces'] > 0 else np.zeros((0, 3), dtype=np.uint32)
+        return header, vertices, faces
+
+    @staticmethod
+    def content_hash(fname):
+        '''
+        Hash of the scene file and of all mesh files it refers to
+        '''
+        h = hashlib.sha1()
+        with open(fname, 'rb') as f:
+            h.update(f.read())
+        scene_dir = os.path.dirname(os.path.abspath(fname))
+        for filename in read_scene_xml(fname).iter('string'):
+            if filename.get('name') == 'filename':
+                mesh_fname = os.path.join(scene_dir, filename.get('value'))
+                h.update(filename.get('value').encode())
+                if os.path.isfile(mesh_fname):
+                    with open(mesh_fname, 'rb') as f:
+                        h.update(f.read())
+        return h.hexdigest()[:16]
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# PLY property types
+PLY_TYPES = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1', 'short': 'i2', 'int16': 'i2',
+             'ushort': 'u2', 'uint16': 'u2', 'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+             'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+
+def ply_bounds(fname):
+    """
+    Reads the bounding box of the vertices of a binary PLY mesh
+    :param fname: file name of the mesh
+    :return: (min, max) of shape [3] or None if the mesh cannot be read
+    """
+    with open(fname, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            return None
+
+        fmt = None
+        elements = [] # (name, count, properties)
+        while True:
+            line = f.readline()
+            if not line:
+                return None
+            words = line.decode('ascii', 'replace').split()
+            if len(words) == 0:
+                continue
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property' and len(elements) > 0:
+                elements[-1][2].append(words[1:])
+            elif words[0] == 'end_header':
+                break
+
+        # only the vertices are read which come first in the meshes exported from Blender
+        if fmt not in ('binary_little_endian', 'binary_big_endian') or len(elements) == 0 or elements[0][0] != 'vertex':
+            return None
+        _, num_vertices, properties = elements[0]
+        if num_vertices == 0 or any(p[0] not in PLY_TYPES for p in properties):
+            return None
+
+        order = '<' if fmt == 'binary_little_endian' else '>'
+        dtype = np.dtype([(p[1], order + PLY_TYPES[p[0]]) for p in properties])
+        data = np.frombuffer(f.read(dtype.itemsize * num_vertices), dtype=dtype, count=num_vertices)
+
+    xyz = np.stack([data['x'], data['y'], data['z']], axis=-1).astype(np.float64)
+    return xyz.min(axis=0), xyz.max(axis=0)
+
+
+def obj_bounds(fname):
+    """
+    Reads the bounding box of the vertices of a Wavefront OBJ mesh
+    :param fname: file name of the mesh
+    :return: (min, max) of shape [3] or None if the mesh has no vertices
+    """
+    with open(fname, 'r', errors='replace') as f:
+        xyz = [line.split()[1:4] for line in f if line.startswith('v ')]
+    if len(xyz) == 0:
+        return None
+    xyz = np.array(xyz, dtype=np.float64)
+    return xyz.min(axis=0), xyz.max(axis=0)
+
+
+# bounding box readers per shape type
+MESH_BOUNDS = {'ply': ply_bounds, 'obj': obj_bounds}
+
+
+def read_scene_xml(fname):
+    """
+    Parses a Mitsuba scene file
+    :param fname: file name of the scene
+    :return: root element of the scene
+    """
+    # Mitsuba accepts comments with "--" which are not well-formed XML
+    with open(fname, 'r') as f:
+        return ET.fromstring(re.sub(r'<!--.*?-->', '', f.read(), flags=re.DOTALL))
+
+
+def reduce_scene(fname, roi_min, roi_max):
+    """
+    Writes a copy of a Mitsuba scene which only contains the meshes overlapping the region of interest in the XY
+    plane; all other elements are kept. The copy refers to the meshes by absolute file names and is written to the
+    temp directory.
+    :param fname: file name of the scene
+    :param roi_min, roi_max: corners of the region of interest (x, y) in m
+    :return: file name of the reduced scene, no. of kept meshes, total no. of meshes
+    """
+    root = read_scene_xml(fname)
+    scene_dir = os.path.dirname(os.path.abspath(fname))
+
+    num_shapes, num_kept = 0, 0
+    for shape in root.findall('shape'):
+        num_shapes += 1
+        filename = shape.find("string[@name='filename']")
+        if filename is None:
+            # analytic shapes are always kept
+            num_kept += 1
+            continue
+
+        mesh_fname = os.path.join(scene_dir, filename.get('value'))
+        read_bounds = MESH_BOUNDS.get(shape.get('type'))
+        bounds = read_bounds(mesh_fname) if read_bounds is not None else None
+        if bounds is not None and (np.any(bounds[1][:2] < roi_min[:2]) or np.any(bounds[0][:2] > roi_max[:2])):
+            root.remove(shape)
+            continue
+
+        filename.set('value', mesh_fname)
+        num_kept += 1
+
+    key = hashlib.sha1(repr((os.path.abspath(fname), tuple(np.round(roi_min[:2], 3).tolist()),
+                             tuple(np.round(roi_max[:2], 3).tolist()))).encode()).hexdigest()[:16]
+    out_dir = os.path.join(tempfile.gettempdir(), "ns3sionna_roi")
+    os.makedirs(out_dir, exist_ok=True)
+    out_fname = os.path.join(out_dir, "%s_%s.xml" % (os.path.splitext(os.path.basename(fname))[0], key))
+    ET.ElementTree(root).write(out_fname)
+    return out_fname, num_kept, num_shapes
+
+
+def element_key(element):
+    """
+    Comparable representation of an XML element and its children which ignores the formatting
+    """
+    return (element.tag, tuple(sorted(element.attrib.items())), (element.text or "").strip(),
+            tuple(element_key(child) for child in element))
+
+
+def merge_scenes(fnames):
+    """
+    Writes a Mitsuba scene with the union of the shapes of several variants of a scene (e.g. with a door closed
+    and open), so that all variants are loaded at once and a variant is selected by moving the shapes of the other
+    variants out of the way. Shapes with the same properties and mesh file are shared by the variants; all other
+    elements are taken from the first scene and materials missing there from the others. The merged scene refers
+    to the meshes by absolute file names and is written to the temp directory.
+    :param fnames: file names of the scenes
+    :return: file name of the merged scene, and per shape (Sionna object name) the indices of the scenes it is part of
+    """
+    root = None
+    shapes = dict() # shape without id -> (shape, id, indices of the scenes)
+    for i, fname in enumerate(fnames):
+        scene = read_scene_xml(fname)
+        scene_dir = os.path.dirname(os.path.abspath(fname))
+        for shape in scene.findall('shape'):
+            scene.remove(shape)
+            filename = shape.find("string[@name='filename']")
+            if filename is not None:
+                filename.set('value', os.path.join(scene_dir, filename.get('value')))
+            shape_id = shape.attrib.pop('id', "")
+            key = element_key(shape)
+            if key not in shapes:
+                shapes[key] = (shape, shape_id, set())
+            shapes[key][2].add(i)
+
+        if root is None:
+            root = scene
+            continue
+        ids = {element.get('id') for element in root}
+        for element in scene.findall('bsdf'):
+            if element.get('id') not in ids:
+                root.append(element)
+
+    shape_scenes = dict()
+    for shape, shape_id, indices in shapes.values():
+        # Sionna names the objects by the id without the prefix; different shapes of the same id are renamed
+        name = shape_id[5:] if shape_id.startswith('mesh-') else shape_id
+        if name in shape_scenes:
+            name = "%s-%d" % (name, min(indices))
+        shape.set('id', 'mesh-' + name)
+        shape.tail = "\n"
+        root.append(shape)
+        shape_scenes[name] = indices
+
+    key = hashlib.sha1(repr([os.path.abspath(fname) for fname in fnames]).encode()).hexdigest()[:16]
+    out_dir = os.path.join(tempfile.gettempdir(), "ns3sionna_states")
+    os.makedirs(out_dir, exist_ok=True)
+    out_fname = os.path.join(out_dir, "%s_%s.xml" % (os.path.splitext(os.path.basename(fnames[0]))[0], key))
+    ET.ElementTree(root).write(out_fname)
+    return out_fname, shape_scenes
@@ -9,7 +9,16 @@ import message_pb2
 import os
 
 from commons import *
-from sionna_utils import compute_coherence_time
+from sionna_utils import compute_coherence_time, path_length_rate, extrapolate_paths, cfr_from_paths, \
+    wideband_power, strong_paths, num_ray_samples, free_space_loss, subcarrier_indices
+from trajectory import TrajectoryTape
+from node_table import NodeTable
+from lookahead import LookaheadController
+from path_cache import PathCache
+from csi_cache import CsiCache
+from radio_map import RadioMap
+from scene_roi import reduce_scene, merge_scenes
+from scene_cache import SceneCache
 
 gpu_num = 0 # Use "" to use the CPU
 os.environ["CUDA_VISIBLE_DEVICES"] = f"{gpu_num}"
@@ -35,14 +44,26 @@ from sionna.rt import load_scene, Transmitter, Receiver, PlanarArray, Camera
 from sionna.channel import cir_to_ofdm_channel, subcarrier_frequencies
 from sionna.rt.antenna import iso_pattern
 
-class CacheEntry:
-    def __init__(self, sim_time, ttl, value):
-        self.sim_time = sim_time
-        self.ttl = ttl
-        self.value = value
+# format of the CSI in responses
+CSI_FORMAT_CFR = 0 # CFR per OFDM subcarrier
+CSI_FORMAT_PATHS = 1 # complex amplitude and delay per path
+
+# multipath may add up to a stronger signal than free space (e.g. two-ray ground reflection: up to +6 dB), so
+# a link is out of range only if its free space loss exceeds the max. path loss by this margin (in dB)
+RANGE_MARGIN_DB = 6.0
+
+# CSI of the links out of range
+OUT_OF_RANGE = np.zeros(0, dtype=np.complex64)
+
+# memory model of a ray tracing call (in bytes): the state of each ray per TX and depth while shooting and
+# bouncing, and per path of each TX/RX pair the coefficient, delay, angles and intermediate values
+RT_BYTES_PER_RAY = 64
+RT_BYTES_PER_PATH = 128
+
+# objects which are not part of the active scene state are moved this far (in m) below their place, i.e. out of
+# reach of the rays; far enough for no path, close enough for sub-mm float32 precision when moved back
+STATE_PARKING_OFFSET = np.array([0.0, 0.0, -1e4])
 
-    def debug(self):
-        return str(self.sim_time) + "/" + str(self.ttl) + "/..."
 
 class SionnaEnv:
     """
@@ -52,15 +73,80 @@ class SionnaEnv:
     author: Pilz, Zubow
     """
 
-    def __init__(self, rt_calc_diffraction, rt_max_depth=5, rt_max_parallel_links=32, est_csi=True, VERBOSE=True):
+    def __init__(self, rt_calc_diffraction, rt_max_depth=5, rt_max_parallel_links=32, est_csi=True,
+                 rt_progressive_depth=False, rt_depth_tolerance_db=1.0, rt_selective_diffraction=False,
+                 rt_diffraction_threshold_db=20.0, rt_num_samples=0, rt_ray_spacing=0.1,
+                 rt_sample_convergence=False, rt_memory_budget=0, rx_cluster_radius=0.0, radio_map_cell_size=0.0,
+                 radio_map_dir="radio_maps", radio_map_prebuild=False, mobility_horizon=0.0, adaptive_lookahead=False,
+                 lookahead_budget=0, extrapolation_horizon=0.0,
+                 extrapolation_distance=0.5, path_cache_size=0, path_cache_resolution=0.001, csi_cache=False,
+                 scene_roi_radius=0.0, scene_cache_dir="", warm_up=False, VERBOSE=True):
         self.rt_calc_diffraction = rt_calc_diffraction
         self.rt_max_depth = rt_max_depth
         self.rt_max_parallel_links = rt_max_parallel_links
         self.est_csi = est_csi
+        self.rt_progressive_depth = rt_progressive_depth # increase the depth per link until its power converges
+        self.rt_depth_tolerance_db = rt_depth_tolerance_db # max. change of the received power for convergence
+        self.depth_stats = dict() # depth at which the links converged -> no. of links
+        self.rt_selective_diffraction = rt_selective_diffraction # diffraction only for links without (strong) LOS
+        self.rt_diffraction_threshold_db = rt_diffraction_threshold_db # max. loss of a LOS link w.r.t. free space
+        self.diffraction_stats = [0, 0] # no. of traced links, no. of links traced with diffraction
+        self.rt_num_samples = rt_num_samples # no. of rays per source; 0 = derived from the scene size
+        self.rt_ray_spacing = rt_ray_spacing # in m; max. distance between neighboring rays at the scene extent
+        self.rt_sample_convergence = rt_sample_convergence # double the rays until the paths are stable
+        self.num_samples = rt_num_samples # no. of rays per source used
+        self.rt_memory_budget = rt_memory_budget * 1e6 # in bytes; links are traced in chunks which fit; 0 = off
+        self.max_num_paths = 64 # max. no. of paths per link seen so far; used to estimate the memory
+        self.rx_cluster_radius = rx_cluster_radius # in m; receivers this close share the traced paths; 0 = off
+        self.cluster_stats = [0, 0] # no. of links derived from a cluster representative, no. of representatives
+        # the members of the first clusters are traced as well to estimate the error: (loss error in dB, CFR NMSE)
+        self.cluster_validation_pending = True
+        self.cluster_errors = []
+        # loss and delay of links between a static and a mobile node are interpolated from the radio map of the
+        # static node if no CSI is needed
+        self.radio_map_cell_size = radio_map_cell_size # in m; 0 = off
+        self.radio_map_dir = radio_map_dir # radio maps are kept on disk across simulations
+        self.radio_map_prebuild = radio_map_prebuild # compute the radio maps of all static nodes at start
+        self.radio_maps = dict() # (node id, height) -> RadioMap
+        self.radio_map_stats = [0, 0] # no. of links served from radio maps, no. of lookups
+        # only the meshes within this distance in m of the area of the nodes are ray traced; 0 = full scene
+        self.scene_roi_radius = scene_roi_radius
+        self.scene_roi = None # (min, max) of the area of the nodes (x, y) while the reduced scene is used
+        # scenes are loaded from a prebuilt cache in this directory (see SceneCache); "" = always parse the scene
+        self.scene_cache_dir = scene_cache_dir
+        self.scene_cache = None
+        # alternative geometries of the scene selected per request: name -> scene file; all states are merged into
+        # a single Sionna scene and the objects of the inactive states are moved out of the way
+        self.scene_states = dict()
+        self.scene_state = "" # active state; "" = scene_fname
+        self.scene_files = None # (scene file, file loaded by Sionna) of the full scene
+        self.state_objects = dict() # object name -> states it is part of; objects of all states are not listed
+        self.object_homes = dict() # object name -> position in the loaded scene
+        self.parked_objects = set() # names of the objects moved out of the way
+        self.state_caches = dict() # name -> (path cache, CSI cache, radio maps) of the inactive states
+        self.num_state_switches = 0
+        # trace dummy links before the SimAck, so that kernels are not compiled during the first request
+        self.warm_up = warm_up
+        self.warm_up_time = None # in s
+        self.mobility_horizon = mobility_horizon # in seconds; 0 = compute mobility lazily
+        self.adaptive_lookahead = adaptive_lookahead # adapt the look ahead per TX in mode 3
+        self.lookahead_budget = lookahead_budget # max. no. of links per call with adaptive look ahead; 0 = 4 * sub_mode
+        self.lookahead = None # LookaheadController
+        self.extrapolation_horizon = extrapolation_horizon # in ms; 0 = trace every look ahead slot
+        self.extrapolation_distance = extrapolation_distance # in m; max. node movement before re-tracing
+        # traced paths per pair of node positions; reused by static and reciprocal links
+        self.path_cache = PathCache(path_cache_size * 1e6, path_cache_resolution) if path_cache_size > 0 else None
+        # computed CSI per node pair and validity window; serves repeated and reverse requests
+        self.csi_cache = CsiCache() if csi_cache else None
         self.VERBOSE = VERBOSE
-        self.node_info_dict = {}
+        self.nodes = None # NodeTable with the state of all nodes
+        self.csi_format = CSI_FORMAT_CFR # set by ns-3
+        self.path_pruning_threshold_db = 0.0 # set by ns-3
+        self.path_angles = False # set by ns-3
+        self.max_path_loss_db = 0.0 # set by ns-3; links with more free space loss are not traced
+        self.num_out_of_range = 0 # no. of links not traced as out of range
         self.last_placed_nodes = [] # name of TX/RX placed during last channel computation
-        self.pos_velo_cache = dict()
+        self.trajectory_tapes = dict() # precomputed trajectories of mobile nodes
 
 
     def store_simulation_info(self, simulation_info):
@@ -71,7 +157,8 @@ class SionnaEnv:
 
         # Load the sionna scene
         filepath = "./../models/" + simulation_info.scene_fname
-        self.scene = load_scene(filepath)
+        self.scene_fname = simulation_info.scene_fname
+        self.simulation_info = simulation_info
         self.mode = simulation_info.mode
 
         if simulation_info.sub_mode > -1:
@@ -83,10 +170,32 @@ class SionnaEnv:
 
         print(f'Operating in mode: {self.mode}, sub_mode: {self.sub_mode}')
 
+        # format of the CSI in responses
+        self.csi_format = simulation_info.csi_format
+        self.path_pruning_threshold_db = simulation_info.path_pruning_threshold_db
+        self.path_angles = simulation_info.path_angles
+        if self.csi_format == CSI_FORMAT_PATHS:
+            print(f'CSI format: paths, pruning threshold: {self.path_pruning_threshold_db} dB, angles: {self.path_angles}')
+        self.max_path_loss_db = simulation_info.max_path_loss_db
+        if self.max_path_loss_db > 0:
+            print(f'Range culling: links with free space loss above {self.max_path_loss_db + RANGE_MARGIN_DB} dB are not traced')
+
         # Load the mitsuba scene used by the mobility model
         # Mobility model uses mitsuba SCALAR variant
+        start_time = time.time()
         mi.set_variant('scalar_rgb')
-        self.mi_scene = mi.load_file(filepath, parallel=False)
+        self.mi_scene = None
+        if self.scene_cache_dir:
+            self.scene_cache = SceneCache(filepath, self.scene_cache_dir)
+            print("Scene cache %s: %s (%d shapes, %.1f MB geometry)"
+                  % ("built" if self.scene_cache.built else "hit", self.scene_cache.dir,
+                     len(self.scene_cache.header['shapes']), self.scene_cache.nbytes() / 1e6))
+            self.mi_scene = self.scene_cache.mitsuba_scene()
+            # the cached scene has the same triangles with the meshes merged per radio material
+            filepath = self.scene_cache.scene_fname
+        if self.mi_scene is None:
+            self.mi_scene = mi.load_file(filepath, parallel=False)
+        mobility_load_time = time.time() - start_time
 
         # Set the mitsuba variant back to how Sionna configures it
         if len(gpus) > 0:
@@ -94,6 +203,177 @@ class SionnaEnv:
         else:
             mi.set_variant('llvm_ad_rgb')
 
+        print(f'Scenario: {simulation_info.scene_fname}')
+        print(f'Params: F0={simulation_info.frequency}MHz, BW={simulation_info.channel_bw}MHz, '
+              f'FFT={simulation_info.fft_size}, df={simulation_info.subcarrier_spacing}Hz, '
+              f'minTc={simulation_info.min_coherence_time_ms}ms')
+
+        # Set the random seed for reproducibility
+        np.random.seed(simulation_info.seed)
+        tf.random.set_seed(simulation_info.seed)
+
+        # Store information about each node; the position cache needs room for all look-ahead entries
+        num_nodes = len(simulation_info.nodes)
+        max_look_ahead = math.ceil(self.sub_mode / max(num_nodes - 1, 1)) if self.mode == 3 else 1
+        if self.mode == 3 and self.adaptive_lookahead:
+            self.lookahead = LookaheadController(self.lookahead_budget if self.lookahead_budget > 0 else 4 * self.sub_mode,
+                                                 num_nodes - 1, verbose=self.VERBOSE)
+            max_look_ahead = self.lookahead.max_slots
+        self.nodes = NodeTable.from_sim_init(simulation_info, cache_capacity=max(16, 4 * max_look_ahead),
+                                             trace_dir="./../models/")
+        if len(self.nodes.traces) > 0:
+            traces = set(self.nodes.traces.values())
+            print("Mapped %d trace files for %d nodes (%d waypoints, %d bytes)"
+                  % (len(traces), len(self.nodes.traces), sum(trace.num_points for trace in traces),
+                     sum(trace.nbytes() for trace in traces)))
+
+        # Load the sionna scene; with a region of interest only the meshes around the area of the nodes
+        start_time = time.time()
+        self.scene_states = {"": "./../models/" + simulation_info.scene_fname}
+        self.scene_state = ""
+        self.scene_files = (self.scene_states[""], filepath)
+        if len(simulation_info.scene_states) > 0:
+            # the objects of all geometry states in one scene; the mobility model always uses the geometry of
+            # scene_fname
+            for scene_state in simulation_info.scene_states:
+                self.scene_states[scene_state.name] = "./../models/" + scene_state.scene_fname
+            names = list(self.scene_states)
+            merged_fname, object_scenes = merge_scenes([self.scene_states[name] for name in names])
+            self.state_objects = {name: {names[i] for i in indices} for name, indices in object_scenes.items()
+                                  if len(indices) < len(names)}
+            # the meshes of the scene cache are merged per material, i.e. the objects could not be moved per state
+            self.scene_files = (merged_fname, merged_fname)
+            print("Scene states: %s merged, %d/%d objects differ"
+                  % (", ".join(names[1:]), len(self.state_objects), len(object_scenes)))
+        if self.scene_roi_radius > 0:
+            self.scene_roi = self.nodes_area()
+        self.load_rt_scene(self.rt_scene_fname())
+        print("Scene loading: mobility %.2fs, ray tracing %.2fs" % (mobility_load_time, time.time() - start_time))
+
+        # check mode compatibility
+        if self.mode == 3 or self.mode == 2:
+            # only constant speed model supported
+            if np.any(self.nodes.speed_dist != NodeTable.DIST_CONSTANT):
+                warnings.warn(
+                    f"Only constant speed model is supported when using mode 2/3; switching to mode 1.",
+                    UserWarning)
+                self.mode = 1
+
+        # estimate the max speed in network for Tc
+        max_v = max(1e-4, np.max(self.nodes.speed_params[:, 0]), self.nodes.max_trace_speed()) # max coherence time of 100s
+
+        # coherence time in nanoseconds
+        #self.chan_coh_time_mode23 = int(9 * 299792458 * 1e9 / (16 * np.pi * 2 * max_v * self.scene.frequency.numpy()))
+        self.chan_coh_time_mode23 = compute_coherence_time(max_v, self.scene.frequency.numpy(), model='rappaport2')
+        # consider minimum coherence time which is given in ms
+        self.chan_coh_time_mode23 = min(self.chan_coh_time_mode23, self.scene.min_coherence_time_ms * 1e6)
+
+        if self.mode == 3 or self.mode == 2:
+            # worst case coherence time
+            print("Running mode %d with Tc=%.2f ms" % (self.mode, self.chan_coh_time_mode23 / 1e6))
+
+        # precompute the trajectories of all mobile nodes
+        if self.mobility_horizon > 0:
+            horizon = int(self.mobility_horizon * 1e9)
+            for slot in np.flatnonzero(self.nodes.model == NodeTable.MODEL_RANDOM_WALK):
+                self.build_trajectory_tape(int(self.nodes.ids[slot]), horizon)
+
+            num_points = sum(tape.num_points for tape in self.trajectory_tapes.values())
+            num_bytes = sum(tape.nbytes() for tape in self.trajectory_tapes.values())
+            print("Precomputed trajectories up to %.1fs for %d nodes (%d breakpoints, %d bytes)"
+                  % (self.mobility_horizon, len(self.trajectory_tapes), num_points, num_bytes))
+
+        # how long to store computed position values from mobility
+        cached_look_ahead = self.lookahead.max_slots if self.lookahead is not None else math.ceil(self.sub_mode / num_nodes)
+        self.max_pos_cache_age = max(1e9,  num_nodes * cached_look_ahead * self.chan_coh_time_mode23)
+
+        if self.rt_num_samples <= 0:
+            self.set_num_samples()
+
+        if self.radio_map_cell_size > 0 and self.est_csi:
+            print("Radio maps are not used as CSI is estimated")
+        elif self.radio_map_cell_size > 0 and self.radio_map_prebuild:
+            # one map per static node and height of the mobile nodes
+            mobile = self.nodes.model != NodeTable.MODEL_CONSTANT_POSITION
+            heights = np.unique(np.round(self.nodes.position[mobile, 2], 1))
+            for slot in np.flatnonzero(~mobile):
+                for height in heights:
+                    self.get_radio_map(int(self.nodes.ids[slot]), self.nodes.position[slot], height)
+
+        if self.warm_up:
+            self.trace_warm_up()
+
+        if self.VERBOSE:
+            print_simulation_info(simulation_info)
+
+
+    def trace_warm_up(self):
+        '''
+        Traces dummy links from the first node to all others with the shape of the first request (no. of RX
+        and look ahead slots) at the start positions, so that the TensorFlow graphs and Dr.Jit kernels are
+        compiled before the simulation starts; nothing is cached and the statistics are not affected. The
+        check of the sample convergence is left to the first request, i.e. done with the links of the simulation.
+        '''
+        if len(self.nodes) < 2:
+            return
+        start_time = time.time()
+        num_rx = 1 if self.mode == 1 else len(self.nodes) - 1
+        look_ahead = math.ceil(self.sub_mode / max(num_rx, 1)) if self.mode == 3 else 1
+        if self.lookahead is not None:
+            look_ahead = min(look_ahead, self.lookahead.max_slots)
+        use_paths = self.csi_format == CSI_FORMAT_PATHS
+        need_angles = self.extrapolation_horizon > 0 or self.rx_cluster_radius > 0 or (use_paths and self.path_angles)
+        depth_stats, diffraction_stats = dict(self.depth_stats), list(self.diffraction_stats)
+
+        for future_id in range(look_ahead):
+            self.scene.add(Transmitter(name="tx" + str(future_id), position=self.nodes.position[0]))
+            self.last_placed_nodes.append("tx" + str(future_id))
+            for lnk_id in range(num_rx):
+                rx_node_name = "rx" + str(self.nodes.ids[lnk_id + 1]) + "." + str(future_id)
+                self.scene.add(Receiver(name=rx_node_name, position=self.nodes.position[lnk_id + 1]))
+                self.last_placed_nodes.append(rx_node_name)
+
+        # the first chunk has the largest shape
+        links = [(future_id, lnk_id) for future_id in range(look_ahead) for lnk_id in range(num_rx)]
+        chunk = self.split_links(links, need_angles, self.scene.fft_size)[0]
+        all_placed = list(self.scene.transmitters.values()) + list(self.scene.receivers.values())
+        self.place_only(all_placed, {"tx" + str(future_id) for future_id, _ in chunk}
+                        | {"rx" + str(self.nodes.ids[lnk_id + 1]) + "." + str(future_id) for future_id, lnk_id in chunk})
+        rx_index_of = {name: i for i, name in enumerate(self.scene.receivers.keys())}
+        tx_index_of = {name: i for i, name in enumerate(self.scene.transmitters.keys())}
+        chunk_links = [(rx_index_of["rx" + str(self.nodes.ids[lnk_id + 1]) + "." + str(future_id)],
+                        tx_index_of["tx" + str(future_id)]) for future_id, lnk_id in chunk]
+
+        sample_convergence, self.rt_sample_convergence = self.rt_sample_convergence, False
+        a, tau, _ = self.compute_cir(with_angles=need_angles, links=chunk_links, allow_empty=True)
+        self.rt_sample_convergence = sample_convergence
+        if a is None:
+            # e.g. the nodes start in separate rooms; the first request reports missing paths as usual
+            self.remove_placed_nodes()
+            self.depth_stats, self.diffraction_stats = depth_stats, diffraction_stats
+            self.warm_up_time = time.time() - start_time
+            print("Warm-up: no paths for the %d dummy links; skipped after %.2fs" % (len(chunk), self.warm_up_time))
+            return
+        if self.est_csi and not use_paths:
+            frequencies = subcarrier_frequencies(num_subcarriers=self.scene.fft_size,
+                                                 subcarrier_spacing=self.scene.subcarrier_spacing)
+            cir_to_ofdm_channel(frequencies=frequencies, a=a, tau=tau, normalize=False).numpy()
+
+        self.remove_placed_nodes()
+        self.depth_stats, self.diffraction_stats = depth_stats, diffraction_stats
+        self.warm_up_time = time.time() - start_time
+        print("Warm-up: traced %d dummy links in %.2fs" % (len(chunk), self.warm_up_time))
+
+
+    def load_rt_scene(self, filepath):
+        '''
+        Loads the Sionna scene used for ray tracing and configures it from the simulation info
+        '''
+        simulation_info = self.simulation_info
+        self.scene = load_scene(filepath)
+        self.rt_scene_filepath = filepath
+        self.rt_scene_hash = None # hash of the content of the scene for the radio map files; set on first use
+
         # SISO mode only
         # Configure antenna array for all transmitters
         self.scene.tx_array = PlanarArray(num_rows=1,
@@ -108,10 +388,6 @@ class SionnaEnv:
                                      vertical_spacing=0.5,
                                      horizontal_spacing=0.5,
                                      pattern=iso_pattern)
-        print(f'Scenario: {simulation_info.scene_fname}')
-        print(f'Params: F0={simulation_info.frequency}MHz, BW={simulation_info.channel_bw}MHz, '
-              f'FFT={simulation_info.fft_size}, df={simulation_info.subcarrier_spacing}Hz, '
-              f'minTc={simulation_info.min_coherence_time_ms}ms')
 
         # Set scene parameters
         self.scene.frequency = simulation_info.frequency * 1e6
@@ -123,97 +399,133 @@ class SionnaEnv:
         # If set to False, ray tracing will be done per antenna element (slower for large arrays)
         self.scene.synthetic_array = True
 
-        # Set the random seed for reproducibility
-        np.random.seed(simulation_info.seed)
-        tf.random.set_seed(simulation_info.seed)
+        # all objects are in place after loading
+        self.object_homes.clear()
+        self.parked_objects.clear()
+        self.apply_scene_state()
 
-        # Store information about each node
-        for node_info in simulation_info.nodes:
-            if (node_info.HasField("constant_position_model")):
-                position = node_info.constant_position_model.position
-
-                self.node_info_dict[node_info.id] = {
-                    "model": "Constant Position",
-                    "position": [position.x, position.y, position.z],
-                    "speed": ("Constant", 0.0)
-                }
-
-            elif (node_info.HasField("random_walk_model")):
-
-                random_walk_model = node_info.random_walk_model
-                position = random_walk_model.position
-
-                mode = ()
-                if random_walk_model.HasField("time_value"):
-                    mode = ("Time", random_walk_model.time_value)
-                elif random_walk_model.HasField("distance_value"):
-                    mode = ("Distance", random_walk_model.distance_value)
-
-                speed = ()
-                if random_walk_model.speed.HasField("uniform"):
-                    speed = ("Uniform", random_walk_model.speed.uniform.min, random_walk_model.speed.uniform.max)
-                elif random_walk_model.speed.HasField("constant"):
-                    speed = ("Constant", random_walk_model.speed.constant.value)
-                elif random_walk_model.speed.HasField("normal"):
-                    speed = ("Normal", random_walk_model.speed.normal.mean, random_walk_model.speed.normal.variance)
-
-                direction = ()
-                if random_walk_model.direction.HasField("uniform"):
-                    direction = (
-                    "Uniform", random_walk_model.direction.uniform.min, random_walk_model.direction.uniform.max)
-                elif random_walk_model.direction.HasField("constant"):
-                    direction = ("Constant", random_walk_model.direction.constant.value)
-                elif random_walk_model.direction.HasField("normal"):
-                    direction = (
-                    "Normal", random_walk_model.direction.normal.mean, random_walk_model.direction.normal.variance)
-
-                self.node_info_dict[node_info.id] = {
-                    "model": "Random Walk",
-                    "position": [position.x, position.y, position.z],
-                    "velocity": [0.0, 0.0, 0.0],
-                    "mode": mode,
-                    "speed": speed,
-                    "direction": direction,
-                    "last update": 0,
-                    "delay left": 0
-                }
-
-        # create cache for mode 3
-        for node_id in list(self.node_info_dict.keys()):
-            self.pos_velo_cache[node_id] = []
 
-        # check mode compatibility
-        if self.mode == 3 or self.mode == 2:
-            # only constant speed model supported
-            for node_id in list(self.node_info_dict.keys()):
-                if self.node_info_dict[node_id]["speed"][0] != "Constant":
-                    warnings.warn(
-                        f"Only constant speed model is supported when using mode 2/3; switching to mode 1.",
-                        UserWarning)
-                    self.mode = 1
+    def set_num_samples(self):
+        '''
+        Sets the no. of rays per source such that neighboring rays are at most rt_ray_spacing apart across the
+        traced scene, i.e. the region of interest if used
+        '''
+        bbox = self.mi_scene.bbox()
+        corners = np.vstack([np.array(bbox.min), np.array(bbox.max), self.nodes.position])
+        if self.scene_roi is not None:
+            corners[:, :2] = np.clip(corners[:, :2], self.scene_roi[0] - self.scene_roi_radius,
+                                     self.scene_roi[1] + self.scene_roi_radius)
+        extent = float(np.linalg.norm(np.max(corners, axis=0) - np.min(corners, axis=0)))
+        self.num_samples = num_ray_samples(extent, self.rt_ray_spacing)
+        print("Using %d rays per source (scene extent %.1f m, ray spacing %.2f m)"
+              % (self.num_samples, extent, self.rt_ray_spacing))
+
+
+    def nodes_area(self):
+        '''
+        Returns the corners (min, max) in the XY plane of the area of the nodes known in advance: the positions
+        of all nodes at the start and the whole trajectories of trace-driven nodes
+        '''
+        positions = [self.nodes.position[:, :2]]
+        for trace in self.nodes.traces.values():
+            positions.append(np.asarray(trace.positions[:2]).T)
+        positions = np.vstack(positions)
+        return np.min(positions, axis=0), np.max(positions, axis=0)
 
-        # estimate the max speed in network for Tc
-        max_v = 1e-4 # max coherence time of 100s
-        for rx_node in list(self.node_info_dict.keys()):
-            max_v = max(max_v, self.node_info_dict[rx_node]["speed"][1])
 
-        # coherence time in nanoseconds
-        #self.chan_coh_time_mode23 = int(9 * 299792458 * 1e9 / (16 * np.pi * 2 * max_v * self.scene.frequency.numpy()))
-        self.chan_coh_time_mode23 = compute_coherence_time(max_v, self.scene.frequency.numpy(), model='rappaport2')
-        # consider minimum coherence time which is given in ms
-        self.chan_coh_time_mode23 = min(self.chan_coh_time_mode23, self.scene.min_coherence_time_ms * 1e6)
+    def in_scene_roi(self, positions):
+        '''
+        Whether all positions are at most half the radius of the region of interest away from the area of the
+        nodes, i.e. the geometry around them is still part of the reduced scene
+        '''
+        margin = self.scene_roi_radius / 2
+        return bool(np.all(positions[:, :2] >= self.scene_roi[0] - margin)
+                    and np.all(positions[:, :2] <= self.scene_roi[1] + margin))
 
-        if self.mode == 3 or self.mode == 2:
-            # worst case coherence time
-            print("Running mode %d with Tc=%.2f ms" % (self.mode, self.chan_coh_time_mode23 / 1e6))
 
-        num_nodes = len(self.node_info_dict)
+    def rt_scene_fname(self):
+        '''
+        Returns the file of the Sionna scene; the region of interest is cut from the original scene as the merged
+        meshes of the scene cache span the whole scene
+        '''
+        filepath, rt_filepath = self.scene_files
+        if self.scene_roi is None:
+            return rt_filepath
+        roi_fname, num_kept, num_shapes = reduce_scene(filepath, self.scene_roi[0] - self.scene_roi_radius,
+                                                       self.scene_roi[1] + self.scene_roi_radius)
+        print("Region of interest: %d/%d meshes within %.1f m of the nodes (x: %.1f .. %.1f, y: %.1f .. %.1f)"
+              % (num_kept, num_shapes, self.scene_roi_radius, self.scene_roi[0][0], self.scene_roi[1][0],
+                 self.scene_roi[0][1], self.scene_roi[1][1]))
+        return roi_fname
+
+
+    def apply_scene_state(self):
+        '''
+        Moves the objects which are not part of the active scene state STATE_PARKING_OFFSET below their place and
+        those which are back to their place
+        '''
+        for name, states in self.state_objects.items():
+            active = self.scene_state in states
+            if active != (name in self.parked_objects):
+                continue
+            obj = self.scene.get(name)
+            if obj is None:
+                # outside of the region of interest
+                continue
+            home = self.object_homes.setdefault(name, obj.position.numpy())
+            # always moved relative to the same place, so that rounding errors do not add up over many switches
+            if active:
+                obj.position = home
+                self.parked_objects.remove(name)
+            else:
+                obj.position = home + STATE_PARKING_OFFSET
+                self.parked_objects.add(name)
 
-        # how long to store computed position values from mobility
-        self.max_pos_cache_age = max(1e9,  num_nodes * math.ceil(self.sub_mode / num_nodes) * self.chan_coh_time_mode23)
 
-        if self.VERBOSE:
-            print_simulation_info(simulation_info)
+    def set_scene_state(self, state):
+        '''
+        Switches the geometry of the scene to the state by moving the objects which differ between the states;
+        paths, CSI and radio maps are kept per state. Called before any node is placed. The mobility model keeps
+        the geometry of scene_fname, i.e. random walks reflect at the objects of the default state.
+        '''
+        if state == self.scene_state:
+            return
+        if state not in self.scene_states:
+            raise SystemExit("Error: Unknown scene state '%s'; scene states have to be announced in the SimInitMessage"
+                             % state)
+
+        start_time = time.time()
+        self.state_caches[self.scene_state] = (self.path_cache, self.csi_cache, self.radio_maps)
+        caches = self.state_caches.pop(state, None)
+        if caches is None:
+            caches = (PathCache(self.path_cache.max_bytes, self.path_cache.resolution) if self.path_cache is not None
+                      else None, CsiCache() if self.csi_cache is not None else None, dict())
+        self.path_cache, self.csi_cache, self.radio_maps = caches
+        self.scene_state = state
+        self.apply_scene_state()
+        self.num_state_switches += 1
+        print("Switched to scene state '%s' in %.2fs" % (state or "default", time.time() - start_time))
+
+
+    def use_full_scene(self):
+        '''
+        Replaces the reduced scene by the full scene keeping the placed nodes; all paths traced in the reduced
+        scene are dropped
+        '''
+        print("Node left the region of interest; using the full scene from now on")
+        placed = [self.scene.get(name) for name in self.last_placed_nodes]
+        self.scene_roi = None
+        self.load_rt_scene(self.rt_scene_fname())
+        for node in placed:
+            if node is not None:
+                self.scene.add(node)
+
+        for path_cache, _, radio_maps in [(self.path_cache, None, self.radio_maps)] + list(self.state_caches.values()):
+            if path_cache is not None:
+                path_cache.clear()
+            radio_maps.clear()
+        if self.rt_num_samples <= 0:
+            self.set_num_samples()
 
 
     def calculate_channel_state(self, channel_state_request, reply_wrapper):
@@ -226,20 +538,22 @@ class SionnaEnv:
         self.remove_all_cached_entries(simulation_time)
 
         # Remove all last transmitter and receiver
-        for node_name in self.last_placed_nodes:
-            self.scene.remove(node_name)
-        self.last_placed_nodes.clear()
+        self.remove_placed_nodes()
+        self.set_scene_state(channel_state_request.scene_state)
 
         # Get all receiver IDs
+        tx_slot = self.nodes.slot_of[tx_node]
         if self.mode == 1: # P2P
-            all_rx_nodes = [mand_rx_node]
+            rx_slots = np.array([self.nodes.slot_of[mand_rx_node]])
         else: # P2MP
-            all_rx_nodes = list(self.node_info_dict.keys())
-            all_rx_nodes.remove(tx_node)
+            rx_slots = np.delete(np.arange(len(self.nodes)), tx_slot)
+        all_rx_nodes = self.nodes.ids[rx_slots].tolist()
 
         # number of channel calculations in look ahead
         if self.mode == 3:
             look_ahead = math.ceil(self.sub_mode / len(all_rx_nodes))
+            if self.lookahead is not None:
+                look_ahead = self.lookahead.get_look_ahead(tx_node, look_ahead, simulation_time)
         else:
             look_ahead = 1
 
@@ -250,107 +564,791 @@ class SionnaEnv:
             print("Calc channel called:: %.6f: %d -> %d, #MP=%d, LAH=%d, Tc=%.2f ms"
                       % (simulation_time/1e9, tx_node, mand_rx_node, len(all_rx_nodes), look_ahead, self.chan_coh_time_mode23/1e6))
 
-        add_to_cache = dict()
-        for node_id in list(self.node_info_dict.keys()):
-            add_to_cache[node_id] = []
-
-        tx_pos = {}
-        tx_v = {}
-        all_rx_pos = {}
-        all_rx_v = {}
+        # Each link is valid according to its own relative speed and remaining straight walk time. The next
+        # look ahead slot starts when the first link expires; in each slot only the links which expire within
+        # half the worst case coherence time are computed again, i.e. links between static nodes only once.
+        slot_times = []
+        tx_pos = np.zeros((look_ahead, 3))
+        tx_v = np.zeros((look_ahead, 3))
+        all_rx_pos = np.zeros((look_ahead, len(rx_slots), 3))
+        all_rx_v = np.zeros((look_ahead, len(rx_slots), 3))
+        all_lnk_ttl = np.zeros((look_ahead, len(rx_slots)), dtype=np.int64)
+        lnk_valid_until = np.full(len(rx_slots), -1, dtype=np.int64)
+        placed_links = [] # (future_id, lnk_id) in the order the receivers are added to the scene
+        # links whose CSI is still valid from an earlier request: (future_id, lnk_id) -> (delay, loss, csi, paths)
+        served_links = dict()
+        # links whose paths are taken from the path cache: (future_id, lnk_id) -> (entry, tx_key)
+        cached_links = dict()
+        # links not traced as they are out of range even in free space: (future_id, lnk_id) -> (delay, loss, None, None)
+        culled_links = dict()
+        # links whose CSI is extrapolated from the paths of an earlier slot: (future_id, lnk_id, ref_future_id)
+        extrapolated_links = []
+        # links whose loss and delay are taken from a radio map: (future_id, lnk_id) -> (delay, loss, None, None)
+        mapped_links = dict()
+        use_radio_maps = self.radio_map_cell_size > 0 and not self.est_csi
+        # links whose CSI is derived from the paths of a close receiver in the same slot: (future_id, lnk_id, rep_lnk_id)
+        clustered_links = []
+        num_representatives = 0
+        lnk_ref = [None] * len(rx_slots) # slot of the last traced or cached paths of each link
+        # in path format the paths are shipped instead of the CFR which is synthesized by the client
+        use_paths = self.csi_format == CSI_FORMAT_PATHS
+        # without CSI only the wideband loss is needed which follows from the paths, i.e. no CFR is evaluated
+        from_paths = use_paths or not self.est_csi
+        # angles are needed to extrapolate paths, to correct the paths for clustered receivers or on request
+        need_angles = self.extrapolation_horizon > 0 or self.rx_cluster_radius > 0 or (use_paths and self.path_angles)
+        future_simulation_time = simulation_time
         # sim future node locations
         for future_id in range(look_ahead):
-            future_simulation_time = int(simulation_time + future_id * self.chan_coh_time_mode23)
-            tx_pos[future_id] = []
-            tx_v[future_id] = []
-            all_rx_pos[future_id] = []
-            all_rx_v[future_id] = []
+            slot_times.append(future_simulation_time)
 
             # Get the current node positions and velocities
-            tx_node_position, tx_node_velocity = self.get_position_and_velocity(tx_node, future_simulation_time)
-            tx_pos[future_id] = tx_node_position
-            tx_v[future_id] = tx_node_velocity
-            ce = CacheEntry(future_simulation_time, self.chan_coh_time_mode23, (tx_node_position, tx_node_velocity))
-            add_to_cache[tx_node].append(ce)
-
-            # Create the transmitter
-            tx_node_name = "tx" + str(future_id)
-            tx = Transmitter(name=tx_node_name,
-                             position=tx_node_position)
-
-            # Add transmitter instance to scene
-            self.scene.add(tx)
-            self.last_placed_nodes.append(tx_node_name)
+            tx_pos[future_id], tx_v[future_id] = self.get_position_and_velocity(tx_node, future_simulation_time)
+            all_rx_pos[future_id], all_rx_v[future_id] = self.get_positions_and_velocities(rx_slots, future_simulation_time)
 
-            # place all nodes as RX
-            for rx_node in all_rx_nodes:
+            # a node left the region of interest
+            if self.scene_roi is not None and not self.in_scene_roi(np.vstack([tx_pos[future_id], all_rx_pos[future_id]])):
+                self.use_full_scene()
 
-                if self.VERBOSE:
-                    print_csi_request(future_simulation_time, tx_node, rx_node)
+            # relative speed of all links
+            all_lnk_v = np.linalg.norm(all_rx_v[future_id] - tx_v[future_id], axis=1)
 
-                # Get the current node positions and velocities
-                rx_node_position, rx_node_velocity = self.get_position_and_velocity(rx_node, future_simulation_time)
-                all_rx_pos[future_id].append(rx_node_position)
-                all_rx_v[future_id].append(rx_node_velocity)
+            # optimistic bound of the received power: free space
+            if self.max_path_loss_db > 0:
+                all_lnk_dist = np.linalg.norm(all_rx_pos[future_id] - tx_pos[future_id], axis=1)
+                all_lnk_fs_loss = free_space_loss(all_lnk_dist, self.scene.frequency.numpy())
 
-                ce = CacheEntry(future_simulation_time, self.chan_coh_time_mode23, (rx_node_position, rx_node_velocity))
-                add_to_cache[rx_node].append(ce)
+            # links to be computed in this slot
+            if future_id == 0:
+                lnk_ids = np.arange(len(rx_slots))
+            else:
+                lnk_ids = np.flatnonzero(lnk_valid_until < future_simulation_time + self.chan_coh_time_mode23 / 2)
+
+            traced_ids = []
+            for lnk_id in lnk_ids:
+                # the CSI of the link or of its reverse direction is still valid
+                hit = None
+                if self.csi_cache is not None:
+                    hit = self.csi_cache.lookup(tx_node, all_rx_nodes[lnk_id], future_simulation_time)
+                if hit is not None:
+                    end_time, served_links[(future_id, lnk_id)] = hit
+                    all_lnk_ttl[future_id, lnk_id] = max(int(end_time - future_simulation_time), 1)
+                    lnk_valid_until[lnk_id] = future_simulation_time + all_lnk_ttl[future_id, lnk_id]
+                    lnk_ref[lnk_id] = None
+                    continue
+
+                if self.mode == 1 and self.sub_mode == 0:
+                    lnk_ttl = self.chan_coh_time_mode23
+                else:
+                    lnk_ttl = self.get_link_ttl(tx_node, all_rx_nodes[lnk_id], all_lnk_v[lnk_id],
+                                                future_simulation_time)
+                all_lnk_ttl[future_id, lnk_id] = max(int(lnk_ttl), 1)
+                lnk_valid_until[lnk_id] = future_simulation_time + all_lnk_ttl[future_id, lnk_id]
+
+                # the link cannot be received: free space delay and loss instead of ray tracing
+                if self.max_path_loss_db > 0 and all_lnk_fs_loss[lnk_id] > self.max_path_loss_db + RANGE_MARGIN_DB:
+                    culled_links[(future_id, lnk_id)] = (int(round(all_lnk_dist[lnk_id] / 299792458 * 1e9)),
+                                                         float(all_lnk_fs_loss[lnk_id]), OUT_OF_RANGE, None)
+                    lnk_ref[lnk_id] = None
+                    continue
+
+                # link between a static and a mobile node: interpolated from the radio map of the static node
+                if use_radio_maps:
+                    result = self.radio_map_lookup(tx_slot, rx_slots[lnk_id], tx_pos[future_id],
+                                                   all_rx_pos[future_id][lnk_id])
+                    if result is not None:
+                        mapped_links[(future_id, lnk_id)] = result
+                        lnk_ref[lnk_id] = None
+                        continue
+
+                # extrapolate from the last paths of the link, take the paths from the cache or trace again
+                ref_future_id = lnk_ref[lnk_id]
+                if ref_future_id is not None and self.can_extrapolate(ref_future_id, future_id, lnk_id, slot_times,
+                                                                      tx_pos, tx_v, all_rx_pos, all_rx_v):
+                    extrapolated_links.append((future_id, lnk_id, ref_future_id))
+                    continue
+
+                lnk_ref[lnk_id] = future_id
+                entry = None
+                if self.path_cache is not None:
+                    entry, tx_key = self.path_cache.lookup(tx_pos[future_id], all_rx_pos[future_id][lnk_id],
+                                                           need_angles, self.trace_settings())
+                if entry is not None:
+                    cached_links[(future_id, lnk_id)] = (entry, tx_key)
+                else:
+                    placed_links.append((future_id, lnk_id))
+                    traced_ids.append(lnk_id)
+
+            # receivers close to another traced receiver share its paths corrected for their offset
+            if self.rx_cluster_radius > 0 and len(traced_ids) > 1:
+                members = self.cluster_receivers(all_rx_pos[future_id], traced_ids)
+                clustered_links.extend((future_id, lnk_id, rep_lnk_id) for lnk_id, rep_lnk_id in members.items())
+                num_representatives += len(traced_ids) - len(members)
+                if not self.cluster_validation_pending:
+                    # only the representatives are traced
+                    for lnk_id in members:
+                        lnk_ref[lnk_id] = None
+                    traced_ids = [lnk_id for lnk_id in traced_ids if lnk_id not in members]
+                    placed_links = [(f, lnk_id) for f, lnk_id in placed_links if f != future_id or lnk_id not in members]
+
+            if len(traced_ids) > 0:
+                # Create the transmitter
+                tx_node_name = "tx" + str(future_id)
+                tx = Transmitter(name=tx_node_name,
+                                 position=tx_pos[future_id])
+
+                # Add transmitter instance to scene
+                self.scene.add(tx)
+                self.last_placed_nodes.append(tx_node_name)
+
+            # place the traced links of this slot as RX
+            for lnk_id in traced_ids:
+                rx_node = all_rx_nodes[lnk_id]
+
+                if self.VERBOSE:
+                    print_csi_request(future_simulation_time, tx_node, rx_node)
 
                 rx_node_name = "rx" + str(rx_node) + "." + str(future_id)
                 # Create the receiver
                 rx = Receiver(name=rx_node_name,
-                              position=rx_node_position)
+                              position=all_rx_pos[future_id][lnk_id])
 
                 # Add receiver instance to scene
                 self.scene.add(rx)
                 self.last_placed_nodes.append(rx_node_name)
 
+            # the next slot starts when the first link expires; stop if all links are static
+            future_simulation_time = int(np.min(lnk_valid_until))
+            if future_simulation_time - simulation_time >= 3.6e12:
+                break
+
+            # stay within the compute budget of the adaptive look ahead
+            if self.lookahead is not None and len(placed_links) >= self.lookahead.max_links:
+                break
+
+        look_ahead = len(slot_times)
+        if self.lookahead is not None:
+            self.lookahead.record(tx_node, slot_times, future_simulation_time)
+
         # update pos cache
-        for node_id in list(add_to_cache.keys()):
-            for tmp in add_to_cache[node_id]:
-                self.pos_velo_cache[node_id].append(tmp)
+        for future_id in range(look_ahead):
+            future_simulation_time = slot_times[future_id]
+            self.nodes.cache_store([tx_slot], future_simulation_time, self.chan_coh_time_mode23,
+                                   tx_pos[future_id:future_id + 1], tx_v[future_id:future_id + 1])
+            self.nodes.cache_store(rx_slots, future_simulation_time, self.chan_coh_time_mode23,
+                                   all_rx_pos[future_id], all_rx_v[future_id])
 
         # WiFi parameters
         subcarrier_spacing = self.scene.subcarrier_spacing #(self.scene.channel_bw / self.scene.fft_size)
         fft_size = self.scene.fft_size
 
+        # traced or cached paths (a, tau, angles) per (future_id, lnk_id)
+        lnk_paths = dict()
+        # delay (in ns), loss, normalized CFR and paths per (future_id, lnk_id)
+        lnk_results = dict()
+
+        if not from_paths and len(placed_links) > 0:
+            # Compute the frequencies of subcarriers and center around carrier frequency
+            frequencies = subcarrier_frequencies(num_subcarriers=fft_size,
+                                                 subcarrier_spacing=subcarrier_spacing)
+
+        # trace the links in chunks which fit into the memory budget; the results of a chunk are extracted
+        # before the next chunk is traced
+        chunks = self.split_links(placed_links, need_angles, fft_size)
+        if len(chunks) > 1:
+            all_placed = list(self.scene.transmitters.values()) + list(self.scene.receivers.values())
+            print("    tracing %d links in %d chunks" % (len(placed_links), len(chunks)))
+        for chunk in chunks:
+            if len(chunks) > 1:
+                self.place_only(all_placed, {"tx" + str(future_id) for future_id, _ in chunk}
+                                | {"rx" + str(all_rx_nodes[lnk_id]) + "." + str(future_id) for future_id, lnk_id in chunk})
+            rx_index_of = {name: i for i, name in enumerate(self.scene.receivers.keys())}
+            tx_index_of = {name: i for i, name in enumerate(self.scene.transmitters.keys())}
+            chunk_links = [(rx_index_of["rx" + str(all_rx_nodes[lnk_id]) + "." + str(future_id)],
+                            tx_index_of["tx" + str(future_id)]) for future_id, lnk_id in chunk]
+
+            a, tau, angles = self.compute_cir(with_angles=need_angles, links=chunk_links)
+
+            # copy the tensors once instead of per link
+            a_np = a.numpy()
+            tau_np = tau.numpy()
+            angles_np = [x.numpy() for x in angles] if angles is not None else None
+            self.max_num_paths = max(self.max_num_paths, tau_np.shape[-1])
+
+            if not from_paths:
+                # Compute the frequency response of the channel at frequencies once; the loss and the
+                # normalized CFR are both derived from the absolute CFR
+                # tensor: [batch size, num_rx, num_rx_ant, num_tx, num_tx_ant, num_time_steps, fft_size]
+                h_freq_raw = cir_to_ofdm_channel(frequencies=frequencies, a=a, tau=tau, normalize=False)
+
+                # copy the tensor once instead of per link
+                h_freq_raw = h_freq_raw.numpy()
+
+            for lnk_key, (rx_index, tx_index) in zip(chunk, chunk_links):
+                future_id, lnk_id = lnk_key
+                lnk_angles = [x[0, rx_index, tx_index] for x in angles_np] if angles_np is not None else None
+                lnk_paths[lnk_key] = (a_np[0, rx_index, 0, tx_index, 0, :, 0], tau_np[0, rx_index, tx_index], lnk_angles)
+                entry = None
+                if self.path_cache is not None:
+                    entry = self.path_cache.store(tx_pos[future_id], all_rx_pos[future_id][lnk_id], *lnk_paths[lnk_key],
+                                                  settings=self.trace_settings())
+
+                if from_paths:
+                    continue
+
+                lnk_h_freq_raw = h_freq_raw[:, rx_index, :, tx_index, :, :, :]
+                lnk_tau = tau_np[:, rx_index, tx_index, :]
+
+                # Calculate propagation delay and propagation loss
+                lnk_delay = int(round(np.min(lnk_tau[lnk_tau >= 0] * 1e9), 0))
+
+                # see Parseval's theorem
+                lnk_power = np.mean(np.abs(lnk_h_freq_raw) ** 2)
+                lnk_loss = float(-10 * np.log10(lnk_power))
+
+                # the channel frequency response (CFR) normalized to unit average energy
+                lnk_results[lnk_key] = (lnk_delay, lnk_loss, (lnk_h_freq_raw / np.sqrt(lnk_power)).flatten(), None)
+
+                if entry is not None:
+                    self.path_cache.add_cfr(entry, fft_size, subcarrier_spacing, lnk_h_freq_raw.flatten())
+
+        for lnk_key, (entry, tx_key) in cached_links.items():
+            lnk_paths[lnk_key] = entry.paths(tx_key)
+
+        if from_paths:
+            for lnk_key in placed_links + list(cached_links):
+                lnk_a, lnk_tau, lnk_angles = lnk_paths[lnk_key]
+                lnk_results[lnk_key] = self.link_paths_result(lnk_a, lnk_tau, lnk_angles if self.path_angles else None)
+        else:
+            # the CFR of cached links is synthesized from the paths once per OFDM grid
+            for lnk_key, (entry, tx_key) in cached_links.items():
+                lnk_h_freq_raw = self.path_cache.cfr(entry, fft_size, subcarrier_spacing)
+                lnk_power = np.mean(np.abs(lnk_h_freq_raw) ** 2)
+                lnk_delay = int(round(np.min(entry.tau[entry.tau >= 0] * 1e9), 0))
+                lnk_results[lnk_key] = (lnk_delay, float(-10 * np.log10(lnk_power)),
+                                        lnk_h_freq_raw / np.sqrt(lnk_power), None)
+
+        if len(extrapolated_links) > 0:
+            # evolve the paths with the node velocities (Doppler and delay drift)
+            frequencies_hz = subcarrier_indices(fft_size) * subcarrier_spacing
+            for future_id, lnk_id, ref_future_id in extrapolated_links:
+                ref_a, ref_tau, ref_angles = lnk_paths[(ref_future_id, lnk_id)]
+                dt = (slot_times[future_id] - slot_times[ref_future_id]) / 1e9
+                if from_paths:
+                    rate = path_length_rate(*ref_angles, tx_v[ref_future_id], all_rx_v[ref_future_id][lnk_id])
+                    lnk_a, lnk_tau = extrapolate_paths(ref_a, ref_tau, rate, dt, self.scene.frequency.numpy())
+                    lnk_results[(future_id, lnk_id)] = self.link_paths_result(
+                        lnk_a, lnk_tau, ref_angles if self.path_angles else None)
+                else:
+                    lnk_delay, lnk_loss, lnk_csi = self.extrapolate_link(
+                        ref_a, ref_tau, ref_angles, tx_v[ref_future_id], all_rx_v[ref_future_id][lnk_id],
+                        np.array([dt]), frequencies_hz)
+                    lnk_results[(future_id, lnk_id)] = (int(lnk_delay[0]), float(lnk_loss[0]), lnk_csi[0], None)
+
+        if len(clustered_links) > 0:
+            frequencies_hz = subcarrier_indices(fft_size) * subcarrier_spacing
+            for future_id, lnk_id, rep_lnk_id in clustered_links:
+                offset = all_rx_pos[future_id][lnk_id] - all_rx_pos[future_id][rep_lnk_id]
+                result = self.derive_cluster_member(*lnk_paths[(future_id, rep_lnk_id)], offset, from_paths,
+                                                    frequencies_hz)
+                traced = lnk_results.get((future_id, lnk_id))
+                if traced is None:
+                    lnk_results[(future_id, lnk_id)] = result
+                else:
+                    # validation: the member was traced as well
+                    nmse = float('nan')
+                    if traced[2] is not None:
+                        nmse = float(np.mean(np.abs(result[2] - traced[2]) ** 2) / np.mean(np.abs(traced[2]) ** 2))
+                    self.cluster_errors.append((abs(result[1] - traced[1]), nmse))
+
+            if self.cluster_validation_pending:
+                self.cluster_validation_pending = False
+            else:
+                self.cluster_stats[0] += len(clustered_links)
+                self.cluster_stats[1] += num_representatives
+
+        lnk_results.update(culled_links)
+        self.num_out_of_range += len(culled_links)
+        lnk_results.update(mapped_links)
+
+        if self.csi_cache is not None:
+            for (future_id, lnk_id), result in lnk_results.items():
+                self.csi_cache.store(tx_node, all_rx_nodes[lnk_id], slot_times[future_id],
+                                     slot_times[future_id] + all_lnk_ttl[future_id, lnk_id], result)
+            lnk_results.update(served_links)
+
+        # ZMQ response
+        chan_response = reply_wrapper.channel_state_response
+
+        links_per_slot = [[] for _ in range(look_ahead)]
+        for future_id, lnk_id in sorted(lnk_results):
+            links_per_slot[future_id].append(lnk_id)
+
+        for future_id in range(look_ahead):
+            future_simulation_time = slot_times[future_id]
+            # add new CSI
+            csi = chan_response.csi.add()
+
+            # the slot is valid as long as all of its links are valid; each link carries its own validity
+            csi.start_time = future_simulation_time
+            csi.end_time = int(future_simulation_time
+                               + min(all_lnk_ttl[future_id, lnk_id] for lnk_id in links_per_slot[future_id]))
+            # tx node info
+            csi.tx_node.id = tx_node
+            csi.tx_node.position.x = tx_pos[future_id][0]
+            csi.tx_node.position.y = tx_pos[future_id][1]
+            csi.tx_node.position.z = tx_pos[future_id][2]
+
+            for lnk_id in links_per_slot[future_id]:
+                rx_node = all_rx_nodes[lnk_id]
+                lnk_delay, lnk_loss, lnk_csi, lnk_paths = lnk_results[(future_id, lnk_id)]
+
+                #if self.VERBOSE:
+                #    self.print_csi_response(simulation_time, tx_node, rx_node, tx_node_position, all_rx_pos[future_id][lnk_id], lnk_delay, lnk_loss, lnk_ttl)
+
+                rx_node_info = csi.rx_nodes.add()
+                rx_node_info.id = rx_node
+                rx_node_info.position.x = all_rx_pos[future_id][lnk_id][0]
+                rx_node_info.position.y = all_rx_pos[future_id][lnk_id][1]
+                rx_node_info.position.z = all_rx_pos[future_id][lnk_id][2]
+                rx_node_info.delay = lnk_delay
+                rx_node_info.wb_loss = lnk_loss
+                rx_node_info.end_time = int(future_simulation_time + all_lnk_ttl[future_id, lnk_id])
+
+                if lnk_csi is OUT_OF_RANGE:
+                    # no CSI
+                    rx_node_info.out_of_range = True
+
+                elif self.est_csi and lnk_paths is not None:
+                    # complex amplitude, delay (in ns) and optionally angles per path
+                    path_a, path_tau, path_angles = lnk_paths
+                    rx_node_info.path_a_real.extend(np.real(path_a).tolist())
+                    rx_node_info.path_a_imag.extend(np.imag(path_a).tolist())
+                    rx_node_info.path_delay.extend((path_tau * 1e9).tolist())
+                    if path_angles is not None:
+                        rx_node_info.path_theta_t.extend(path_angles[0].tolist())
+                        rx_node_info.path_phi_t.extend(path_angles[1].tolist())
+                        rx_node_info.path_theta_r.extend(path_angles[2].tolist())
+                        rx_node_info.path_phi_r.extend(path_angles[3].tolist())
+
+                elif self.est_csi:
+                    # avoid rounding errors
+                    frequencies = subcarrier_indices(fft_size) * subcarrier_spacing
+                    rx_node_info.frequencies.extend(frequencies.tolist())
+                    #rx_node_info.frequencies.extend(list(frequencies.numpy().astype(int)))
+                    rx_node_info.csi_imag.extend(list(np.imag(lnk_csi)))
+                    rx_node_info.csi_real.extend(list(np.real(lnk_csi)))
+
+        #if self.VERBOSE:
+        last_sim = slot_times[-1]
+        print("Calc channel finished:: LAH: Twin=%.6f -> %.6f" % (simulation_time/1e9, last_sim/1e9))
+        if (len(extrapolated_links) > 0 or len(cached_links) > 0 or len(served_links) > 0 or len(culled_links) > 0
+                or len(clustered_links) > 0 or len(mapped_links) > 0):
+            print("    traced links: %d, cached links: %d, extrapolated links: %d, CSI cache hits: %d, out of range: %d, "
+                  "clustered links: %d, radio map links: %d"
+                  % (len(placed_links), len(cached_links), len(extrapolated_links), len(served_links),
+                     len(culled_links), len(clustered_links), len(mapped_links)))
+
+
+    def compute_cir(self, with_angles=False, links=None, allow_empty=False):
+        '''
+        Traces the paths between all placed transmitters and receivers and returns the channel impulse
+        response (a, tau) and, if requested, the angles of departure and arrival [theta_t, phi_t, theta_r, phi_r].
+        links are the (rx index, tx index) pairs which are actually needed; required for the progressive depth
+        and the selective diffraction. Without any paths, (None, None, None) is returned if allow_empty and the
+        simulation is stopped otherwise.
+        '''
+        if self.rt_sample_convergence:
+            self.check_sample_convergence()
+
+        progressive = self.rt_progressive_depth and self.rt_max_depth > 1
+        if links is None or not (progressive or self.rt_selective_diffraction):
+            return self.trace_cir(self.rt_max_depth, with_angles, allow_empty=allow_empty)
+
+        # the placed nodes in the order of the CIR layout
+        nodes = (list(self.scene.transmitters.values()), list(self.scene.receivers.values()))
+        links = list(dict.fromkeys(links))
+        diffraction = self.rt_calc_diffraction and not self.rt_selective_diffraction
+
+        # with selective diffraction, links without any paths in the first pass get the diffraction pass
+        if progressive:
+            results = self.trace_links_progressive(nodes, links, with_angles, diffraction,
+                                                   self.rt_selective_diffraction or allow_empty)
+        else:
+            results = self.trace_links(nodes, links, self.rt_max_depth, with_angles, diffraction,
+                                       self.rt_selective_diffraction or allow_empty)
+
+        if self.rt_selective_diffraction:
+            # second pass with diffraction only for the links without LOS or with low power
+            nlos_links = [lnk for lnk in links if not self.has_strong_los(nodes, lnk, *results[lnk][:2])]
+            self.diffraction_stats[0] += len(links)
+            self.diffraction_stats[1] += len(nlos_links)
+            if len(nlos_links) > 0:
+                results.update(self.trace_links(nodes, nlos_links, self.rt_max_depth, with_angles, True,
+                                                allow_empty))
+
+        if allow_empty and all(len(lnk_tau) == 0 for _, lnk_tau, _ in results.values()):
+            return None, None, None
+        return self.assemble_cir(nodes, results, with_angles)
+
+
+    def trace_settings(self):
+        '''
+        Settings of the ray tracer the traced paths depend on; part of the key of the path cache, so that paths
+        traced e.g. before the sample convergence check are not served afterwards
+        '''
+        return (self.num_samples, self.rt_max_depth, self.rt_calc_diffraction, self.rt_selective_diffraction,
+                self.rt_diffraction_threshold_db, self.rt_progressive_depth, self.rt_depth_tolerance_db)
+
+
+    def check_sample_convergence(self, tolerance_db=0.5, max_samples=int(1e7)):
+        '''
+        Doubles the no. of rays as long as the paths of the placed links still change with twice the rays,
+        i.e. the no. of paths or the received power of a link; done once per simulation with the first links
+        '''
+        self.rt_sample_convergence = False
+
+        def link_stats(num_samples):
+            self.num_samples = num_samples
+            a, tau, _ = self.trace_cir(self.rt_max_depth)
+            a, tau = a.numpy()[0, :, 0, :, 0, :, 0], tau.numpy()[0]
+            return np.sum(tau >= 0, axis=-1), np.sum(np.abs(a) ** 2 * (tau >= 0), axis=-1)
+
+        num_samples = self.num_samples
+        num_paths, power = link_stats(num_samples)
+        while num_samples < max_samples:
+            num_paths2, power2 = link_stats(2 * num_samples)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                power_diff = np.abs(10 * np.log10(power2 / power))
+            power_diff[(power == 0) & (power2 == 0)] = 0
+            if np.array_equal(num_paths, num_paths2) and np.all(power_diff <= tolerance_db):
+                break
+            print("Ray samples %d -> %d: paths %d -> %d, max. power change %.2f dB"
+                  % (num_samples, 2 * num_samples, np.sum(num_paths), np.sum(num_paths2), np.max(power_diff)))
+            num_samples *= 2
+            num_paths, power = num_paths2, power2
+
+        self.num_samples = num_samples
+        print("Using %d rays per source after convergence check" % num_samples)
+
+
+    def radio_map_lookup(self, tx_slot, rx_slot, tx_position, rx_position):
+        '''
+        Returns the result (delay, loss, None, None) of a link between a static and a mobile node from the radio
+        map of the static node or None if the link has to be ray traced
+        '''
+        tx_static = self.nodes.model[tx_slot] == NodeTable.MODEL_CONSTANT_POSITION
+        rx_static = self.nodes.model[rx_slot] == NodeTable.MODEL_CONSTANT_POSITION
+        if tx_static == rx_static:
+            return None
+
+        # the channel is reciprocal, i.e. the map of a static RX also serves a mobile TX
+        static_slot, static_position, position = ((tx_slot, tx_position, rx_position) if tx_static
+                                                  else (rx_slot, rx_position, tx_position))
+        self.radio_map_stats[1] += 1
+        radio_map = self.get_radio_map(int(self.nodes.ids[static_slot]), static_position, position[2])
+        result = radio_map.lookup(position)
+        if result is None:
+            return None
+
+        self.radio_map_stats[0] += 1
+        return result[0], result[1], None, None
+
+
+    def get_radio_map(self, node_id, position, height):
+        '''
+        Returns the radio map of the static node at the height rounded to 0.1 m; loaded from radio_map_dir or
+        computed and stored there
+        '''
+        height = round(float(height), 1)
+        radio_map = self.radio_maps.get((node_id, height))
+        if radio_map is not None:
+            return radio_map
+
+        # keyed by the content of the scene, i.e. a modified scene under the same path gets new radio maps, and by
+        # the objects moved out of the way for the scene state
+        if self.rt_scene_hash is None:
+            self.rt_scene_hash = SceneCache.content_hash(self.rt_scene_filepath)
+        fname = RadioMap.file_name(self.radio_map_dir, self.rt_scene_hash, tuple(sorted(self.parked_objects)),
+                                   float(self.scene.frequency.numpy()),
+                                   tuple(np.round(position, 3).tolist()), height, self.radio_map_cell_size,
+                                   self.rt_max_depth, self.rt_calc_diffraction)
+        if os.path.exists(fname):
+            radio_map = RadioMap.load(fname)
+            print("Loaded radio map of node %d at %.1f m from %s" % (node_id, height, fname))
+        else:
+            start = time.time()
+            radio_map = self.compute_radio_map(position, height)
+            os.makedirs(self.radio_map_dir, exist_ok=True)
+            radio_map.save(fname)
+            print("Computed radio map of node %d at %.1f m (%dx%d cells) in %.2fs, stored to %s"
+                  % (node_id, height, radio_map.gain.shape[1], radio_map.gain.shape[0], time.time() - start, fname))
+
+        self.radio_maps[(node_id, height)] = radio_map
+        return radio_map
+
+
+    def compute_radio_map(self, position, height):
+        '''
+        Computes the coverage map of a transmitter at position over the whole scene at the given height
+        '''
+        # only the transmitter of the map may be placed
+        placed_txs = list(self.scene.transmitters.values())
+        for tx in placed_txs:
+            self.scene.remove(tx.name)
+        self.scene.add(Transmitter(name="radio_map_tx", position=position))
+
+        bbox = self.mi_scene.bbox()
+        scene_min, scene_max = np.array(bbox.min), np.array(bbox.max)
+        center = [(scene_min[0] + scene_max[0]) / 2, (scene_min[1] + scene_max[1]) / 2, height]
+        size = [scene_max[0] - scene_min[0], scene_max[1] - scene_min[1]]
+        cell_size = [self.radio_map_cell_size, self.radio_map_cell_size]
+        cm = self.scene.coverage_map(max_depth=self.rt_max_depth,
+                                     cm_center=center,
+                                     cm_orientation=[0, 0, 0],
+                                     cm_size=size,
+                                     cm_cell_size=cell_size,
+                                     los=True,
+                                     reflection=True,
+                                     diffraction=self.rt_calc_diffraction,
+                                     scattering=False)
+
+        self.scene.remove("radio_map_tx")
+        for tx in placed_txs:
+            self.scene.add(tx)
+        return RadioMap(position, center, size, cell_size, cm.as_tensor().numpy()[0])
+
+
+    def cluster_receivers(self, positions, lnk_ids):
+        '''
+        Greedy clustering of the receivers lnk_ids by their positions: a receiver within rx_cluster_radius of a
+        representative joins its cluster, otherwise it becomes a representative. Returns lnk_id -> lnk_id of
+        the representative for all receivers which are not representatives.
+        '''
+        rep_ids = []
+        members = dict()
+        for lnk_id in lnk_ids:
+            if len(rep_ids) > 0:
+                dist = np.linalg.norm(positions[rep_ids] - positions[lnk_id], axis=1)
+                closest = int(np.argmin(dist))
+                if dist[closest] <= self.rx_cluster_radius:
+                    members[lnk_id] = rep_ids[closest]
+                    continue
+            rep_ids.append(lnk_id)
+        return members
+
+
+    def derive_cluster_member(self, a, tau, angles, offset, from_paths, frequencies):
+        '''
+        Derives the CSI of a receiver at offset (in m) from the paths (a, tau, angles) traced to its cluster
+        representative: the delay and phase of each path change with the projection of the offset onto the
+        direction of arrival (plane wave). Returns (delay, loss, csi, paths) like the traced links.
+        '''
+        if from_paths:
+            rate = path_length_rate(*angles, np.zeros(3), offset)
+            lnk_a, lnk_tau = extrapolate_paths(a, tau, rate, 1.0, self.scene.frequency.numpy())
+            return self.link_paths_result(lnk_a, lnk_tau, angles if self.path_angles else None)
+
+        lnk_delay, lnk_loss, lnk_csi = self.extrapolate_link(a, tau, angles, np.zeros(3), offset, np.array([1.0]),
+                                                             frequencies)
+        return int(lnk_delay[0]), float(lnk_loss[0]), lnk_csi[0], None
+
+
+    def split_links(self, links, with_angles, fft_size):
+        '''
+        Splits the links (future_id, lnk_id) to be traced into chunks whose estimated memory footprint of
+        ray tracing and CFR stays within rt_memory_budget; a chunk has at least one link. All transmitters and
+        receivers of a chunk are traced together, i.e. the CIR and CFR tensors grow with #RX x #TX.
+        '''
+        if len(links) == 0:
+            return []
+        if self.rt_memory_budget <= 0:
+            return [links]
+
+        bytes_per_path = RT_BYTES_PER_PATH + (16 if with_angles else 0)
+        bytes_per_pair = self.max_num_paths * bytes_per_path + fft_size * 8 # CFR in complex64
+
+        chunks = []
+        chunk, chunk_tx = [], set()
+        for lnk in links:
+            num_tx = len(chunk_tx | {lnk[0]})
+            footprint = (num_tx * self.num_samples * self.rt_max_depth * RT_BYTES_PER_RAY
+                         + (len(chunk) + 1) * num_tx * bytes_per_pair)
+            if len(chunk) > 0 and footprint > self.rt_memory_budget:
+                chunks.append(chunk)
+                chunk, chunk_tx = [], set()
+            chunk.append(lnk)
+            chunk_tx.add(lnk[0])
+        chunks.append(chunk)
+        return chunks
+
+
+    def place_only(self, nodes, keep):
+        '''
+        Places only the nodes whose name is in keep into the scene and removes all others
+        '''
+        for node in nodes:
+            placed = self.scene.get(node.name) is not None
+            if node.name in keep and not placed:
+                self.scene.add(node)
+            elif node.name not in keep and placed:
+                self.scene.remove(node.name)
+
+
+    def trace_links(self, nodes, links, max_depth, with_angles=False, diffraction=False, allow_empty=False):
+        '''
+        Traces only the given links (rx index, tx index) into nodes = (transmitters, receivers), i.e. all
+        other nodes are removed from the scene. Returns (a, tau, angles) per link; without any paths the links
+        have no paths if allow_empty, i.e. another pass follows.
+        '''
+        txs, rxs = nodes
+        self.place_only(txs + rxs,
+                        {rxs[rx_index].name for rx_index, _ in links} | {txs[tx_index].name for _, tx_index in links})
+
+        a, tau, angles = self.trace_cir(max_depth, with_angles, diffraction, allow_empty)
+        if a is None:
+            no_paths = np.zeros(0, dtype=np.float32)
+            return {lnk: (no_paths.astype(np.complex64), no_paths, [no_paths] * 4 if with_angles else None)
+                    for lnk in links}
+        a, tau = a.numpy(), tau.numpy()
+        angles = [x.numpy() for x in angles] if angles is not None else None
+        rx_index_of = {name: i for i, name in enumerate(self.scene.receivers.keys())}
+        tx_index_of = {name: i for i, name in enumerate(self.scene.transmitters.keys())}
+
+        results = dict()
+        for rx_index, tx_index in links:
+            rx_i, tx_i = rx_index_of[rxs[rx_index].name], tx_index_of[txs[tx_index].name]
+            results[(rx_index, tx_index)] = (a[0, rx_i, 0, tx_i, 0, :, 0], tau[0, rx_i, tx_i],
+                                             [x[0, rx_i, tx_i] for x in angles] if angles is not None else None)
+        return results
+
+
+    def trace_links_progressive(self, nodes, links, with_angles=False, diffraction=False, allow_empty=False):
+        '''
+        Traces the links with increasing max. depth starting at 1. A link is done as soon as the received power
+        (sum of the path powers) changed by at most rt_depth_tolerance_db with the last depth; for depth 1 the
+        free space power is used as reference if the link has LOS. Only the remaining links are traced again at
+        the next depth, i.e. LOS links typically finish at depth 1-2 while NLOS links get the full depth.
+        Links without paths at a depth are not converged; only the pass at rt_max_depth fails without any
+        paths unless allow_empty. Returns (a, tau, angles) per link of its final depth.
+        '''
+        results = dict()
+        last_power = dict() # link -> received power at the last traced depth
+        pending = links
+        depth = 1
+        while len(pending) > 0:
+            not_converged = []
+            final = depth >= self.rt_max_depth
+            for lnk, (lnk_a, lnk_tau, lnk_angles) in self.trace_links(nodes, pending, depth, with_angles, diffraction,
+                                                                      allow_empty or not final).items():
+                results[lnk] = (lnk_a, lnk_tau, lnk_angles)
+
+                power = float(np.sum(np.abs(lnk_a[lnk_tau >= 0]) ** 2))
+                if depth == 1:
+                    # compare with the LOS path only if the link has LOS
+                    fs_power, los_tau = self.free_space_los(nodes, lnk)
+                    prev_power = fs_power if np.any(np.abs(lnk_tau - los_tau) < 1e-10) else 0.0
+                else:
+                    prev_power = last_power[lnk]
+                last_power[lnk] = power
+
+                converged = (prev_power > 0 and power > 0
+                             and abs(10 * np.log10(power / prev_power)) <= self.rt_depth_tolerance_db)
+                if converged or final:
+                    self.depth_stats[depth] = self.depth_stats.get(depth, 0) + 1
+                else:
+                    not_converged.append(lnk)
+
+            pending = not_converged
+            depth += 1
+
+        return results
+
+
+    def free_space_los(self, nodes, lnk):
+        '''
+        Power and delay (in s) of the LOS path of a link in free space
+        '''
+        txs, rxs = nodes
+        dist = np.linalg.norm(rxs[lnk[0]].position.numpy() - txs[lnk[1]].position.numpy())
+        wavelength = 299792458 / float(self.scene.frequency.numpy())
+        return (wavelength / (4 * np.pi * max(dist, 1e-9))) ** 2, dist / 299792458
+
+
+    def has_strong_los(self, nodes, lnk, a, tau):
+        '''
+        Whether the link has a LOS path and its received power is at most rt_diffraction_threshold_db below
+        the free space power; otherwise diffraction is computed for the link
+        '''
+        fs_power, los_tau = self.free_space_los(nodes, lnk)
+        if not np.any(np.abs(tau - los_tau) < 1e-10):
+            return False
+        power = float(np.sum(np.abs(a[tau >= 0]) ** 2))
+        return power > 0 and 10 * np.log10(fs_power / power) <= self.rt_diffraction_threshold_db
+
+
+    def assemble_cir(self, nodes, results, with_angles=False):
+        '''
+        Assembles the paths per link into the CIR layout of compute_cir; pairs without results have no paths
+        '''
+        txs, rxs = nodes
+        max_num_paths = max(len(x[1]) for x in results.values())
+        a = np.zeros((1, len(rxs), 1, len(txs), 1, max_num_paths, 1), dtype=np.complex64)
+        tau = np.full((1, len(rxs), len(txs), max_num_paths), -1.0, dtype=np.float32)
+        angles = [np.zeros(tau.shape, dtype=np.float32) for _ in range(4)] if with_angles else None
+        for (rx_index, tx_index), (lnk_a, lnk_tau, lnk_angles) in results.items():
+            num_paths = len(lnk_tau)
+            a[0, rx_index, 0, tx_index, 0, :num_paths, 0] = lnk_a
+            tau[0, rx_index, tx_index, :num_paths] = lnk_tau
+            if with_angles:
+                for x, lnk_x in zip(angles, lnk_angles):
+                    x[0, rx_index, tx_index, :num_paths] = lnk_x
+
+        return tf.constant(a), tf.constant(tau), [tf.constant(x) for x in angles] if with_angles else None
+
+
+    def trace_cir(self, max_depth, with_angles=False, diffraction=None, allow_empty=False):
+        '''
+        Traces the paths up to max_depth between all placed transmitters and receivers; see compute_cir.
+        Diffraction is computed as configured unless given. Without any paths, (None, None, None) is returned
+        if allow_empty and the simulation is stopped otherwise.
+        '''
+        if diffraction is None:
+            diffraction = self.rt_calc_diffraction
+
         a, tau = 0, 0
+        angles = None
         a_tau_set = False
 
         # Compute propagation paths
-        paths = self.scene.compute_paths(max_depth=self.rt_max_depth,
+        paths = self.scene.compute_paths(max_depth=max_depth,
                                     method="fibonacci",
-                                    num_samples=1e6,
+                                    num_samples=self.num_samples,
                                     los=True,
                                     reflection=True,
-                                    diffraction=self.rt_calc_diffraction,
+                                    diffraction=diffraction,
                                     scattering=False)
 
         has_paths = bool(paths.types.numpy().size)
         has_los_path = np.any(paths.types.numpy()[0] == 0)
 
-        # If no LOS path was found, check again with different compute_paths parameters
+        # If no LOS path was found, check the LOS visibility of all pairs again with a single batched
+        # occlusion query instead of a second ray tracing pass
         if not has_los_path:
-            los_path = self.scene.compute_paths(max_depth=0,
-                                           method="fibonacci",
-                                           num_samples=1e6,
-                                           los=True,
-                                           reflection=False,
-                                           diffraction=False,
-                                           scattering=False)
+            los_path = self.compute_los_paths(with_angles)
 
-            has_los_path = bool(los_path.types.numpy().size)
+            has_los_path = los_path is not None
 
             if not has_paths and not has_los_path:
+                if allow_empty:
+                    return None, None, None
                 raise SystemExit(
                     "Error: Propagation loss and propagation delay cannot be calculated because no propagation paths were found. "
                     "Make sure that the nodes are not spatially separated in the 3D model and check the parameters of the compute_path() function.")
             if has_los_path:
-                # Disable normalization of delays for LOS path
-                los_path.normalize_delays = False
-                # Compute the channel impulse response for LOS path
-                a, tau = los_path.cir()
+                a, tau, los_angles = los_path
                 a_tau_set = True
+                if with_angles:
+                    angles = los_angles
 
         if has_paths:
             # Disable normalization of delays for paths
@@ -365,126 +1363,255 @@ class SionnaEnv:
             else:
                 a, tau = a_paths, tau_paths
 
-        # Compute the frequencies of subcarriers and center around carrier frequency
-        frequencies = subcarrier_frequencies(num_subcarriers=fft_size,
-                                             subcarrier_spacing=subcarrier_spacing)
+            if with_angles:
+                paths_angles = [paths.theta_t, paths.phi_t, paths.theta_r, paths.phi_r]
+                if a_tau_set:
+                    angles = [tf.concat([x, y], axis=3) for x, y in zip(angles, paths_angles)]
+                else:
+                    angles = paths_angles
 
-        # Compute the frequency response of the channel at frequencies
-        # tensor: [batch size, num_rx, num_rx_ant, num_tx, num_tx_ant, num_time_steps, fft_size]
-        # absolute
-        h_freq_raw = cir_to_ofdm_channel(frequencies=frequencies, a=a, tau=tau, normalize=False)
-        # norm
-        h_freq = cir_to_ofdm_channel(frequencies=frequencies, a=a, tau=tau, normalize=True)
+        return a, tau, angles
 
-        # ZMQ response
-        chan_response = reply_wrapper.channel_state_response
 
-        for future_id in range(look_ahead):
-            future_simulation_time = int(simulation_time + future_id * self.chan_coh_time_mode23)
-            # add new CSI
-            csi = chan_response.csi.add()
+    def compute_los_paths(self, with_angles=False):
+        '''
+        Computes the LOS paths between all placed transmitters and receivers without ray tracing: the
+        visibility of all pairs is tested with one batched occlusion query and the LOS coefficient of the
+        visible pairs follows analytically from free space propagation between the isotropic antennas.
+        Returns (a, tau, angles) shaped like compute_cir with a single path (a=0, tau=-1 for pairs without
+        LOS) or None if no pair has LOS.
+        '''
+        tx_pos = np.array([tx.position.numpy() for tx in self.scene.transmitters.values()], dtype=np.float64)
+        rx_pos = np.array([rx.position.numpy() for rx in self.scene.receivers.values()], dtype=np.float64)
+
+        # [num_rx, num_tx, 3]
+        d = rx_pos[:, None, :] - tx_pos[None, :, :]
+        dist = np.linalg.norm(d, axis=-1)
+        k = d / np.maximum(dist, 1e-9)[..., None]
+
+        # one ray per pair from the TX towards the RX; shortened at both ends like Sionna does to not hit
+        # the primitives the nodes are placed on
+        eps = 1e-4
+        o = (np.broadcast_to(tx_pos[None, :, :], d.shape) + eps * k).reshape(-1, 3).astype(np.float32)
+        k_flat = k.reshape(-1, 3).astype(np.float32)
+        maxt = np.maximum(dist.reshape(-1) - 2 * eps, 0).astype(np.float32)
+        ray = mi.Ray3f(o=mi.Point3f(mi.Float(o[:, 0]), mi.Float(o[:, 1]), mi.Float(o[:, 2])),
+                       d=mi.Vector3f(mi.Float(k_flat[:, 0]), mi.Float(k_flat[:, 1]), mi.Float(k_flat[:, 2])),
+                       maxt=mi.Float(maxt), time=0., wavelengths=mi.Color0f(0.))
+        visible = np.logical_not(np.array(self.scene.mi_scene.ray_test(ray), dtype=bool)).reshape(dist.shape)
+        if not np.any(visible):
+            return None
+
+        # baseband coefficient as returned by Paths.cir(): lambda/(4 pi d) exp(-j 2 pi fc tau)
+        fc = float(self.scene.frequency.numpy())
+        lnk_tau = dist / 299792458
+        lnk_a = (299792458 / fc) / (4 * np.pi * np.maximum(dist, 1e-9)) * np.exp(-2j * np.pi * fc * lnk_tau)
+
+        # a: [batch size, num_rx, num_rx_ant, num_tx, num_tx_ant, num_paths, num_time_steps]
+        a = tf.constant(np.where(visible, lnk_a, 0)[None, :, None, :, None, None, None], dtype=tf.complex64)
+        # tau: [batch size, num_rx, num_tx, num_paths]
+        tau = tf.constant(np.where(visible, lnk_tau, -1.0)[None, :, :, None], dtype=tf.float32)
+
+        angles = None
+        if with_angles:
+            theta_t = np.arccos(np.clip(k[..., 2], -1, 1))
+            phi_t = np.arctan2(k[..., 1], k[..., 0])
+            theta_r = np.pi - theta_t
+            phi_r = np.arctan2(-k[..., 1], -k[..., 0])
+            angles = [tf.constant(x[None, :, :, None], dtype=tf.float32) for x in (theta_t, phi_t, theta_r, phi_r)]
+
+        return a, tau, angles
+
+
+    def link_paths_result(self, a, tau, angles=None):
+        '''
+        Delay of the shortest path (in ns), exact wideband loss (in dB) and the paths of a link after pruning
+        weak paths; angles are passed through if given
+        '''
+        lnk_delay = int(round(np.min(tau[tau >= 0] * 1e9), 0))
+        lnk_loss = float(-10 * np.log10(wideband_power(a, tau, self.scene.subcarrier_spacing, self.scene.fft_size)))
 
-            csi.start_time = future_simulation_time
-            csi.end_time = int(future_simulation_time + self.chan_coh_time_mode23)
-            # tx node info
-            csi.tx_node.id = tx_node
-            csi.tx_node.position.x = tx_pos[future_id][0]
-            csi.tx_node.position.y = tx_pos[future_id][1]
-            csi.tx_node.position.z = tx_pos[future_id][2]
+        keep = strong_paths(a, tau, self.path_pruning_threshold_db)
+        lnk_angles = [x[keep] for x in angles] if angles is not None else None
+        return lnk_delay, lnk_loss, None, (a[keep], tau[keep], lnk_angles)
 
-            for lnk_id, rx_node in enumerate(all_rx_nodes):
-                # compute the index for the rx nodes into tensor
-                tf_index = future_id * len(all_rx_nodes) + lnk_id
 
-                lnk_h_freq_raw = h_freq_raw.numpy()[:, tf_index, :, future_id, :, :, :]
-                lnk_h_freq = h_freq.numpy()[:, tf_index, :, future_id, :, :, :]
-                lnk_tau = tau.numpy()[:, tf_index, future_id, :]
+    def extrapolate_link(self, a, tau, angles, v_tx, v_rx, dt, frequencies):
+        '''
+        Evolves the traced paths (a, tau, angles) of a link by the time offsets dt (in s) with the node
+        velocities v_tx and v_rx. Returns per time offset the delay of the shortest path (in ns), the
+        wideband loss (in dB) and the normalized CFR at the given frequencies.
+        '''
+        rate = path_length_rate(*angles, v_tx, v_rx)
+        lnk_a, lnk_tau = extrapolate_paths(a[None, :], tau[None, :], rate[None, :], dt[:, None],
+                                           self.scene.frequency.numpy())
 
-                # Calculate propagation delay and propagation loss
-                lnk_delay = int(round(np.min(lnk_tau[lnk_tau >= 0] * 1e9), 0))
+        h_freq_raw = cfr_from_paths(lnk_a, lnk_tau, frequencies)
+        power = np.mean(np.abs(h_freq_raw) ** 2, axis=-1)
+        delay = np.round(np.min(np.where(lnk_tau >= 0, lnk_tau, np.inf), axis=-1) * 1e9).astype(np.int64)
+        loss = -10 * np.log10(power)
+        return delay, loss, h_freq_raw / np.sqrt(power)[:, None]
 
-                # see Parseval's theorem
-                lnk_loss = float(-10 * np.log10(tf.reduce_mean(tf.abs(lnk_h_freq_raw) ** 2).numpy()))
 
-                # the channel frequency response (CFR)
-                lnk_csi = lnk_h_freq.flatten()
+    def calculate_csi_time_series(self, csi_request, reply_wrapper):
+        '''
+        Computes the CSI of a single link at many points in time from few ray tracing snapshots: the paths are
+        traced once and evolved in time with the node velocities; a new snapshot is traced once a node moved
+        more than the allowed drift or changed its velocity
+        '''
+        tx_node = csi_request.tx_node
+        rx_node = csi_request.rx_node
 
-                if self.mode == 1 and self.sub_mode > 0:
-                    # Calculate the time to live for the cache entry with the coherence time and the remaining times
-                    # until the nodes change their walk direction
-                    # If both nodes have the constant position model, the ttl is equal to one hour
-                    tx_delay_left = 3.6e12
-                    rx_delay_left = 3.6e12
-                    if self.node_info_dict[tx_node]["model"] == "Random Walk":
-                        tx_delay_left = self.node_info_dict[tx_node]["delay left"]
-                    if self.node_info_dict[rx_node]["model"] == "Random Walk":
-                        rx_delay_left = self.node_info_dict[rx_node]["delay left"]
+        fft_size = self.scene.fft_size
+        frequencies = subcarrier_indices(fft_size) * self.scene.subcarrier_spacing
+
+        response = reply_wrapper.csi_time_series_response
+        response.tx_node = tx_node
+        response.rx_node = rx_node
+        response.frequencies.extend(frequencies.astype(int).tolist())
+
+        if len(csi_request.times) > 0:
+            times = np.sort(np.array(csi_request.times, dtype=np.int64))
+        elif csi_request.sampling_rate > 0:
+            times = np.arange(csi_request.start_time, csi_request.end_time,
+                              1e9 / csi_request.sampling_rate).astype(np.int64)
+        else:
+            times = np.zeros(0, dtype=np.int64)
+        if len(times) == 0:
+            # empty interval or no sampling rate: nothing to compute
+            print("CSI time series called:: %d -> %d, no samples" % (tx_node, rx_node))
+            return
+        max_drift = csi_request.max_drift if csi_request.max_drift > 0 else self.extrapolation_distance
+
+        print("CSI time series called:: %.6f -> %.6f: %d -> %d, #samples=%d"
+              % (times[0]/1e9, times[-1]/1e9, tx_node, rx_node, len(times)))
+
+        self.remove_all_cached_entries(int(times[0]))
+        self.remove_placed_nodes()
+        self.set_scene_state(csi_request.scene_state)
+
+        # node positions/velocities at all points in time
+        slots = [self.nodes.slot_of[tx_node], self.nodes.slot_of[rx_node]]
+        positions = np.zeros((len(times), 2, 3))
+        velocities = np.zeros((len(times), 2, 3))
+        for k, t in enumerate(times):
+            positions[k], velocities[k] = self.get_positions_and_velocities(slots, int(t))
+
+        # choose the snapshots to be traced
+        ref_of = np.zeros(len(times), dtype=np.int64)
+        refs = [0]
+        for k in range(1, len(times)):
+            ref = refs[-1]
+            if (np.max(np.linalg.norm(positions[k] - positions[ref], axis=1)) > max_drift
+                    or not np.allclose(velocities[k], velocities[ref])):
+                refs.append(k)
+            ref_of[k] = len(refs) - 1
+
+        delay = np.zeros(len(times), dtype=np.int64)
+        loss = np.zeros(len(times))
+        csi = np.zeros((len(times), fft_size), dtype=np.complex64)
+
+        # trace the snapshots in chunks to limit the no. of TX/RX combinations per call
+        for chunk_start in range(0, len(refs), self.rt_max_parallel_links):
+            chunk = refs[chunk_start:chunk_start + self.rt_max_parallel_links]
+            for i, ref in enumerate(chunk):
+                tx_name, rx_name = "tx" + str(i), "rx" + str(rx_node) + "." + str(i)
+                self.scene.add(Transmitter(name=tx_name, position=positions[ref, 0]))
+                self.scene.add(Receiver(name=rx_name, position=positions[ref, 1]))
+                self.last_placed_nodes.extend([tx_name, rx_name])
+
+            a, tau, angles = self.compute_cir(with_angles=True, links=[(i, i) for i in range(len(chunk))])
+            a = a.numpy()
+            tau = tau.numpy()
+            angles = [x.numpy() for x in angles]
+
+            for i, ref in enumerate(chunk):
+                ks = np.flatnonzero(ref_of == chunk_start + i)
+                dt = (times[ks] - times[ref]) / 1e9
+                delay[ks], loss[ks], csi[ks] = self.extrapolate_link(
+                    a[0, i, 0, i, 0, :, 0], tau[0, i, i], [x[0, i, i] for x in angles],
+                    velocities[ref, 0], velocities[ref, 1], dt, frequencies)
+
+            self.remove_placed_nodes()
 
-                    lnk_delay_left = min(tx_delay_left, rx_delay_left)
+        # ZMQ response
+        response.times.extend(times.tolist())
+        response.csi = csi.astype('<c8').tobytes()
+        response.wb_loss.extend(loss.tolist())
+        response.delay.extend(delay.tolist())
+        response.num_traces = len(refs)
 
-                    lnk_ttl = int(lnk_delay_left)
-                    lnk_v = np.linalg.norm(np.array(tx_v[future_id]) - np.array(all_rx_v[future_id][lnk_id]))
+        print("CSI time series finished:: #samples=%d, #traces=%d" % (len(times), len(refs)))
 
-                    if lnk_v != 0:
-                        # compute channel coherence time
-                        lnk_ttl = int(
-                            min(9 * 299792458 * 1e9 / (16 * np.pi * lnk_v * self.scene.frequency.numpy()), lnk_delay_left))
 
-                    csi.end_time = int(future_simulation_time + lnk_ttl)
+    def remove_placed_nodes(self):
+        for node_name in self.last_placed_nodes:
+            self.scene.remove(node_name)
+        self.last_placed_nodes.clear()
 
-                #if self.VERBOSE:
-                #    self.print_csi_response(simulation_time, tx_node, rx_node, tx_node_position, all_rx_pos[future_id][lnk_id], lnk_delay, lnk_loss, lnk_ttl)
 
-                rx_node_info = csi.rx_nodes.add()
-                rx_node_info.id = rx_node
-                rx_node_info.position.x = all_rx_pos[future_id][lnk_id][0]
-                rx_node_info.position.y = all_rx_pos[future_id][lnk_id][1]
-                rx_node_info.position.z = all_rx_pos[future_id][lnk_id][2]
-                rx_node_info.delay = lnk_delay
-                rx_node_info.wb_loss = lnk_loss
+    def can_extrapolate(self, ref_future_id, future_id, lnk_id, slot_times, tx_pos, tx_v, all_rx_pos, all_rx_v):
+        '''
+        Whether the CSI of a link in slot future_id can be extrapolated from the paths traced in slot ref_future_id:
+        within the extrapolation horizon, both nodes moved less than the extrapolation distance and did not
+        change their velocity
+        '''
+        if self.extrapolation_horizon <= 0:
+            return False
 
-                if self.est_csi:
-                    # avoid rounding errors
-                    frequencies = np.arange(-fft_size / 2, fft_size / 2, dtype=int) * subcarrier_spacing
-                    rx_node_info.frequencies.extend(frequencies.tolist())
-                    #rx_node_info.frequencies.extend(list(frequencies.numpy().astype(int)))
-                    rx_node_info.csi_imag.extend(list(np.imag(lnk_csi)))
-                    rx_node_info.csi_real.extend(list(np.real(lnk_csi)))
+        if slot_times[future_id] - slot_times[ref_future_id] > self.extrapolation_horizon * 1e6:
+            return False
 
-        #if self.VERBOSE:
-        last_sim = simulation_time + (look_ahead - 1) * self.chan_coh_time_mode23
-        print("Calc channel finished:: LAH: Twin=%.6f -> %.6f" % (simulation_time/1e9, last_sim/1e9))
+        if (np.linalg.norm(tx_pos[future_id] - tx_pos[ref_future_id]) > self.extrapolation_distance
+                or np.linalg.norm(all_rx_pos[future_id][lnk_id] - all_rx_pos[ref_future_id][lnk_id]) > self.extrapolation_distance):
+            return False
 
+        return (np.allclose(tx_v[future_id], tx_v[ref_future_id])
+                and np.allclose(all_rx_v[future_id][lnk_id], all_rx_v[ref_future_id][lnk_id]))
 
-    def get_value(self, random_variable):
-        if random_variable[0] == "Uniform":
-            return np.random.uniform(random_variable[1], random_variable[2])
 
-        elif random_variable[0] == "Constant":
-            return random_variable[1]
+    def walk(self, slot, delay_left):
 
-        elif random_variable[0] == "Normal":
-            return np.random.normal(random_variable[1], np.sqrt(random_variable[2]))
+        self.nodes.last_update[slot] += delay_left
 
+        position = self.nodes.position[slot].copy()
+        velocity = self.nodes.velocity[slot].copy()
 
-    def walk(self, node_id, delay_left):
+        speed = np.linalg.norm(velocity)
+        if speed == 0:
+            return
 
-        self.node_info_dict[node_id]["last update"] += delay_left
+        # Set mitsuba variant to SCALAR for mobility model
+        mi.set_variant('scalar_rgb')
 
-        position = np.array(self.node_info_dict[node_id]["position"])
-        velocity = np.array(self.node_info_dict[node_id]["velocity"])
+        _, next_position, velocity = self.walk_segments(position, velocity, delay_left)
 
+        self.nodes.velocity[slot] = velocity
+        self.nodes.position[slot] = next_position
+
+        # Set the mitsuba variant back to how Sionna configures it
+        if len(gpus) > 0:
+            mi.set_variant('cuda_ad_rgb')
+        else:
+            mi.set_variant('llvm_ad_rgb')
+
+
+    def walk_segments(self, position, velocity, delay_left):
+        '''
+        Walks a straight line for delay_left ns and reflects at walls; requires the mitsuba SCALAR variant.
+        Returns the list of segments (elapsed time in ns, start position, velocity) as well as the final
+        position and velocity.
+        '''
         speed = np.linalg.norm(velocity)
+        segments = [(0.0, position, velocity)]
         if speed == 0:
-            return
+            return segments, position, velocity
 
         # Check if the next position is inside the borders
         # Calculate direction vector and travel distance
         direction = velocity / speed
         distance = np.linalg.norm(velocity * delay_left / 1e9)
-
-        # Set mitsuba variant to SCALAR for mobility model
-        mi.set_variant('scalar_rgb')
+        elapsed = 0.0
 
         while True:
             # Create a ray
@@ -513,6 +1640,8 @@ class SionnaEnv:
                 velocity = direction * speed
                 distance -= t
                 delay_left -= (t / speed) * 1e9
+                elapsed += (t / speed) * 1e9
+                segments.append((elapsed, position, velocity))
 
                 # For testing
                 # print(f"CourseChange x = {position[0]}, y = {position[1]}, z = {position[2]}")
@@ -523,8 +1652,24 @@ class SionnaEnv:
 
         next_position = position + (velocity * delay_left / 1e9)
 
-        self.node_info_dict[node_id]["velocity"] = velocity.tolist()
-        self.node_info_dict[node_id]["position"] = next_position.tolist()
+        return segments, next_position, velocity
+
+
+    def build_trajectory_tape(self, node_id, horizon):
+        '''
+        Precomputes the trajectory of a random walk node at least up to horizon (in ns)
+        '''
+        tape = self.trajectory_tapes.get(node_id)
+        if tape is None:
+            tape = TrajectoryTape()
+            tape.close(0, self.nodes.position[self.nodes.slot_of[node_id]])
+            self.trajectory_tapes[node_id] = tape
+
+        # Set mitsuba variant to SCALAR for mobility model
+        mi.set_variant('scalar_rgb')
+
+        while tape.end_time < horizon:
+            self.extend_trajectory_tape(node_id, tape)
 
         # Set the mitsuba variant back to how Sionna configures it
         if len(gpus) > 0:
@@ -533,96 +1678,198 @@ class SionnaEnv:
             mi.set_variant('llvm_ad_rgb')
 
 
+    def extend_trajectory_tape(self, node_id, tape):
+        '''
+        Appends the next walk (from one course change to the next) to the trajectory of the node
+        '''
+        slot = self.nodes.slot_of[node_id]
+        start_time = tape.end_time
+        position = tape.end_position
+
+        # Choose speed and direction
+        speed, direction = self.nodes.next_course(slot)
+        direction = round(direction, 3)
+        velocity = np.array([np.cos(direction) * speed, np.sin(direction) * speed, 0.0])
+
+        if self.VERBOSE:
+            print(f"CourseChange x = {position[0]}, y = {position[1]}, z = {position[2]}")
+
+        # Calculate the time to walk in the new direction
+        if self.nodes.walk_mode[slot] == NodeTable.WALK_MODE_TIME:
+            delay_left = self.nodes.walk_mode_value[slot]
+        else:
+            # If speed is 0, a random walk model with mode "Distance" becomes a constant position model
+            if speed == 0:
+                tape.append(start_time, position, np.zeros(3))
+                tape.close(np.iinfo(np.int64).max // 2, position)
+                return
+            delay_left = abs(self.nodes.walk_mode_value[slot] / speed) * 1e9
+
+        segments, next_position, _ = self.walk_segments(position, velocity, delay_left)
+        for elapsed, segment_position, segment_velocity in segments:
+            tape.append(start_time + elapsed, segment_position, segment_velocity)
+        tape.close(start_time + delay_left, next_position)
+
+
     def remove_all_cached_entries(self, simulation_time):
-        for k in list(self.pos_velo_cache.keys()):
-            tmp = self.pos_velo_cache[k][:]
-            for l in tmp:
-                if l.sim_time + l.ttl < simulation_time - self.max_pos_cache_age: # keep last ...
-                    self.pos_velo_cache[k].remove(l)
+        self.nodes.cache_expire(simulation_time - self.max_pos_cache_age) # keep last ...
+        if self.csi_cache is not None:
+            self.csi_cache.expire(simulation_time)
 
 
     def get_position_and_velocity(self, node_id, simulation_time):
+        positions, velocities = self.get_positions_and_velocities([self.nodes.slot_of[node_id]], simulation_time)
+        return positions[0], velocities[0]
+
+
+    def get_positions_and_velocities(self, slots, simulation_time):
+        '''
+        Returns the positions and velocities of the nodes in the given slots at simulation_time
+        '''
+        slots = np.asarray(slots, dtype=np.int64)
+        positions = self.nodes.position[slots].copy()
+        velocities = np.zeros((len(slots), 3))
+
+        # trace-driven nodes are looked up directly in their trace
+        for i in np.flatnonzero(self.nodes.model[slots] == NodeTable.MODEL_TRACE):
+            positions[i], velocities[i], _ = self.nodes.traces[slots[i]].lookup(simulation_time)
+
+        mobile = self.nodes.model[slots] == NodeTable.MODEL_RANDOM_WALK
+        if not np.any(mobile):
+            return positions, velocities
+
         # search in cache for pos/velocity
-        best_match_value = None
-        best_metric = 1e12
-        for item in self.pos_velo_cache[node_id]:
-            middle = item.sim_time + item.ttl / 2.0
-            metric = abs(middle - simulation_time)
-            if metric < best_metric and metric <= self.chan_coh_time_mode23:
-                best_match_value = item.value
-                best_metric = abs(middle - simulation_time)
-
-        if best_match_value is not None:
-            # print("Old pos lookupd for node %d at %d: %s" % (node_id, simulation_time, best_match_value[0]))
-            return best_match_value
+        found, cached_positions, cached_velocities = self.nodes.cache_lookup(slots, simulation_time,
+                                                                             self.chan_coh_time_mode23)
+        # precomputed trajectories are exact and do not need the cache
+        has_tape = np.array([int(node_id) in self.trajectory_tapes for node_id in self.nodes.ids[slots]])
+        found &= mobile & ~has_tape
+        positions[found] = cached_positions[found]
+        velocities[found] = cached_velocities[found]
 
         # sim mobility w/ ray tracing
-        value = self.compute_position_and_velocity(node_id, simulation_time)
-        # print("New pos computed for node %d at %d: %s" % (node_id, simulation_time, value[0]))
+        for i in np.flatnonzero(mobile & ~found):
+            positions[i], velocities[i] = self.compute_position_and_velocity(int(self.nodes.ids[slots[i]]),
+                                                                             simulation_time)
+
+        return positions, velocities
+
+
+    def get_delay_left(self, node_id, simulation_time):
+        '''
+        Remaining time (in ns) until the node changes its walk direction; one hour for static nodes
+        '''
+        slot = self.nodes.slot_of[node_id]
+        if self.nodes.is_trace(slot):
+            return min(self.nodes.traces[slot].lookup(simulation_time)[2], 3.6e12)
+
+        if not self.nodes.is_mobile(slot):
+            return 3.6e12
 
-        return value
+        if node_id in self.trajectory_tapes:
+            return min(self.trajectory_tapes[node_id].lookup(simulation_time)[2], 3.6e12)
+
+        # the walk direction changes at last_update + delay_left
+        return max(self.nodes.last_update[slot] + self.nodes.delay_left[slot] - simulation_time, 0)
+
+
+    def get_link_ttl(self, tx_node, rx_node, lnk_v, simulation_time):
+        '''
+        Time to live (in ns) of the channel of a link: the coherence time given the relative speed of the
+        nodes but at most until one of the nodes changes its walk direction; one hour if both nodes are static
+        '''
+        tx_delay_left = self.get_delay_left(tx_node, simulation_time)
+        rx_delay_left = self.get_delay_left(rx_node, simulation_time)
+
+        lnk_delay_left = min(tx_delay_left, rx_delay_left)
+        # a node changes its direction right now and its next walk segment is not drawn yet; the worst case
+        # coherence time applies instead of a degenerate TTL
+        if lnk_delay_left <= 0:
+            lnk_delay_left = self.chan_coh_time_mode23
+
+        if lnk_v == 0:
+            return int(lnk_delay_left)
+
+        # compute channel coherence time
+        if self.mode == 1:
+            lnk_tc = 9 * 299792458 * 1e9 / (16 * np.pi * lnk_v * self.scene.frequency.numpy())
+        else:
+            # same model as the worst case coherence time of mode 2/3 and consider minimum coherence time (in ms)
+            lnk_tc = compute_coherence_time(min(lnk_v, 100), self.scene.frequency.numpy(), model='rappaport2')
+            lnk_tc = min(lnk_tc, self.scene.min_coherence_time_ms * 1e6)
+
+        return int(min(lnk_tc, lnk_delay_left))
 
 
     def compute_position_and_velocity(self, node_id, simulation_time):
         '''
         Mobility simulation to compute the next position and velocity
         '''
+        nodes = self.nodes
+        slot = nodes.slot_of[node_id]
 
         # If node position is constant, return current position
-        if self.node_info_dict[node_id]["model"] == "Constant Position":
-            return self.node_info_dict[node_id]["position"], [0.0, 0.0, 0.0]
+        if not nodes.is_mobile(slot):
+            return nodes.position[slot].copy(), np.zeros(3)
+
+        # If the trajectory was precomputed, look up the position (extend the trajectory if needed)
+        if node_id in self.trajectory_tapes:
+            tape = self.trajectory_tapes[node_id]
+            if not tape.covers(simulation_time):
+                self.build_trajectory_tape(node_id, simulation_time)
+            position, velocity, _ = tape.lookup(simulation_time)
+            return position, velocity.copy()
 
         # If simulation_time is less than last_update, print a warning and return the last position and velocity
-        if simulation_time < self.node_info_dict[node_id]["last update"]:
+        if simulation_time < nodes.last_update[slot]:
             warnings.warn(
                 f"Trying to calculate the current position and velocity for node {node_id} at time {simulation_time} ns. "
-                f"The position and velocity for node {node_id} has already been calculated at time {self.node_info_dict[node_id]['last update']} ns.",
+                f"The position and velocity for node {node_id} has already been calculated at time {nodes.last_update[slot]} ns.",
                 UserWarning)
 
             print("Sim time: %d" % simulation_time)
-            for item in self.pos_velo_cache[node_id]:
-                print(item.sim_time)
+            for cached_time in nodes.cached_times(slot):
+                print(int(cached_time))
             print("====")
 
-            return self.node_info_dict[node_id]["position"], self.node_info_dict[node_id]["velocity"]
+            return nodes.position[slot].copy(), nodes.velocity[slot].copy()
 
-        delay_left = self.node_info_dict[node_id]["delay left"]
+        # Walk from course change to course change until the current simulation time is reached
+        while True:
+            delay_left = nodes.delay_left[slot]
 
-        # If delay_left equals 0, calculate new walk direction
-        if delay_left == 0:
-            # Choose speed and direction
-            speed = self.get_value(self.node_info_dict[node_id]["speed"])
-            direction = round(self.get_value(self.node_info_dict[node_id]["direction"]), 3)
+            # If delay_left equals 0, calculate new walk direction
+            if delay_left == 0:
+                # Choose speed and direction from the node's own random stream
+                speed, direction = nodes.next_course(slot)
+                direction = round(direction, 3)
 
-            # Calculate new velocity
-            velocity = [np.cos(direction) * speed, np.sin(direction) * speed, 0.0]
-            self.node_info_dict[node_id]["velocity"] = velocity
+                # Calculate new velocity
+                nodes.velocity[slot] = [np.cos(direction) * speed, np.sin(direction) * speed, 0.0]
 
-            # Calculate the remaining time to walk in the new direction
-            if self.node_info_dict[node_id]["mode"][0] == "Time":
-                delay_left = self.node_info_dict[node_id]["mode"][1]
-            elif self.node_info_dict[node_id]["mode"][0] == "Distance":
-                # If speed is 0, a random walk model with mode "Distance" becomes a constant position model
-                if speed == 0:
-                    self.node_info_dict[node_id]["model"] = "Constant Position"
-                    return self.node_info_dict[node_id]["position"], [0.0, 0.0, 0.0]
+                # Calculate the remaining time to walk in the new direction
+                if nodes.walk_mode[slot] == NodeTable.WALK_MODE_TIME:
+                    delay_left = nodes.walk_mode_value[slot]
+                elif nodes.walk_mode[slot] == NodeTable.WALK_MODE_DISTANCE:
+                    # If speed is 0, a random walk model with mode "Distance" becomes a constant position model
+                    if speed == 0:
+                        nodes.model[slot] = NodeTable.MODEL_CONSTANT_POSITION
+                        return nodes.position[slot].copy(), np.zeros(3)
 
-                delay_left = abs(self.node_info_dict[node_id]["mode"][1] / speed) * 1e9
+                    delay_left = abs(nodes.walk_mode_value[slot] / speed) * 1e9
 
-            if self.VERBOSE:
-                pos = self.node_info_dict[node_id]["position"]
-                print(f"CourseChange x = {pos[0]}, y = {pos[1]}, z = {pos[2]}")
+                if self.VERBOSE:
+                    pos = nodes.position[slot]
+                    print(f"CourseChange x = {pos[0]}, y = {pos[1]}, z = {pos[2]}")
 
-        # Walk until the current simulation time is reached
-        if self.node_info_dict[node_id]["last update"] + delay_left < simulation_time:
-            self.walk(node_id, delay_left)
-            self.node_info_dict[node_id]["delay left"] = 0
-            return self.compute_position_and_velocity(node_id, simulation_time)
-        else:
-            self.node_info_dict[node_id]["delay left"] = self.node_info_dict[node_id][
-                                                        "last update"] + delay_left - simulation_time
-            self.walk(node_id, simulation_time - self.node_info_dict[node_id]["last update"])
-            return self.node_info_dict[node_id]["position"], self.node_info_dict[node_id]["velocity"]
+            # Walk until the current simulation time is reached
+            if nodes.last_update[slot] + delay_left < simulation_time:
+                self.walk(slot, delay_left)
+                nodes.delay_left[slot] = 0
+            else:
+                nodes.delay_left[slot] = nodes.last_update[slot] + delay_left - simulation_time
+                self.walk(slot, simulation_time - nodes.last_update[slot])
+                return nodes.position[slot].copy(), nodes.velocity[slot].copy()
 
 
     def run(self):
@@ -668,6 +1915,12 @@ class SionnaEnv:
                     print("t=%.9fs: average event processing time: %.2f sec"
                           % (from_ns3_wrapper.channel_state_request.time/1e9, np.nanmean(last_call_times)))
 
+            elif from_ns3_wrapper.HasField("csi_time_series_request"):
+                # handle CsiTimeSeriesRequest by sending CsiTimeSeriesResponse
+                start_time = time.time()
+                self.calculate_csi_time_series(from_ns3_wrapper.csi_time_series_request, to_ns3_wrapper)
+                print("CSI time series processing time: %.2f sec" % (time.time() - start_time))
+
             elif from_ns3_wrapper.HasField("sim_close_request"):
                 socket_open = False
                 to_ns3_wrapper.sim_ack.SetInParent()
@@ -677,6 +1930,35 @@ class SionnaEnv:
 
         socket.close()
         print("Mode: %d , submode: %d , NoCSI: %d , avgevent: %.2f" % (self.mode, self.sub_mode, num_processed_csi_req, np.nanmean(last_call_times)))
+        if self.path_cache is not None:
+            self.path_cache.report()
+        if self.csi_cache is not None:
+            self.csi_cache.report()
+        if self.warm_up_time is not None:
+            print("Warm-up: %.2fs before the SimAck (not part of the event processing times)" % self.warm_up_time)
+        if len(self.scene_states) > 1:
+            print("Scene states: %d switches, active '%s'" % (self.num_state_switches, self.scene_state or "default"))
+        if self.max_path_loss_db > 0:
+            print("Range culling: %d links out of range" % self.num_out_of_range)
+        if self.radio_map_cell_size > 0 and not self.est_csi:
+            print("Radio maps: %d maps, %d/%d links served"
+                  % (len(self.radio_maps), self.radio_map_stats[0], self.radio_map_stats[1]))
+        if self.rx_cluster_radius > 0:
+            errors = np.array(self.cluster_errors).reshape(-1, 2)
+            print("RX clustering: %d links derived from %d traced representatives; error estimate (%d links): "
+                  "loss mean %.2f dB max %.2f dB, CFR NMSE mean %.2e"
+                  % (self.cluster_stats[0], self.cluster_stats[1], len(errors),
+                     np.mean(errors[:, 0]) if len(errors) > 0 else float('nan'),
+                     np.max(errors[:, 0]) if len(errors) > 0 else float('nan'),
+                     np.nanmean(errors[:, 1]) if np.any(~np.isnan(errors[:, 1])) else float('nan')))
+        if self.rt_selective_diffraction:
+            print("Selective diffraction: %d/%d links traced with diffraction"
+                  % (self.diffraction_stats[1], self.diffraction_stats[0]))
+        if self.rt_progressive_depth:
+            print("Progressive depth: links per final depth: %s"
+                  % ", ".join("%d: %d" % (depth, n) for depth, n in sorted(self.depth_stats.items())))
+        if self.lookahead is not None:
+            self.lookahead.report(fixed_look_ahead=math.ceil(self.sub_mode / max(len(self.nodes) - 1, 1)))
         print("Sionna server socket closed.")
         # cleanup sionna
 
@@ -688,14 +1970,93 @@ if __name__ == '__main__':
     parser.add_argument("--rt_max_depth", type=int, default=6, help="Calc diffraction in raytracing")
     parser.add_argument("--rt_max_parallel_links", type=int, default=4, help="Max no. of receivers")
     parser.add_argument("--est_csi", help="Whether to estimate complex CSI per OFDM subcarrier", action='store_true')
+    parser.add_argument("--rt_progressive_depth", action='store_true',
+                        help="Increase the raytracing depth per link until its received power converges (up to rt_max_depth)")
+    parser.add_argument("--rt_depth_tolerance_db", type=float, default=1.0,
+                        help="Max. change of the received power in dB with one more depth for convergence")
+    parser.add_argument("--rt_selective_diffraction", action='store_true',
+                        help="Compute diffraction in a second pass only for links without LOS or with low power")
+    parser.add_argument("--rt_diffraction_threshold_db", type=float, default=20.0,
+                        help="LOS links with more loss than this in dB w.r.t. free space are traced with diffraction")
+    parser.add_argument("--rt_num_samples", type=int, default=0,
+                        help="No. of rays per source (0 = derived from the scene size and rt_ray_spacing)")
+    parser.add_argument("--rt_ray_spacing", type=float, default=0.1,
+                        help="Max. distance in m between neighboring rays across the scene for the adaptive no. of rays")
+    parser.add_argument("--rt_sample_convergence", action='store_true',
+                        help="Double the no. of rays until the paths of the first links no longer change")
+    parser.add_argument("--rt_memory_budget", type=int, default=0,
+                        help="Max. memory in MB per ray tracing call; larger receiver sets are traced in chunks (0 = off)")
+    parser.add_argument("--rx_cluster_radius", type=float, default=0.0,
+                        help="Receivers within this distance in m of a traced receiver share its paths (0 = off)")
+    parser.add_argument("--radio_map_cell_size", type=float, default=0.0,
+                        help="Without CSI: interpolate loss and delay between static and mobile nodes from radio maps with this cell size in m (0 = off)")
+    parser.add_argument("--radio_map_dir", type=str, default="radio_maps",
+                        help="Directory where the radio maps are stored")
+    parser.add_argument("--radio_map_prebuild", action='store_true',
+                        help="Compute the radio maps of all static nodes at the start of the simulation")
+    parser.add_argument("--scene_roi_radius", type=float, default=0.0,
+                        help="Ray trace only the meshes within this distance in m of the area of the nodes (0 = full scene)")
+    parser.add_argument("--scene_cache_dir", type=str, default="",
+                        help="Load scenes from a prebuilt cache in this directory, built on first use (empty = off)")
+    parser.add_argument("--warm_up", action='store_true',
+                        help="Trace dummy links at start so that the first request does not compile the kernels")
+    parser.add_argument("--mobility_horizon", type=float, default=0.0,
+                        help="Precompute trajectories of mobile nodes up to this time in seconds (0 = lazy mobility)")
+    parser.add_argument("--adaptive_lookahead", help="Adapt the look ahead per TX to the request pattern (mode 3)",
+                        action='store_true')
+    parser.add_argument("--lookahead_budget", type=int, default=0,
+                        help="Max. no. of links per call with adaptive look ahead (0 = 4 * sub_mode)")
+    parser.add_argument("--extrapolation_horizon", type=float, default=0.0,
+                        help="Extrapolate CSI of look ahead slots from traced paths for up to this time in ms (0 = off)")
+    parser.add_argument("--extrapolation_distance", type=float, default=0.5,
+                        help="Re-trace a link once one of its nodes moved more than this distance in m")
+    parser.add_argument("--path_cache_size", type=int, default=0,
+                        help="Max. size of the cache of traced paths in MB (0 = off)")
+    parser.add_argument("--path_cache_resolution", type=float, default=0.001,
+                        help="Node positions within this distance in m share cached paths")
+    parser.add_argument("--csi_cache", help="Serve repeated and reverse-direction requests from the CSI computed before",
+                        action='store_true')
     parser.add_argument("--verbose", help="Whether to run in verbose mode", action='store_true')
     args = parser.parse_args()
 
     print("ns3sionna v0.3")
     while True:
         print("Using config: rt_calc_diffraction=%s, rt_max_depth=%s, rt_max_parallel_links=%d, est_csi=%r" % (args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi))
+        print("Using ray sample config: rt_num_samples=%d, rt_ray_spacing=%.2fm, rt_sample_convergence=%r"
+              % (args.rt_num_samples, args.rt_ray_spacing, args.rt_sample_convergence))
+        print("Using diffraction config: rt_selective_diffraction=%r, rt_diffraction_threshold_db=%.1f"
+              % (args.rt_selective_diffraction, args.rt_diffraction_threshold_db))
+        print("Using depth config: rt_progressive_depth=%r, rt_depth_tolerance_db=%.2f"
+              % (args.rt_progressive_depth, args.rt_depth_tolerance_db))
+        print("Using radio map config: radio_map_cell_size=%.2fm, radio_map_dir=%s, radio_map_prebuild=%r"
+              % (args.radio_map_cell_size, args.radio_map_dir, args.radio_map_prebuild))
+        print("Using look ahead config: mobility_horizon=%.1fs, adaptive_lookahead=%r, lookahead_budget=%d"
+              % (args.mobility_horizon, args.adaptive_lookahead, args.lookahead_budget))
+        print("Using cache config: path_cache_size=%dMB, path_cache_resolution=%.3fm, csi_cache=%r"
+              % (args.path_cache_size, args.path_cache_resolution, args.csi_cache))
+        print("Using tracing config: rt_memory_budget=%dMB, rx_cluster_radius=%.2fm"
+              % (args.rt_memory_budget, args.rx_cluster_radius))
+        print("Using extrapolation config: extrapolation_horizon=%.1fms, extrapolation_distance=%.2fm"
+              % (args.extrapolation_horizon, args.extrapolation_distance))
+        print("Using scene config: scene_roi_radius=%.1fm, scene_cache_dir=%s, warm_up=%r"
+              % (args.scene_roi_radius, args.scene_cache_dir or "off", args.warm_up))
         print("Waiting for new job ...")
-        env = SionnaEnv(args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi, VERBOSE=args.verbose)
+        env = SionnaEnv(args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi,
+                        rt_progressive_depth=args.rt_progressive_depth,
+                        rt_depth_tolerance_db=args.rt_depth_tolerance_db,
+                        rt_selective_diffraction=args.rt_selective_diffraction,
+                        rt_diffraction_threshold_db=args.rt_diffraction_threshold_db,
+                        rt_num_samples=args.rt_num_samples, rt_ray_spacing=args.rt_ray_spacing,
+                        rt_sample_convergence=args.rt_sample_convergence, rt_memory_budget=args.rt_memory_budget,
+                        rx_cluster_radius=args.rx_cluster_radius, radio_map_cell_size=args.radio_map_cell_size,
+                        radio_map_dir=args.radio_map_dir, radio_map_prebuild=args.radio_map_prebuild,
+                        scene_roi_radius=args.scene_roi_radius, scene_cache_dir=args.scene_cache_dir,
+                        warm_up=args.warm_up,
+                        mobility_horizon=args.mobility_horizon, adaptive_lookahead=args.adaptive_lookahead,
+                        lookahead_budget=args.lookahead_budget, extrapolation_horizon=args.extrapolation_horizon,
+                        extrapolation_distance=args.extrapolation_distance, path_cache_size=args.path_cache_size,
+                        path_cache_resolution=args.path_cache_resolution, csi_cache=args.csi_cache,
+                        VERBOSE=args.verbose)
         env.run()
 
         if args.single_run:
@@ -9,7 +9,7 @@ import message_pb2
 import os
 
 from commons import *
-from sionna_utils import compute_coherence_time
+from sionna_utils import compute_coherence_time, wideband_power, num_ray_samples
 
 gpu_num = 0 # Use "" to use the CPU
 os.environ["CUDA_VISIBLE_DEVICES"] = f"{gpu_num}"
@@ -51,9 +51,13 @@ class SionnaEnv:
     author: Pilz, Zubow
     """
 
-    def __init__(self, rt_calc_diffraction, rt_max_depth=5, rt_max_parallel_links=32, est_csi=True, VERBOSE=True):
+    def __init__(self, rt_calc_diffraction, rt_max_depth=5, rt_max_parallel_links=32, est_csi=True,
+                 rt_num_samples=0, rt_ray_spacing=0.1, VERBOSE=True):
         self.rt_calc_diffraction = rt_calc_diffraction
         self.rt_max_depth = rt_max_depth
+        self.rt_num_samples = rt_num_samples # no. of rays per source; 0 = derived from the scene size
+        self.rt_ray_spacing = rt_ray_spacing # in m; max. distance between neighboring rays at the scene extent
+        self.num_samples = rt_num_samples # no. of rays per source used
         self.rt_max_parallel_links = rt_max_parallel_links
         self.est_csi = est_csi
         self.VERBOSE = VERBOSE
@@ -210,6 +214,16 @@ class SionnaEnv:
         # how long to store computed position values from mobility
         self.max_pos_cache_age = max(1e9,  num_nodes * math.ceil(self.sub_mode / num_nodes) * self.chan_coh_time_mode23)
 
+        # no. of rays per source: neighboring rays should be at most rt_ray_spacing apart across the scene
+        if self.rt_num_samples <= 0:
+            bbox = self.mi_scene.bbox()
+            node_pos = [info["position"] for info in self.node_info_dict.values()]
+            corners = np.vstack([np.array(bbox.min), np.array(bbox.max)] + node_pos)
+            extent = float(np.linalg.norm(np.max(corners, axis=0) - np.min(corners, axis=0)))
+            self.num_samples = num_ray_samples(extent, self.rt_ray_spacing)
+            print("Using %d rays per source (scene extent %.1f m, ray spacing %.2f m)"
+                  % (self.num_samples, extent, self.rt_ray_spacing))
+
         if self.VERBOSE:
             print_simulation_info(simulation_info)
 
@@ -325,7 +339,7 @@ class SionnaEnv:
             scene=self.scene,
             max_depth=self.rt_max_depth,
             max_num_paths_per_src=int(1e6),
-            samples_per_src=int(1e6),
+            samples_per_src=self.num_samples,
             synthetic_array=self.synthetic_array,   
             los=True,
             specular_reflection=True,
@@ -342,20 +356,26 @@ class SionnaEnv:
                 "Error: Propagation loss and propagation delay cannot be calculated because no propagation paths were found."
             )
 
-        # CFR
-        frequencies = subcarrier_frequencies(
-            num_subcarriers=fft_size,
-            subcarrier_spacing=subcarrier_spacing
-        )
+        tau_np = tau.numpy()
+
+        if self.est_csi:
+            # CFR: evaluated once; the loss and the normalized CSI are both derived from the absolute CFR
+            frequencies = subcarrier_frequencies(
+                num_subcarriers=fft_size,
+                subcarrier_spacing=subcarrier_spacing
+            )
 
-        h_freq_raw = paths.cfr(frequencies, normalize_delays=False, normalize=False, out_type="tf")
-        h_freq     = paths.cfr(frequencies, normalize_delays=False, normalize=True,  out_type="tf")
+            h_freq_raw = paths.cfr(frequencies, normalize_delays=False, normalize=False, out_type="tf")
 
-        # If cfr() ever returns (re, im) tuples in your setup, convert:
-        if isinstance(h_freq_raw, (tuple, list)):
-            h_freq_raw = tf.complex(h_freq_raw[0], h_freq_raw[1])
-        if isinstance(h_freq, (tuple, list)):
-            h_freq = tf.complex(h_freq[0], h_freq[1])
+            # If cfr() ever returns (re, im) tuples in your setup, convert:
+            if isinstance(h_freq_raw, (tuple, list)):
+                h_freq_raw = tf.complex(h_freq_raw[0], h_freq_raw[1])
+            h_freq_raw = h_freq_raw.numpy()
+        else:
+            # only the wideband loss is needed which follows from the paths directly, i.e. no CFR
+            if isinstance(a, (tuple, list)):
+                a = tf.complex(a[0], a[1])
+            a_np = a.numpy()
 
         # Build robust name->index maps (Scene.receivers/transmitters are dicts) :contentReference[oaicite:5]{index=5}
         rx_index_of = {name:i for i, name in enumerate(self.scene.receivers.keys())}
@@ -387,19 +407,22 @@ class SionnaEnv:
                 tx_i = tx_index_of[tx_name]
 
                 # Handle tau possibly being reduced-rank ([num_rx,num_tx,num_paths]) :contentReference[oaicite:6]{index=6}
-                tau_np = tau.numpy()
                 if tau_np.ndim == 5:
                     lnk_tau = tau_np[rx_i, 0, tx_i, 0, :]
                 else:  # ndim == 3
                     lnk_tau = tau_np[rx_i, tx_i, :]
 
-                # CFR is [num_rx, num_rx_ant, num_tx, num_tx_ant, num_time_steps, num_freqs]
-                lnk_h_freq_raw = h_freq_raw[rx_i, 0, tx_i, 0, 0, :].numpy()
-                lnk_h_freq     = h_freq[rx_i, 0, tx_i, 0, 0, :].numpy()
+                if self.est_csi:
+                    # CFR is [num_rx, num_rx_ant, num_tx, num_tx_ant, num_time_steps, num_freqs]
+                    lnk_h_freq_raw = h_freq_raw[rx_i, 0, tx_i, 0, 0, :]
+                    lnk_power = np.mean(np.abs(lnk_h_freq_raw)**2)
+                    lnk_csi   = lnk_h_freq_raw / np.sqrt(lnk_power)  # already length fft_size
+                else:
+                    # a is [num_rx, num_rx_ant, num_tx, num_tx_ant, num_paths, num_time_steps]
+                    lnk_power = wideband_power(a_np[rx_i, 0, tx_i, 0, :, 0], lnk_tau, subcarrier_spacing, fft_size)
 
                 lnk_delay = int(round(np.min(lnk_tau[lnk_tau >= 0] * 1e9), 0))
-                lnk_loss  = float(-10*np.log10(np.mean(np.abs(lnk_h_freq_raw)**2)))
-                lnk_csi   = lnk_h_freq  # already length fft_size
+                lnk_loss  = float(-10*np.log10(lnk_power))
 
                 if self.mode == 1 and self.sub_mode > 0:
                     # Calculate the time to live for the cache entry with the coherence time and the remaining times
@@ -669,14 +692,19 @@ if __name__ == '__main__':
     parser.add_argument("--rt_max_depth", type=int, default=6, help="Calc diffraction in raytracing")
     parser.add_argument("--rt_max_parallel_links", type=int, default=4, help="Max no. of receivers")
     parser.add_argument("--est_csi", help="Whether to estimate complex CSI per OFDM subcarrier", action='store_true')
+    parser.add_argument("--rt_num_samples", type=int, default=0,
+                        help="No. of rays per source (0 = derived from the scene size and rt_ray_spacing)")
+    parser.add_argument("--rt_ray_spacing", type=float, default=0.1,
+                        help="Max. distance in m between neighboring rays across the scene for the adaptive no. of rays")
     parser.add_argument("--verbose", help="Whether to run in verbose mode", action='store_true')
     args = parser.parse_args()
 
     print("ns3sionna v0.3")
     while True:
-        print("Using config: rt_calc_diffraction=%s, rt_max_depth=%s, rt_max_parallel_links=%d, est_csi=%r" % (args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi))
+        print("Using config: rt_calc_diffraction=%s, rt_max_depth=%s, rt_max_parallel_links=%d, est_csi=%r, rt_num_samples=%d, rt_ray_spacing=%.2fm" % (args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi, args.rt_num_samples, args.rt_ray_spacing))
         print("Waiting for new job ...")
-        env = SionnaEnv(args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi, VERBOSE=args.verbose)
+        env = SionnaEnv(args.rt_calc_diffraction, args.rt_max_depth, args.rt_max_parallel_links, args.est_csi,
+                        rt_num_samples=args.rt_num_samples, rt_ray_spacing=args.rt_ray_spacing, VERBOSE=args.verbose)
         env.run()
 
         if args.single_run:
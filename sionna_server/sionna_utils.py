@@ -20,6 +20,135 @@ def compute_coherence_time(v, fc, model='rappaport2'):
     return Tc
 
 
+def unit_vector(theta, phi):
+    """
+    Unit vector for the zenith angle theta and azimuth angle phi (in rad) as used by Sionna
+    :return: array of shape [..., 3]
+    """
+    return np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1)
+
+
+def path_length_rate(theta_t, phi_t, theta_r, phi_r, v_tx, v_rx):
+    """
+    Computes the rate of change of the length of propagation paths caused by moving nodes
+    :param theta_t, phi_t: angles of departure per path (in rad), shape [..., num_paths]
+    :param theta_r, phi_r: angles of arrival per path (in rad), shape [..., num_paths]
+    :param v_tx, v_rx: velocities of TX and RX in m/s, shape [..., 3]
+    :return: dL/dt in m/s per path; negative if a path gets shorter
+    """
+    k_t = unit_vector(theta_t, phi_t)
+    k_r = unit_vector(theta_r, phi_r)
+    return -(np.sum(k_t * np.expand_dims(v_tx, -2), axis=-1) + np.sum(k_r * np.expand_dims(v_rx, -2), axis=-1))
+
+
+def extrapolate_paths(a, tau, rate, dt, fc):
+    """
+    Evolves path coefficients and delays over time assuming constant node velocities, i.e. each path
+    delay drifts with the path length, its phase rotates with the Doppler shift and its amplitude scales
+    with the inverse path length (as for LOS and specular paths)
+    :param a: complex path coefficients, shape [..., num_paths]
+    :param tau: path delays in s (negative for invalid paths), shape [..., num_paths]
+    :param rate: dL/dt in m/s per path (see path_length_rate)
+    :param dt: time offset in s
+    :param fc: center frequency in Hz
+    :return: coefficients and delays after dt
+    """
+    delta_tau = rate * dt / c
+    valid = tau > 0
+    tau_dt = np.where(valid, tau + delta_tau, tau)
+    scale = np.where(valid, tau / np.where(valid, tau_dt, 1.0), 1.0)
+    a_dt = a * scale * np.exp(-2j * np.pi * fc * delta_tau)
+    return a_dt, tau_dt
+
+
+def subcarrier_indices(fft_size):
+    """
+    Indices of the OFDM subcarriers relative to the carrier, centered like subcarrier_frequencies of Sionna,
+    i.e. -N/2..N/2-1 for even and -(N-1)/2..(N-1)/2 for odd FFT sizes
+    :param fft_size: no. of subcarriers
+    :return: integer indices, shape [fft_size]
+    """
+    return np.arange(fft_size) - fft_size // 2
+
+
+def cfr_from_paths(a, tau, frequencies, normalize=False):
+    """
+    Computes the channel frequency response from paths like cir_to_ofdm_channel of Sionna
+    :param a: complex path coefficients, shape [..., num_paths]
+    :param tau: path delays in s (negative for invalid paths), shape [..., num_paths]
+    :param frequencies: baseband subcarrier frequencies in Hz, shape [fft_size]
+    :param normalize: whether to normalize the CFR to unit average energy per subcarrier
+    :return: CFR of shape [..., fft_size]
+    """
+    a = np.where(tau >= 0, a, 0)
+    h = np.sum(a[..., None] * np.exp(-2j * np.pi * tau[..., None] * frequencies), axis=-2)
+    if normalize:
+        h = h / np.sqrt(np.mean(np.abs(h) ** 2, axis=-1, keepdims=True))
+    return h
+
+
+def wideband_power(a, tau, subcarrier_spacing, fft_size):
+    """
+    Computes the average power of the channel frequency response over all OFDM subcarriers exactly from
+    the paths, i.e. without evaluating the CFR (Parseval): mean_f |H(f)|^2 = 1/N sum_pq a_p a_q^* S(tau_p - tau_q)
+    with the Dirichlet kernel S over the subcarrier grid
+    :param a: complex path coefficients, shape [..., num_paths]
+    :param tau: path delays in s (negative for invalid paths), shape [..., num_paths]
+    :param subcarrier_spacing: in Hz
+    :param fft_size: no. of subcarriers, centered around fc like subcarrier_indices
+    :return: average power, shape [...]
+    """
+    a = np.where(tau >= 0, a, 0)
+    x = 2 * np.pi * subcarrier_spacing * (tau[..., :, None] - tau[..., None, :])
+    denominator = 1 - np.exp(-1j * x)
+    regular = np.abs(denominator) > 1e-9
+    # sum_{k=-h}^{N-1-h} exp(-j k x) with h = N // 2
+    h = fft_size // 2
+    kernel = np.where(regular, np.exp(1j * h * x) * (1 - np.exp(-1j * fft_size * x))
+                      / np.where(regular, denominator, 1), fft_size * np.exp(1j * h * x))
+    power = np.einsum('...p,...pq,...q->...', a, kernel, np.conj(a))
+    return np.real(power) / fft_size
+
+
+def strong_paths(a, tau, threshold_db):
+    """
+    Selects the valid paths whose power is at most threshold_db below the strongest path
+    :param a: complex path coefficients, shape [num_paths]
+    :param tau: path delays in s (negative for invalid paths), shape [num_paths]
+    :param threshold_db: relative power threshold in dB; 0 keeps all valid paths
+    :return: indices of the selected paths
+    """
+    power = np.where(tau >= 0, np.abs(a) ** 2, 0)
+    valid = power > 0
+    if threshold_db > 0 and np.any(valid):
+        valid &= power >= np.max(power) * 10 ** (-threshold_db / 10)
+    return np.flatnonzero(valid)
+
+
+def free_space_loss(distance, fc):
+    """
+    Computes the free space path loss between isotropic antennas
+    :param distance: distance between TX and RX in m
+    :param fc: carrier frequency in Hz
+    :return: path loss in dB
+    """
+    return 20 * np.log10(4 * np.pi * np.maximum(distance, 1e-9) * fc / c)
+
+
+def num_ray_samples(extent, ray_spacing, min_samples=10000, max_samples=1000000):
+    """
+    Computes the no. of rays per source such that neighboring rays are at most ray_spacing apart at the
+    distance extent; each of the N rays of a Fibonacci lattice covers a solid angle of 4 pi / N
+    :param extent: max. distance of interest in m, e.g. the diagonal of the scene
+    :param ray_spacing: max. distance between neighboring rays in m
+    :param min_samples: lower bound of the no. of rays
+    :param max_samples: upper bound of the no. of rays
+    :return: no. of rays
+    """
+    num_samples = int(np.ceil(4 * np.pi * (extent / ray_spacing) ** 2))
+    return min(max(num_samples, min_samples), max_samples)
+
+
 if __name__ == '__main__':
     v = 1.0 # m/s
     fc = 5210e6 # center freq
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class TrajectoryTape:
+    """
+    Piecewise-linear trajectory of a single node stored as compact NumPy arrays.
+
+    Breakpoint i says that at times[i] (in ns) the node is at positions[i] and moves with velocities[i]
+    until the next breakpoint. Breakpoints are course changes of the mobility model and reflections at
+    walls. Queries are answered by binary search and linear interpolation, so the result does not depend
+    on the order in which the trajectory is queried.
+    """
+
+    def __init__(self, capacity=64):
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros((capacity, 3), dtype=np.float64)
+        self.velocities = np.zeros((capacity, 3), dtype=np.float64)
+        self.num_points = 0
+        # the trajectory is known up to this point in time (in ns), i.e. the time of the next course change
+        self.end_time = 0
+        self.end_position = np.zeros(3, dtype=np.float64)
+
+    def append(self, time, position, velocity):
+        """
+        Adds a breakpoint; breakpoints must be appended in chronological order
+        """
+        if self.num_points == len(self.times):
+            capacity = 2 * len(self.times)
+            self.times = np.resize(self.times, capacity)
+            self.positions = np.resize(self.positions, (capacity, 3))
+            self.velocities = np.resize(self.velocities, (capacity, 3))
+
+        self.times[self.num_points] = int(time)
+        self.positions[self.num_points] = position
+        self.velocities[self.num_points] = velocity
+        self.num_points += 1
+
+    def close(self, end_time, end_position):
+        """
+        Marks the trajectory as known until end_time where the node reaches end_position
+        """
+        self.end_time = int(end_time)
+        self.end_position = np.array(end_position, dtype=np.float64)
+
+    def covers(self, time):
+        return self.num_points > 0 and time <= self.end_time
+
+    def lookup(self, time):
+        """
+        Returns the position and velocity at the given time (in ns) and the time left until
+        the next breakpoint (in ns)
+        """
+        i = int(np.searchsorted(self.times[:self.num_points], time, side='right')) - 1
+        i = max(i, 0)
+
+        position = self.positions[i] + self.velocities[i] * ((time - self.times[i]) / 1e9)
+        if i + 1 < self.num_points:
+            time_left = self.times[i + 1] - time
+        else:
+            time_left = self.end_time - time
+
+        return position, self.velocities[i], max(int(time_left), 0)
+
+    def nbytes(self):
+        return self.times.nbytes + self.positions.nbytes + self.velocities.nbytes